@@ -0,0 +1,142 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+
+from scw.log import Log
+from scw.config import Config
+from scw.display_source import Display
+
+# Evaluation results
+NO_MATCH = 'none'
+UNIQUE = 'unique'
+AMBIGUOUS = 'ambiguous'
+ERROR = 'error'
+
+# Configuration of a worker process, see _init_worker
+_WORKER_CONFIG = None  # type: Optional[Config]
+
+
+def parse_display_list(line: str) -> List[Display]:
+    """ Parse a display list, as printed by get_display_list (plain display names are accepted as well) """
+    entries = json.loads(line)
+    if not isinstance(entries, list):
+        raise ValueError('expected a list of displays')
+
+    result = [Display(x) if isinstance(x, str) else Display.from_dict(x) for x in entries]
+    for display in result:
+        fields = (display.name, display.manufacturer, display.model, display.serial)
+        if not all(isinstance(x, str) for x in fields):
+            raise ValueError(f'expected string display fields: {display}')
+
+    return result
+
+
+def evaluate(config: Config, line_number: int, line: str) -> dict:
+    try:
+        displays = parse_display_list(line)
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return {'line': line_number, 'result': ERROR, 'error': str(e)}
+
+    presets = [x.name for x in config.find_matching_preset_for_displays(displays)]
+    if len(presets) == 0:
+        result = NO_MATCH
+    elif len(presets) == 1:
+        result = UNIQUE
+    else:
+        result = AMBIGUOUS
+
+    return {'line': line_number, 'result': result, 'displays': [x.name for x in displays], 'presets': presets}
+
+
+def _init_worker(config_path: str, log_level: int):
+    global _WORKER_CONFIG
+
+    # Spawned (as opposed to forked) workers start without a logger, which the validation warnings need
+    if Log.INSTANCE is None:
+        Log.setup(argparse.Namespace(info=log_level == logging.INFO, debug=log_level == logging.DEBUG))
+
+    _WORKER_CONFIG = Config.load_from_file(config_path)
+
+
+# Result, the uniquely matching preset (if any) and the JSON-encoded evaluation
+EncodedEvaluation = Tuple[str, Optional[str], str]
+
+
+def _encode(evaluation: dict) -> EncodedEvaluation:
+    preset = evaluation['presets'][0] if evaluation['result'] == UNIQUE else None
+    return evaluation['result'], preset, json.dumps(evaluation)
+
+
+def _evaluate_chunk(chunk: List[Tuple[int, str]]) -> List[EncodedEvaluation]:
+    # Results are encoded by the workers, otherwise the parent process becomes the bottleneck
+    return [_encode(evaluate(_WORKER_CONFIG, line_number, line)) for line_number, line in chunk]
+
+
+class Summary:
+    def __init__(self):
+        self.results = {NO_MATCH: 0, UNIQUE: 0, AMBIGUOUS: 0, ERROR: 0}  # type: Dict[str, int]
+        self.presets = {}  # type: Dict[str, int]
+
+    def add(self, result: str, preset: Optional[str]):
+        self.results[result] += 1
+        if preset is not None:
+            self.presets[preset] = self.presets.get(preset, 0) + 1
+
+    def __str__(self):
+        lines = [f'entries={sum(self.results.values())}, ' + ', '.join(f'{k}={v}' for k, v in self.results.items())]
+        for preset, count in sorted(self.presets.items(), key=lambda x: x[1], reverse=True):
+            lines.append(f'  {preset}: {count}')
+        return '\n'.join(lines)
+
+
+class BatchEvaluator:
+    """
+    Matches display lists (one JSON list per line) against the presets of a configuration. Lines are streamed in
+    chunks, so that the memory usage only depends on the chunk size and the number of processes, not on the input size.
+    """
+
+    # Lines per unit of work, handed over to a worker process
+    CHUNK_SIZE = 2000
+
+    # Chunks per process, which are read ahead
+    CHUNKS_PER_PROCESS = 4
+
+    def __init__(self, config_path: str, processes: int = 1, chunk_size: int = CHUNK_SIZE):
+        self.config_path = config_path
+        self.processes = processes
+        self.chunk_size = chunk_size
+
+    def _chunks(self, lines: Iterable[str]) -> Iterator[List[Tuple[int, str]]]:
+        numbered = ((number, line) for number, line in enumerate(lines, start=1) if line.strip())
+        while True:
+            chunk = list(itertools.islice(numbered, self.chunk_size))
+            if len(chunk) == 0:
+                return
+            yield chunk
+
+    def evaluate(self, lines: Iterable[str]) -> Iterator[EncodedEvaluation]:
+        """ Evaluate each of the lines, in the input order """
+        if self.processes <= 1:
+            config = Config.load_from_file(self.config_path)
+            for chunk in self._chunks(lines):
+                for line_number, line in chunk:
+                    yield _encode(evaluate(config, line_number, line))
+            return
+
+        # Pool.imap would consume the whole input up front, so the chunks are submitted in bounded windows instead
+        window_size = self.processes * BatchEvaluator.CHUNKS_PER_PROCESS
+        chunks = self._chunks(lines)
+
+        log_level = Log.INSTANCE.level if Log.INSTANCE is not None else logging.ERROR
+        with multiprocessing.Pool(self.processes, _init_worker, (self.config_path, log_level)) as pool:
+            while True:
+                window = list(itertools.islice(chunks, window_size))
+                if len(window) == 0:
+                    return
+
+                for results in pool.imap(_evaluate_chunk, window):
+                    yield from results
@@ -1,3 +1,38 @@
 def run_watcher():
     from scw.cli.screen_config_watcher import run
     run()
+
+
+def run_simulation():
+    from scw.cli.simulate_settle import run
+    run()
+
+
+def run_replay():
+    from scw.cli.replay_trace import run
+    run()
+
+
+def run_benchmark():
+    from scw.cli.benchmark_config import run
+    run()
+
+
+def run_evaluation():
+    from scw.cli.evaluate_displays import run
+    run()
+
+
+def run_obs_benchmark():
+    from scw.cli.benchmark_obs import run
+    run()
+
+
+def run_mode_benchmark():
+    from scw.cli.benchmark_modes import run
+    run()
+
+
+def run_control():
+    from scw.cli.control import run
+    run()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import random
+import tempfile
+from argparse import ArgumentParser
+from typing import List, Optional
+
+from scw.log import Log
+from scw.config import Config
+from scw.config_cache import ConfigCache
+
+
+def generate_config(num_presets: int, displays_per_preset: int) -> str:
+    """ TOML configuration with unique, randomly named presets """
+    rng = random.Random(num_presets)
+    names = [f'Display {i}' for i in range(max(displays_per_preset * 4, 64))]
+
+    lines = ['[obwsc]', 'config = "obwsc.config.toml"', '', '[settings]', 'grace_period = 15', '']
+    for i in range(num_presets):
+        displays = ', '.join(f'"{x}"' for x in rng.sample(names, rng.randint(1, displays_per_preset)) + [f'Own {i}'])
+        lines += [f'[presets.preset_{i}]', f'displays = [{displays}]', f'profile = "Profile {i}"',
+                  f'scene_collection = "Scene Collection {i}"', '']
+
+    return '\n'.join(lines)
+
+
+def pairwise_validate(config: Config) -> bool:
+    """ Uniqueness check of the presets, as it was done before the display key grouping: every pair is compared """
+    presets = config.presets
+    return not any(presets[i].compare_case_insensitive(presets[j], False)
+                   for i in range(len(presets)) for j in range(i + 1, len(presets)))
+
+
+def linear_match(config: Config, displays: List[str]) -> List[Config.Preset]:
+    """ Preset matching, as it was done before the display index: every preset is compared """
+    return [x for x in config.presets if x.compare_case_insensitive(displays, False)]
+
+
+def sample_display_lists(config: Config, count: int) -> List[List[str]]:
+    """ Display lists of random presets (in a different order and case), every other one with an unknown display """
+    rng = random.Random(count)
+    result = []  # type: List[List[str]]
+    for i in range(count):
+        displays = [x.upper() for x in rng.choice(config.presets).displays]
+        rng.shuffle(displays)
+        if i % 2 == 1:
+            displays[0] = 'Unknown Display'
+        result.append(displays)
+    return result
+
+
+def measure(fn, repeat: int) -> float:
+    """ Best of the runs, in seconds """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(cmd_args: Optional[List[str]] = None):
+    parser = ArgumentParser('screen-config-benchmark')
+
+    Log.add_args(parser)
+
+    parser.add_argument('--presets', type=int, nargs='+', default=[10, 1000, 10000],
+                        help='Numbers of presets to benchmark with')
+    parser.add_argument('--displays', type=int, default=3, help='Maximal number of displays per preset')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs, the best one is reported')
+    parser.add_argument('--matches', type=int, default=1000, help='Number of display lists to match per run')
+    parser.add_argument('--baseline', action='store_true',
+                        help='Compare the validation and matching with the previous quadratic and linear algorithms '
+                             '(takes minutes with 10k presets)')
+
+    args = parser.parse_args(args=cmd_args)
+
+    Log.setup(args)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = ConfigCache(os.path.join(tmp_dir, 'cache'))
+
+        for num_presets in args.presets:
+            config_path = os.path.join(tmp_dir, f'config-{num_presets}.toml')
+            with open(config_path, 'w') as f:
+                f.write(generate_config(num_presets, args.displays))
+
+            cold = measure(lambda: Config.load_from_file(config_path), args.repeat)
+            Config.load_from_file(config_path, cache)
+            warm = measure(lambda: Config.load_from_file(config_path, cache), args.repeat)
+
+            print(f'presets={num_presets}: cold={cold * 1000:.2f}ms, warm={warm * 1000:.2f}ms, '
+                  f'speedup={cold / warm:.1f}x')
+
+            config = Config.load_from_file(config_path)
+            display_lists = sample_display_lists(config, args.matches)
+            validate = measure(config.validate, args.repeat)
+            match = measure(lambda: [config.find_matching_preset(x) for x in display_lists], args.repeat)
+            match /= len(display_lists)
+            result = f'presets={num_presets}: validate={validate * 1000:.2f}ms, match={match * 1e6:.2f}us'
+
+            if args.baseline:
+                if any(config.find_matching_preset(x) != linear_match(config, x) for x in display_lists):
+                    raise RuntimeError(f'Indexed and linear matches differ with {num_presets} presets')
+
+                # Single runs, these are slow enough
+                pairwise = measure(lambda: pairwise_validate(config), 1)
+                linear = measure(lambda: [linear_match(config, x) for x in display_lists], 1) / len(display_lists)
+                result += f' (pairwise validate={pairwise * 1000:.2f}ms, speedup={pairwise / validate:.0f}x; ' \
+                          f'linear match={linear * 1e6:.2f}us, speedup={linear / match:.0f}x)'
+
+            print(result)
+
+
+def run(cmd_args: Optional[List[str]] = None):
+    try:
+        main(cmd_args)
+        sys.exit(0)
+    except (RuntimeError, OSError) as e:
+        print(e, file=sys.stderr)
+
+    sys.exit(-1)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import tempfile
+import statistics
+import subprocess
+from argparse import ArgumentParser
+from typing import Dict, List, Optional
+
+MODES = ['headless', 'qt']
+
+# Name of the display, reported by the fake display source
+DISPLAY_NAME = 'Benchmark Display'
+
+CONFIG = f'''
+[obwsc]
+config = "obwsc.config.toml"
+
+[settings]
+grace_period = 1
+settle_period = 0.5
+
+[presets.benchmark]
+displays = ["{DISPLAY_NAME}"]
+profile = "Benchmark"
+scene_collection = "Benchmark"
+'''
+
+
+def _usage() -> dict:
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    # Kilobytes on Linux, bytes on macOS
+    max_rss = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    return {'max_rss': max_rss, 'context_switches': usage.ru_nvcsw + usage.ru_nivcsw}
+
+
+def run_child(mode: str, config_path: str, warmup: float, idle: float):
+    """
+    Runs the watcher in the mode, with a fake display source. Prints "ready" once the event loop is running, and the
+    resource usage of the idle period (after the warmup, which covers the initial preset switch) as JSON.
+    """
+    from scw.options import Options
+    from scw.display_source.fake import FakeDisplaySource
+
+    cmd_args = ['-c', config_path, '--dry-run', '--no-config-cache', '--no-warm-restart']
+    if mode == 'headless':
+        cmd_args.append('--headless')
+
+    options, _ = Options.parse('screen-config-benchmark-modes', cmd_args=cmd_args)
+    display_source = FakeDisplaySource()
+    display_source.set_display_names([DISPLAY_NAME])
+
+    if mode == 'headless':
+        from scw.headless_app import HeadlessApp
+        app = HeadlessApp(options, display_source)
+        engine = app.engine
+    else:
+        from scw.watcher_app import ScreenConfigWatcherApp
+        app = ScreenConfigWatcherApp(options, display_source)
+        engine = app.widget.engine
+
+    loop = engine.loop
+    idle_start = {}
+
+    def on_ready():
+        print('ready', flush=True)
+        warmup_timer.start(warmup)
+
+    def on_warmed_up():
+        idle_start.update(_usage())
+        idle_timer.start(idle)
+
+    def on_idle_done():
+        usage = _usage()
+        print(json.dumps({'max_rss': usage['max_rss'],
+                          'wakeups': (usage['context_switches'] - idle_start['context_switches']) / idle}),
+              flush=True)
+        loop.stop()
+
+    ready_timer = loop.create_timer(on_ready)
+    warmup_timer = loop.create_timer(on_warmed_up)
+    idle_timer = loop.create_timer(on_idle_done)
+    ready_timer.start(0)
+
+    app.run()
+
+
+def measure(mode: str, config_path: str, warmup: float, idle: float) -> Dict[str, float]:
+    """ Start-up time (until the event loop runs, including the interpreter start), max RSS and idle wakeups """
+    env = dict(os.environ)
+    if mode == 'qt':
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable, '-m', 'scw.cli.benchmark_modes', '--child', mode, '--child-config',
+                              config_path, '--warmup', str(warmup), '--idle', str(idle)],
+                             stdout=subprocess.PIPE, text=True, env=env)
+    with child:
+        ready = child.stdout.readline()
+        startup = time.perf_counter() - start
+        result = child.stdout.readline()
+
+    if ready.strip() != 'ready' or not result:
+        raise RuntimeError(f'The {mode} watcher failed (exit code: {child.returncode})')
+
+    result = json.loads(result)
+    return {'startup': startup, 'max_rss': result['max_rss'], 'wakeups': result['wakeups']}
+
+
+def main(cmd_args: Optional[List[str]] = None):
+    parser = ArgumentParser('screen-config-benchmark-modes')
+
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES, help='Modes to compare')
+    parser.add_argument('--runs', type=int, default=5, help='Number of runs per mode, the median is reported')
+    parser.add_argument('--warmup', type=float, default=3.0,
+                        help='Time to let the initial preset switch pass, before measuring the idle wakeups '
+                             '(in seconds)')
+    parser.add_argument('--idle', type=float, default=5.0, help='Idle period to count the wakeups in (in seconds)')
+    parser.add_argument('--child', choices=MODES, help='Internal: run the watcher in a mode and report its usage')
+    parser.add_argument('--child-config', help='Internal: configuration file of the watcher')
+
+    args = parser.parse_args(args=cmd_args)
+
+    if sys.platform == 'win32':
+        raise RuntimeError('The mode benchmark needs the POSIX resource usage statistics')
+
+    if args.child is not None:
+        run_child(args.child, args.child_config, args.warmup, args.idle)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_path = os.path.join(tmp_dir, 'config.toml')
+        with open(config_path, 'w') as f:
+            f.write(CONFIG)
+
+        for mode in args.modes:
+            runs = [measure(mode, config_path, args.warmup, args.idle) for _ in range(args.runs)]
+            startup, max_rss, wakeups = (statistics.median(x[key] for x in runs)
+                                         for key in ('startup', 'max_rss', 'wakeups'))
+            print(f'{mode}: startup={startup * 1000:.0f}ms, max RSS={max_rss / (1024 * 1024):.1f}MiB, '
+                  f'idle wakeups={wakeups:.1f}/s')
+
+
+def run(cmd_args: Optional[List[str]] = None):
+    try:
+        main(cmd_args)
+        sys.exit(0)
+    except (RuntimeError, OSError) as e:
+        print(e, file=sys.stderr)
+
+    sys.exit(-1)
+
+
+if __name__ == '__main__':
+    run()
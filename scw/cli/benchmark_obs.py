@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import tempfile
+import threading
+from argparse import ArgumentParser
+from typing import List, Optional
+
+from scw.log import Log
+from scw.config import Config
+from scw.obs_client import ObsClient
+from scw.obs_fanout import ObsFanout
+from scw.obs_mock_server import MockObsServer
+
+SWITCH = 'switch-profile-and-scene-collection'
+
+# Alternated between, so that every switch changes both the profile and the scene collection
+PRESETS = [('Default', 'Default'), ('Other', 'Other')]
+
+# Alternated between for the request batch measurements: changing the profile would add the same, fixed recording
+# stop delay to both the batched and the sequential switches.
+BATCH_PRESETS = [('Default', 'Default'), ('Default', 'Other')]
+
+# Cycled through for the follow-up requests of the batch measurements
+FOLLOW_UPS = [Config.Request('SetCurrentProgramScene', {'sceneName': 'Scene'}),
+              Config.Request('SetInputMute', {'inputName': 'Mic/Aux', 'inputMuted': False}),
+              Config.Request('SetSceneItemEnabled', {'sceneName': 'Scene', 'sceneItemId': 1, 'sceneItemEnabled': True})]
+
+
+def measure_sequential(clients: List[ObsClient], switches: int) -> float:
+    """ Average duration of a switch, executed on one endpoint after another (e.g. by separate watchers) """
+    start = time.perf_counter()
+    for i in range(switches):
+        for client in clients:
+            client.execute(SWITCH, *PRESETS[(i + 1) % len(PRESETS)])
+    return (time.perf_counter() - start) / switches
+
+
+def measure_fanout(endpoints: List[Config.Endpoint], switches: int) -> float:
+    """ Average duration of a switch, executed on all the endpoints concurrently """
+    completed = threading.Event()
+    errors = []
+
+    def on_completed(submission: ObsFanout.Submission):
+        errors.extend(submission.errors.values())
+        completed.set()
+
+    fanout = ObsFanout(endpoints, lambda *_: None, on_completed)
+    try:
+        start = time.perf_counter()
+        for i in range(switches):
+            completed.clear()
+            fanout.submit(SWITCH, *PRESETS[(i + 1) % len(PRESETS)])
+            completed.wait()
+        duration = (time.perf_counter() - start) / switches
+    finally:
+        fanout.close()
+
+    if len(errors) != 0:
+        raise RuntimeError(f'Switch failed: {errors}')
+
+    return duration
+
+
+def make_batches(follow_ups: int) -> List[Config.RequestBatch]:
+    requests = [FOLLOW_UPS[i % len(FOLLOW_UPS)] for i in range(follow_ups)]
+    return [Config.RequestBatch(profile, collection, requests) for profile, collection in BATCH_PRESETS]
+
+
+def measure_batched(client: ObsClient, batches: List[Config.RequestBatch], switches: int) -> float:
+    """ Average duration of a switch, sent as a single request batch """
+    start = time.perf_counter()
+    for i in range(switches):
+        batch = batches[(i + 1) % len(batches)]
+        client.execute(SWITCH, batch.profile_name, batch.scene_collection_name, batch)
+    return (time.perf_counter() - start) / switches
+
+
+def measure_unbatched(obwsc_config: str, batches: List[Config.RequestBatch], switches: int) -> float:
+    """ Average duration of a switch, sent as one request after another (one round trip each) """
+    import obsws_python
+    from obsws_python.error import OBSSDKRequestError
+
+    settings = ObsClient(obwsc_config)._load_connection_settings()
+    client = obsws_python.ReqClient(**settings)
+    client.logger.disabled = client.base_client.logger.disabled = True
+    try:
+        start = time.perf_counter()
+        for i in range(switches):
+            batch = batches[(i + 1) % len(batches)]
+            scene_collection = {'sceneCollectionName': batch.scene_collection_name}
+            requests = [Config.Request('SetCurrentSceneCollection', scene_collection), Config.Request('StartRecord')] \
+                + batch.requests
+            for request in requests:
+                try:
+                    client.send(request.request_type, request.data)
+                except OBSSDKRequestError:
+                    # E.g. starting an active recording
+                    pass
+        return (time.perf_counter() - start) / switches
+    finally:
+        client.disconnect()
+
+
+def main(cmd_args: Optional[List[str]] = None):
+    parser = ArgumentParser('screen-config-benchmark-obs')
+
+    Log.add_args(parser)
+
+    parser.add_argument('--latency', type=float, nargs='+', default=[0.02, 0.05, 0.1],
+                        help='Request latency of each mock OBS instance (in seconds)')
+    parser.add_argument('--switches', type=int, default=3, help='Number of preset switches per measurement')
+    parser.add_argument('--requests', type=int, default=5,
+                        help='Number of follow-up requests per switch, for the request batch measurement')
+
+    args = parser.parse_args(args=cmd_args)
+
+    Log.setup(args)
+
+    servers = []  # type: List[MockObsServer]
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            endpoints = []  # type: List[Config.Endpoint]
+            for i, latency in enumerate(args.latency):
+                server = MockObsServer(latency, profiles=[x for x, _ in PRESETS],
+                                       scene_collections=[x for _, x in PRESETS])
+                servers.append(server)
+
+                obwsc_config = os.path.join(tmp_dir, f'obwsc-{i}.toml')
+                server.write_obwsc_config(obwsc_config)
+                endpoints.append(Config.Endpoint(Config.DEFAULT_ENDPOINT if i == 0 else f'endpoint-{i}',
+                                                 obwsc_config))
+
+            clients = [ObsClient(x.obwsc_config) for x in endpoints]
+            try:
+                sequential = measure_sequential(clients, args.switches)
+            finally:
+                for client in clients:
+                    client.disconnect()
+
+            for server in servers:
+                server.current_profile, server.current_scene_collection = PRESETS[0]
+
+            fanout = measure_fanout(endpoints, args.switches)
+
+            print(f'endpoints={len(endpoints)}, latencies={args.latency}: sequential={sequential * 1000:.1f}ms, '
+                  f'fan-out={fanout * 1000:.1f}ms per switch, speedup={sequential / fanout:.2f}x')
+
+            batches = make_batches(args.requests)
+            server = servers[0]
+            server.current_profile, server.current_scene_collection = BATCH_PRESETS[0]
+            unbatched = measure_unbatched(endpoints[0].obwsc_config, batches, args.switches)
+
+            server.current_profile, server.current_scene_collection = BATCH_PRESETS[0]
+            client = ObsClient(endpoints[0].obwsc_config)
+            try:
+                batched = measure_batched(client, batches, args.switches)
+            finally:
+                client.disconnect()
+
+            print(f'requests={args.requests}, latency={args.latency[0]}: sequential={unbatched * 1000:.1f}ms, '
+                  f'batch={batched * 1000:.1f}ms per switch, speedup={unbatched / batched:.2f}x')
+    finally:
+        for server in servers:
+            server.close()
+
+
+def run(cmd_args: Optional[List[str]] = None):
+    try:
+        main(cmd_args)
+        sys.exit(0)
+    except (RuntimeError, OSError) as e:
+        print(e, file=sys.stderr)
+
+    sys.exit(-1)
+
+
+if __name__ == '__main__':
+    run()
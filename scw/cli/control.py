@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+import sys
+import json
+import time
+from argparse import ArgumentParser
+from typing import List, Optional
+
+from scw.control_server import ControlClient
+
+COMMANDS = ['state', 'displays', 'preset', 'timer', 'apply', 'match', 'metrics']
+
+
+def main(cmd_args: Optional[List[str]] = None):
+    parser = ArgumentParser('screen-config-control')
+
+    parser.add_argument('--socket', '-s', required=False,
+                        help='Control socket (or named pipe) of the running watcher, the per-user default by default')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Send the request multiple times over the same connection, and report the latencies')
+    parser.add_argument('command', choices=COMMANDS, help='State to query, or action to perform')
+    parser.add_argument('displays', nargs='*',
+                        help='Display names (or JSON display objects) to match against the presets, for "match"')
+
+    args = parser.parse_args(args=cmd_args)
+
+    kwargs = {}
+    if args.command == 'match':
+        kwargs['displays'] = [json.loads(x) if x.startswith('{') else x for x in args.displays]
+
+    with ControlClient(args.socket) as client:
+        latencies = []  # type: List[float]
+        for _ in range(max(1, args.repeat)):
+            start = time.perf_counter()
+            result = client.request(args.command, **kwargs)
+            latencies.append(time.perf_counter() - start)
+
+    if isinstance(result, str):
+        sys.stdout.write(result)
+    else:
+        print(json.dumps(result, indent=2))
+
+    if args.repeat > 1:
+        latencies.sort()
+        print(f'requests={len(latencies)}, latency: p50={latencies[len(latencies) // 2] * 1e6:.0f}us, '
+              f'p99={latencies[int(len(latencies) * 0.99)] * 1e6:.0f}us, max={latencies[-1] * 1e6:.0f}us',
+              file=sys.stderr)
+
+
+def run(cmd_args: Optional[List[str]] = None):
+    try:
+        main(cmd_args)
+        sys.exit(0)
+    except (RuntimeError, OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+
+    sys.exit(-1)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+import os
+import sys
+from argparse import ArgumentParser
+from typing import List, Optional
+
+from scw.log import Log
+from scw.config import Config
+from scw.batch_evaluation import BatchEvaluator, Summary
+
+
+def main(cmd_args: Optional[List[str]] = None):
+    parser = ArgumentParser('screen-config-evaluate')
+
+    Log.add_args(parser)
+
+    parser.add_argument('--config', '-c', required=True, help='Path to the TOML configuration file')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Number of worker processes (0 for one per CPU)')
+    parser.add_argument('--summary-only', action='store_true', help="Don't print the results for each entry")
+    parser.add_argument('inventory', help='JSON lines file with display lists, as printed by get_display_list '
+                                          '("-" for the standard input)')
+
+    args = parser.parse_args(args=cmd_args)
+
+    Log.setup(args)
+
+    # Fail early on an invalid configuration, before starting any workers
+    Config.load_from_file(args.config)
+
+    processes = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    evaluator = BatchEvaluator(args.config, processes)
+    summary = Summary()
+
+    inventory = sys.stdin if args.inventory == '-' else open(args.inventory, 'r', encoding='utf-8')
+    with inventory:
+        for result, preset, encoded in evaluator.evaluate(inventory):
+            summary.add(result, preset)
+            if not args.summary_only:
+                sys.stdout.write(encoded + '\n')
+
+    print(summary, file=sys.stderr)
+
+
+def run(cmd_args: Optional[List[str]] = None):
+    try:
+        main(cmd_args)
+        sys.exit(0)
+    except (RuntimeError, OSError) as e:
+        print(e, file=sys.stderr)
+
+    sys.exit(-1)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import sys
+from argparse import ArgumentParser
+from typing import List, Optional
+
+from scw.log import Log
+from scw.trace import load_trace
+from scw.replay import replay, percentile
+
+
+def main(cmd_args: Optional[List[str]] = None) -> bool:
+    parser = ArgumentParser('screen-config-replay')
+
+    Log.add_args(parser)
+
+    parser.add_argument('--max-latency', type=float, required=False,
+                        help='Fail if the 99th latency percentile of any trace exceeds this value (in seconds)')
+    parser.add_argument('trace', nargs='+', help='Trace file, recorded with --record-trace')
+
+    args = parser.parse_args(args=cmd_args)
+
+    Log.setup(args)
+
+    success = True
+    for file_path in args.trace:
+        report = replay(load_trace(file_path), file_path)
+        print(f'{file_path}: {report}')
+
+        if args.max_latency is not None and len(report.latencies) != 0:
+            p99 = percentile(report.latencies, 0.99)
+            if p99 > args.max_latency:
+                print(f'{file_path}: p99 latency {p99:.3f}s exceeds {args.max_latency:.3f}s', file=sys.stderr)
+                success = False
+
+    return success
+
+
+def run(cmd_args: Optional[List[str]] = None):
+    try:
+        sys.exit(0 if main(cmd_args) else 1)
+    except (RuntimeError, OSError) as e:
+        print(e, file=sys.stderr)
+
+    sys.exit(-1)
+
+
+if __name__ == '__main__':
+    run()
@@ -2,14 +2,48 @@
 import sys
 from typing import List, Optional
 
-from scw.options import Options
-from scw.watcher_app import ScreenConfigWatcherApp
-
 
 def main(cmd_args: Optional[List[str]] = None):
-    opts, _ = Options.parse('screen-config-watcher', cmd_args=cmd_args)
-    app = ScreenConfigWatcherApp(opts)
-    app.run()
+    profile = None
+    if '--profile-startup' in (cmd_args if cmd_args is not None else sys.argv[1:]):
+        # Has to be set up before anything else is imported
+        from scw.startup_profile import StartupProfile
+        profile = StartupProfile()
+        profile.install_import_hook()
+
+    # Everything else is imported lazily, so that e.g. --help and configuration errors don't have to wait for Qt
+    from scw.options import Options
+    opts, args = Options.parse('screen-config-watcher', cmd_args=cmd_args)
+    opts.startup_profile = profile
+
+    if profile is not None:
+        profile.mark('options parsed')
+        if args.import_budget is not None:
+            profile.set_budget('application imported', args.import_budget / 1000)
+        if args.startup_budget is not None:
+            profile.set_budget('engine started', args.startup_budget / 1000)
+
+    if opts.headless:
+        from scw.headless_app import HeadlessApp as App
+    else:
+        from scw.watcher_app import ScreenConfigWatcherApp as App
+
+    if profile is not None:
+        profile.mark('application imported')
+
+    app = App(opts)
+
+    if profile is not None:
+        profile.mark('application created')
+
+    try:
+        app.run()
+    except SystemExit:
+        # The application exits normally after profiling, a blown budget still has to fail e.g. a CI job
+        exceeded = profile.exceeded_budgets() if profile is not None else []
+        if len(exceeded) != 0:
+            raise RuntimeError(f'Start-up budget exceeded: {", ".join(exceeded)}')
+        raise
 
 
 def run(cmd_args: Optional[List[str]] = None):
@@ -24,5 +58,3 @@ def run(cmd_args: Optional[List[str]] = None):
 
 if __name__ == '__main__':
     run()
-
-
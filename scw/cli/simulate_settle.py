@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+import sys
+from argparse import ArgumentParser
+from typing import List, Optional
+
+from scw.log import Log
+from scw.config import Config
+from scw.simulation import load_timeline, compare
+
+
+def main(cmd_args: Optional[List[str]] = None):
+    parser = ArgumentParser('screen-config-simulate')
+
+    Log.add_args(parser)
+
+    parser.add_argument('--config', '-c', required=True, help='Path to the TOML configuration file')
+    parser.add_argument('timeline', nargs='+',
+                        help='JSON lines file with display changes: {"time": <seconds>, "displays": [<names>]}')
+
+    args = parser.parse_args(args=cmd_args)
+
+    Log.setup(args)
+
+    config = Config.load_from_file(args.config)
+    for file_path in args.timeline:
+        print(f'{file_path}:')
+        compare(config, load_timeline(file_path))
+
+
+def run(cmd_args: Optional[List[str]] = None):
+    try:
+        main(cmd_args)
+        sys.exit(0)
+    except (RuntimeError, OSError) as e:
+        print(e, file=sys.stderr)
+
+    sys.exit(-1)
+
+
+if __name__ == '__main__':
+    run()
@@ -1,39 +1,412 @@
-from typing import List, Callable, Union
+from typing import List, Callable, Union, Dict, Tuple, FrozenSet, Optional, Pattern, Set, TYPE_CHECKING
 
 import os
+import re
+import json
+import bisect
+import fnmatch
+import hashlib
 import toml
 
 from scw.log import Log
+from scw.display_identity import IDENTITIES, name_key, fingerprint_key
+from scw.display_source import Display
+from scw import metrics
+
+if TYPE_CHECKING:
+    from scw.config_cache import ConfigCache
+
+# Number of displays and the set of their interned identities
+DisplayKey = Tuple[int, FrozenSet[Optional[int]]]
+
+# (manufacturer, model, serial)
+Fingerprint = Tuple[str, str, str]
 
 
 class Config:
+    class Rule:
+        """
+        Display pattern of a preset: a name, a glob or a regular expression (case-insensitive, matching the whole
+        display name), which has to match between min_count and max_count (None: no limit) of the displays.
+        """
+
+        NAME = 'name'
+        GLOB = 'glob'
+        REGEX = 'regex'
+        KINDS = (NAME, GLOB, REGEX)
+
+        def __init__(self, kind: str, pattern: str, min_count: int = 1, max_count: Optional[int] = 1):
+            if kind not in Config.Rule.KINDS:
+                raise RuntimeError(f'Unexpected display rule kind: {kind}')
+
+            self.kind = kind
+            self.pattern = pattern
+            self.min_count = min_count
+            self.max_count = max_count
+            self.regex = Config.Rule.compile(kind, pattern)
+            self.literal_length = Config.Rule.count_literals(kind, pattern)
+            self.prefix = Config.Rule.find_literal_prefix(kind, pattern)
+
+        def __str__(self):
+            return f"{self.kind}='{self.pattern}', min_count={self.min_count}, max_count={self.max_count}"
+
+        def __repr__(self):
+            return f"Config.Rule(kind='{self.kind}', pattern='{self.pattern}', min_count={self.min_count}, " \
+                   f"max_count={self.max_count})"
+
+        @staticmethod
+        def compile(kind: str, pattern: str) -> Pattern:
+            if kind == Config.Rule.NAME:
+                source = re.escape(pattern)
+            elif kind == Config.Rule.GLOB:
+                source = fnmatch.translate(pattern)
+            else:
+                source = pattern
+
+            try:
+                return re.compile(source, re.IGNORECASE)
+            except re.error as e:
+                raise RuntimeError(f'Invalid display {kind} "{pattern}": {e}')
+
+        @staticmethod
+        def count_literals(kind: str, pattern: str) -> int:
+            """ Rough number of literal characters in the pattern, used for ranking overlapping presets """
+            if kind == Config.Rule.NAME:
+                return len(pattern)
+            elif kind == Config.Rule.GLOB:
+                return len(re.sub(r'\[[^\]]*\]|[*?]', '', pattern))
+            else:
+                return len(re.sub(r'\\.|\[[^\]]*\]|\{[0-9,]*\}|[.^$*+?()|]', '', pattern))
+
+        @staticmethod
+        def find_literal_prefix(kind: str, pattern: str) -> str:
+            """ Lower-case prefix, every matching name starts with (empty if there is none) """
+            if kind == Config.Rule.NAME:
+                return pattern.lower()
+            elif kind == Config.Rule.GLOB:
+                return re.split(r'[*?\[]', pattern, 1)[0].lower()
+
+            if '|' in pattern:
+                return ''
+
+            prefix = []
+            i = 1 if pattern.startswith('^') else 0
+            while i < len(pattern):
+                if pattern[i] == '\\':
+                    if i + 1 == len(pattern) or pattern[i + 1].isalnum():
+                        break
+                    literal, i = pattern[i + 1], i + 2
+                elif pattern[i] in '.^$*+?{}()[]':
+                    break
+                else:
+                    literal, i = pattern[i], i + 1
+
+                if pattern[i:i + 1] in ('*', '?', '{'):
+                    # Optional or repeated character
+                    break
+                prefix.append(literal)
+
+            return ''.join(prefix).lower()
+
+        def may_overlap(self, other: 'Config.Rule') -> bool:
+            """ Cheap check: False only if no display name can possibly match both rules """
+            if self.kind == Config.Rule.NAME:
+                return other.matches(self.pattern)
+            elif other.kind == Config.Rule.NAME:
+                return self.matches(other.pattern)
+
+            return self.prefix.startswith(other.prefix) or other.prefix.startswith(self.prefix)
+
+        @staticmethod
+        def from_dict(d: dict) -> 'Config.Rule':
+            kinds = [x for x in Config.Rule.KINDS if x in d]
+            if len(kinds) != 1:
+                raise RuntimeError(f'A display rule should define exactly one of "name", "glob" or "regex": {d}')
+
+            kind = kinds[0]
+            if 'count' in d:
+                min_count = max_count = d['count']
+            else:
+                min_count = d.get('min', 1)
+                max_count = d.get('max', None if 'min' in d else 1)
+
+            return Config.Rule(kind, d[kind], min_count, max_count)
+
+        def _as_tuple(self) -> tuple:
+            return self.kind, self.pattern, self.min_count, self.max_count
+
+        def __eq__(self, other: 'Config.Rule'):
+            return self._as_tuple() == other._as_tuple()
+
+        def matches(self, name: str) -> bool:
+            return self.regex.fullmatch(name) is not None
+
+    class Endpoint:
+        """ OBS instance, described by an OBS Websocket Commands configuration file """
+
+        def __init__(self, name: str, obwsc_config: str, timeout: Optional[float] = None):
+            """
+            :param timeout: Upper bound for a single command on this endpoint (in seconds), no limit by default.
+            """
+            self.name = name
+            self.obwsc_config = obwsc_config
+            self.timeout = timeout
+
+        def __str__(self):
+            return f"name='{self.name}', obwsc_config='{self.obwsc_config}', timeout={self.timeout}"
+
+        def __repr__(self):
+            return f"Config.Endpoint(name='{self.name}', obwsc_config='{self.obwsc_config}', timeout={self.timeout})"
+
+        @staticmethod
+        def from_dict(d: dict) -> List['Config.Endpoint']:
+            """ The main endpoint ([obwsc]), followed by the additional ones ([obwsc.endpoints.<name>]) """
+            result = [Config.Endpoint(Config.DEFAULT_ENDPOINT, d['config'], d.get('timeout'))]
+            for key, entry in d.get('endpoints', {}).items():
+                result.append(Config.Endpoint(key, entry['config'], entry.get('timeout')))
+
+            return result
+
+        def _as_tuple(self) -> tuple:
+            return self.name, self.obwsc_config, self.timeout
+
+        def __eq__(self, other: 'Config.Endpoint'):
+            return self._as_tuple() == other._as_tuple()
+
+    class Request:
+        """ obs-websocket v5 request (e.g. SetCurrentProgramScene), executed after switching to a preset """
+
+        def __init__(self, request_type: str, data: Optional[dict] = None):
+            self.request_type = request_type
+            self.data = data if data is not None else {}
+
+        def __str__(self):
+            return f"request_type='{self.request_type}', data={self.data}"
+
+        def __repr__(self):
+            return f"Config.Request(request_type='{self.request_type}', data={self.data})"
+
+        @staticmethod
+        def from_dict(d: dict) -> 'Config.Request':
+            if not isinstance(d.get('type'), str) or not isinstance(d.get('data', {}), dict):
+                raise RuntimeError(f'An OBS request should have a "type" and optional "data" table: {d}')
+
+            # Plain JSON values only (TOML inline tables are parsed into dict subclasses, dates aren't serializable)
+            try:
+                data = json.loads(json.dumps(d.get('data', {})))
+            except (TypeError, ValueError) as e:
+                raise RuntimeError(f'Invalid data of the OBS request "{d["type"]}": {e}')
+
+            return Config.Request(d['type'], data)
+
+        def encode(self) -> str:
+            """ JSON-encoded request batch entry """
+            entry = {'requestType': self.request_type}
+            if len(self.data) != 0:
+                entry['requestData'] = self.data
+            return json.dumps(entry, separators=(',', ':'))
+
+        def _as_tuple(self) -> tuple:
+            return self.request_type, self.data
+
+        def __eq__(self, other: 'Config.Request'):
+            return self._as_tuple() == other._as_tuple()
+
+    class RequestBatch:
+        """
+        All the OBS requests of a preset switch, encoded once when the configuration is loaded. A switch only picks the
+        parts it needs, and is sent as a single obs-websocket v5 request batch (one round trip).
+        """
+
+        # Wait after stopping the recording, OBS reports an old status even after generating a "recording stopped" event
+        RECORD_STOP_DELAY_MS = 1000
+
+        def __init__(self, profile_name: str, scene_collection_name: str, requests: List['Config.Request']):
+            self.profile_name = profile_name
+            self.scene_collection_name = scene_collection_name
+            self.requests = requests
+
+            # The recording has to be stopped (and confirmed to be stopped, see ObsClient.stop_record) before changing
+            # the profile, and is (re-)started after any change
+            stop_delay = {'sleepMillis': Config.RequestBatch.RECORD_STOP_DELAY_MS}
+            self.profile_change = [Config.Request('Sleep', stop_delay).encode(),
+                                   Config.Request('SetCurrentProfile', {'profileName': profile_name}).encode()]
+            scene_collection = {'sceneCollectionName': scene_collection_name}
+            self.scene_collection_change = [Config.Request('SetCurrentSceneCollection', scene_collection).encode()]
+            self.record_start = [Config.Request('StartRecord').encode()]
+            self.follow_ups = [x.encode() for x in requests]
+
+        def __str__(self):
+            return f'[{", ".join(x.request_type for x in self.requests)}]'
+
+        def __repr__(self):
+            return f"Config.RequestBatch(profile_name='{self.profile_name}', " \
+                   f"scene_collection_name='{self.scene_collection_name}', requests={self.requests})"
+
+        def encode(self, request_id: str, change_profile: bool, change_scene_collection: bool) -> str:
+            """ JSON-encoded request batch message (serial, not halting on failures) """
+            parts = []  # type: List[str]
+            if change_profile:
+                parts += self.profile_change
+            if change_scene_collection:
+                parts += self.scene_collection_change
+            if change_profile or change_scene_collection:
+                parts += self.record_start
+            parts += self.follow_ups
+
+            return '{"op":8,"d":{"requestId":%s,"haltOnFailure":false,"executionType":0,"requests":[%s]}}' \
+                % (json.dumps(request_id), ','.join(parts))
+
+        def _as_tuple(self) -> tuple:
+            return self.profile_name, self.scene_collection_name, self.requests
+
+        def __eq__(self, other: 'Config.RequestBatch'):
+            return self._as_tuple() == other._as_tuple()
+
     class Preset:
-        def __init__(self, name: str, displays: List[str], profile_name: str, scene_collection_name: str):
+        # Maximum number of display names, whose matching rules are remembered per preset
+        RULE_CACHE_SIZE = 1024
+
+        def __init__(self, name: str, displays: List[str], profile_name: str, scene_collection_name: str,
+                     fingerprints: Optional[List[Fingerprint]] = None, rules: Optional[List['Config.Rule']] = None,
+                     endpoints: Optional[List[str]] = None, requests: Optional[List['Config.Request']] = None):
+            """
+            :param endpoints: Names of the OBS endpoints to switch, all of them by default.
+            :param requests: OBS requests to execute after switching the profile and scene collection.
+            """
             self.name = name
             self.displays = displays
+            self.fingerprints = fingerprints if fingerprints is not None else []
+            self.rules = rules if rules is not None else []
+            self.endpoints = endpoints if endpoints is not None else []
+            self.requests = requests if requests is not None else []
             self.profile_name = profile_name
             self.scene_collection_name = scene_collection_name
+            self.request_batch = Config.RequestBatch(profile_name, scene_collection_name, self.requests)
+
+            if len(self.rules) != 0:
+                # Matched by the rules, not by the lookup index
+                self.display_key = None  # type: Optional[DisplayKey]
+            elif len(self.fingerprints) != 0:
+                self.display_key = Config.Preset.make_fingerprint_key(self.fingerprints)
+            else:
+                self.display_key = Config.Preset.make_display_key(displays)
+
+            # Range of the number of displays, the rules can match (None: no limit)
+            self.min_displays = sum(x.min_count for x in self.rules)
+            self.max_displays = None if any(x.max_count is None for x in self.rules) \
+                else sum(x.max_count for x in self.rules)  # type: Optional[int]
+
+            # Overlapping presets are ranked by: literal characters in their rules, rules with exact counts
+            self.specificity = (sum(x.literal_length for x in self.rules),
+                                sum(1 for x in self.rules if x.min_count == x.max_count))
+
+            # Every matching display list contains a name with this prefix (the longest one of the required rules)
+            self.required_prefix = max((x.prefix for x in self.rules if x.min_count > 0), key=len, default='')
+
+            self.rule_masks = {}  # type: Dict[str, int]
 
         def __str__(self):
-            return f"name='{self.name}', displays={self.displays}, profile_name='{self.profile_name}', " \
-                   f"scene_collection_name='{self.scene_collection_name}'"
+            return f"name='{self.name}', displays={self.displays}, fingerprints={self.fingerprints}, " \
+                   f"rules={self.rules}, endpoints={self.endpoints}, requests={self.requests}, " \
+                   f"profile_name='{self.profile_name}', scene_collection_name='{self.scene_collection_name}'"
 
         def __repr__(self):
-            return f"Config.Preset(name='{self.name}', displays={self.displays}, profile_name='{self.profile_name}', " \
-                   f"scene_collection_name='{self.scene_collection_name}')"
+            return f"Config.Preset(name='{self.name}', displays={self.displays}, fingerprints={self.fingerprints}, " \
+                   f"rules={self.rules}, endpoints={self.endpoints}, requests={self.requests}, " \
+                   f"profile_name='{self.profile_name}', scene_collection_name='{self.scene_collection_name}')"
+
+        @staticmethod
+        def make_display_key(displays: List[str]) -> DisplayKey:
+            """ Canonical, order-independent key of a display list, used for the preset lookup index. """
+            return len(displays), frozenset(IDENTITIES.intern(name_key(x)) for x in displays)
+
+        @staticmethod
+        def make_fingerprint_key(fingerprints: List[Fingerprint]) -> DisplayKey:
+            return len(fingerprints), frozenset(IDENTITIES.intern(fingerprint_key(*x)) for x in fingerprints)
 
         @staticmethod
         def from_dict(d: dict) -> List['Config.Preset']:
             result = []  # type: List[Config.Preset]
 
             for key in d:
-                preset = Config.Preset(key, d[key]['displays'], d[key]['profile'], d[key]['scene_collection'])
+                entry = d[key]
+                fingerprints = [(x.get('manufacturer', ''), x.get('model', ''), x.get('serial', ''))
+                                for x in entry.get('fingerprints', [])]
+                rules = [Config.Rule.from_dict(x) for x in entry.get('rules', [])]
+                requests = [Config.Request.from_dict(x) for x in entry.get('requests', [])]
+                preset = Config.Preset(key, entry.get('displays', []), entry['profile'], entry['scene_collection'],
+                                       fingerprints, rules, entry.get('endpoints'), requests)
                 result.append(preset)
 
             return result
 
         def _as_tuple(self) -> tuple:
-            return self.name, self.profile_name, self.scene_collection_name, self.displays
+            return self.name, self.profile_name, self.scene_collection_name, self.displays, self.fingerprints, \
+                self.rules, self.endpoints, self.requests
+
+        def matches_ids(self, name_ids: List[Optional[int]], fingerprint_ids: List[Optional[int]]) -> bool:
+            """ Same as compare_case_insensitive, but for interned display identities """
+            ids = fingerprint_ids if len(self.fingerprints) != 0 else name_ids
+            length, our_ids = self.display_key
+            return len(ids) == length and our_ids.issuperset(ids)
+
+        def matches_names(self, names: List[str]) -> bool:
+            """ Check whether the displays can be distributed among the rules, satisfying all of their counts """
+            count = len(names)
+            if count < self.min_displays or (self.max_displays is not None and count > self.max_displays):
+                return False
+
+            masks = []
+            for name in names:
+                mask = self._rule_mask(name)
+                if mask == 0:
+                    return False
+                masks.append(mask)
+
+            # Displays with fewer options first, to keep the search shallow
+            masks.sort(key=lambda x: bin(x).count('1'))
+            return self._assign(masks, 0, [0] * len(self.rules))
+
+        def _rule_mask(self, name: str) -> int:
+            """ Bit mask of the rules, matching the display name """
+            mask = self.rule_masks.get(name)
+            if mask is None:
+                mask = 0
+                for i, rule in enumerate(self.rules):
+                    if rule.matches(name):
+                        mask |= 1 << i
+
+                if len(self.rule_masks) >= Config.Preset.RULE_CACHE_SIZE:
+                    self.rule_masks.clear()
+                self.rule_masks[name] = mask
+
+            return mask
+
+        def _assign(self, masks: List[int], index: int, counts: List[int]) -> bool:
+            missing = sum(max(0, x.min_count - c) for x, c in zip(self.rules, counts))
+            if missing > len(masks) - index:
+                return False
+
+            if index == len(masks):
+                return True
+
+            mask = masks[index]
+            for i, rule in enumerate(self.rules):
+                if mask & (1 << i) and (rule.max_count is None or counts[i] < rule.max_count):
+                    counts[i] += 1
+                    if self._assign(masks, index + 1, counts):
+                        return True
+                    counts[i] -= 1
+
+            return False
+
+        def matches(self, names: List[str], name_ids: List[Optional[int]],
+                    fingerprint_ids: List[Optional[int]]) -> bool:
+            if len(self.rules) != 0:
+                return self.matches_names(names)
+
+            return self.matches_ids(name_ids, fingerprint_ids)
 
         def __eq__(self, other: 'Config.Preset'):
             return self._as_tuple() == other._as_tuple()
@@ -48,7 +421,7 @@ class Config:
 
             if len(self.displays) != len(displays):
                 if verbose:
-                    Log.debug(f'{self.name} mismatch: number of displays')
+                    Log.debug('%s mismatch: number of displays', self.name)
 
                 return False
 
@@ -64,26 +437,172 @@ class Config:
             if mismatch is not None:
                 if verbose:
                     original = displays[other_lower.index(mismatch)]
-                    Log.debug(f'{self.name} mismatch: "{original}" not found in preset')
+                    Log.debug('%s mismatch: "%s" not found in preset', self.name, original)
                 return False
 
             return True
 
-    def __init__(self, config_path: str, obwsc_config: str, grace_period: int, presets: List['Config.Preset']):
+    class Diff:
+        """ Structured difference between two configurations """
+
+        def __init__(self, added: List['Config.Preset'], removed: List['Config.Preset'],
+                     modified: List[Tuple['Config.Preset', 'Config.Preset']], timing_changed: bool,
+                     obwsc_config_changed: bool):
+            """
+            :param obwsc_config_changed: Any of the OBS endpoints was added, removed or modified.
+            """
+            self.added = added
+            self.removed = removed
+            self.modified = modified  # (old, new) pairs
+            self.timing_changed = timing_changed  # Any of: grace period, settle period, max delay
+            self.obwsc_config_changed = obwsc_config_changed
+
+        def __str__(self):
+            return f'added={[x.name for x in self.added]}, removed={[x.name for x in self.removed]}, ' \
+                   f'modified={[x.name for x, _ in self.modified]}, timing_changed={self.timing_changed}, ' \
+                   f'obwsc_config_changed={self.obwsc_config_changed}'
+
+        def is_empty(self) -> bool:
+            return len(self.added) == 0 and len(self.removed) == 0 and len(self.modified) == 0 \
+                and not self.timing_changed and not self.obwsc_config_changed
+
+        def changed_presets(self) -> List['Config.Preset']:
+            """ All presets, whose matching results might have changed (both the old and the new versions) """
+            return self.added + self.removed + [x for pair in self.modified for x in pair]
+
+        def affects(self, displays: List[Display]) -> bool:
+            """ Check whether matching the display list might produce a different result after this change """
+            identities = [x.identity() for x in displays]
+            names = [x.name for x in displays]
+            name_ids = [x[0] for x in identities]
+            fingerprint_ids = [x[1] for x in identities]
+            return any(x.matches(names, name_ids, fingerprint_ids) for x in self.changed_presets())
+
+    # Name of the endpoint, configured by [obwsc] itself
+    DEFAULT_ENDPOINT = 'default'
+
+    # Time the displays have to stay unchanged before a matching preset is applied (in seconds)
+    DEFAULT_SETTLE_PERIOD = 1.0
+
+    # Upper bound for postponing a switch by a continuous stream of changes (in seconds)
+    DEFAULT_MAX_DELAY = 60.0
+
+    class PresetIndex:
+        """ Lookup structures of the presets, built once per preset list """
+
+        def __init__(self, presets: List['Config.Preset']):
+            self.presets_by_key = {}  # type: Dict[DisplayKey, List[Config.Preset]]
+            self.presets_by_length = {}  # type: Dict[int, List[Config.Preset]]
+            self.preset_positions = {}  # type: Dict[int, int]
+            self.rule_presets = []  # type: List[Config.Preset]
+            self.rule_presets_by_prefix = {}  # type: Dict[str, List[Config.Preset]]
+
+            for position, preset in enumerate(presets):
+                self.preset_positions[id(preset)] = position
+                if preset.display_key is None:
+                    self.rule_presets.append(preset)
+                    self.rule_presets_by_prefix.setdefault(preset.required_prefix, []).append(preset)
+                    continue
+
+                self.presets_by_key.setdefault(preset.display_key, []).append(preset)
+                self.presets_by_length.setdefault(preset.display_key[0], []).append(preset)
+
+            self.max_required_prefix = max((len(x) for x in self.rule_presets_by_prefix), default=0)
+
+        def lookup(self, ids: List[Optional[int]]) -> List['Config.Preset']:
+            key = (len(ids), frozenset(ids))
+            length, identities = key
+
+            if None in identities:
+                # Never seen in any preset
+                return []
+
+            if len(identities) == length:
+                # No duplicates: only presets with exactly the same set of displays can match
+                return list(self.presets_by_key.get(key, []))
+
+            # Duplicates (e.g. identical monitors): every preset of the same size that contains all the displays
+            return [x for x in self.presets_by_length.get(length, []) if identities <= x.display_key[1]]
+
+        def match_rules(self, names: List[str]) -> List['Config.Preset']:
+            """ Presets with the highest specificity, whose rules match the displays """
+            # Only presets, whose required prefix starts one of the display names, are candidates. Presets without one
+            # (e.g. with optional rules only) might even match an empty display list.
+            candidates = {id(x): x for x in self.rule_presets_by_prefix.get('', [])}  # type: Dict[int, Config.Preset]
+            for name in set(x.lower() for x in names):
+                for end in range(1, min(len(name), self.max_required_prefix) + 1):
+                    for preset in self.rule_presets_by_prefix.get(name[:end], []):
+                        candidates[id(preset)] = preset
+
+            matches = []  # type: List[Config.Preset]
+            for preset in sorted(candidates.values(), key=lambda x: x.specificity, reverse=True):
+                if len(matches) != 0 and preset.specificity < matches[0].specificity:
+                    break
+
+                if preset.matches_names(names):
+                    matches.append(preset)
+
+            matches.sort(key=lambda x: self.preset_positions[id(x)])
+            return matches
+
+    def __init__(self, config_path: str, obwsc_config: str, grace_period: int, presets: List['Config.Preset'],
+                 settle_period: float = DEFAULT_SETTLE_PERIOD, max_delay: float = DEFAULT_MAX_DELAY,
+                 obs_endpoints: Optional[List['Config.Endpoint']] = None):
+        """
+        :param obs_endpoints: All the OBS instances to switch, the first one using obwsc_config. Only the main one
+                              (without a timeout) by default.
+        """
         self.config_path = config_path
         self.obwsc_config = obwsc_config
+        self.obs_endpoints = obs_endpoints if obs_endpoints is not None \
+            else [Config.Endpoint(Config.DEFAULT_ENDPOINT, obwsc_config)]
         self.grace_period = grace_period
+        self.settle_period = settle_period
+        self.max_delay = max_delay
         self.presets = presets
-        self.on_change_listeners = []  # type: List[Callable[[Config], None]]
+        self.on_change_listeners = []  # type: List[Callable[[Config, Config.Diff], None]]
+
+        # Contents of the file, this configuration was loaded from, used for skipping no-op reloads
+        self.file_signature = None  # type: Optional[Tuple[int, int]]
+        self.content_hash = None  # type: Optional[str]
+        self.cache = None  # type: Optional[ConfigCache]
+
+        # Reported by validate(), kept with the compiled configuration, so that cache hits report them too
+        self.warnings = []  # type: List[str]
+
+        # Replaced as a whole (never modified), so that lookups from other threads always see a consistent index
+        self.index = Config.PresetIndex(presets)
 
     def find_matching_preset(self, displays: List[str]) -> List['Config.Preset']:
-        Log.debug(f'Matching presets against {displays}')
+        Log.debug('Matching presets against %s', displays)
+        return self._find_matching(self.index, displays, [IDENTITIES.lookup(name_key(x)) for x in displays], None)
+
+    def find_matching_preset_for_displays(self, displays: List[Display]) -> List['Config.Preset']:
+        """ Match against both display names and fingerprints """
+        Log.debug(lambda: f'Matching presets against {[x.name for x in displays]}')
+        index = self.index
+        # Displays, which aren't part of any preset, can't match exactly, so there is no need to intern them
+        identities = [x.known_identity() for x in displays]
+        names = [x.name for x in displays] if len(index.rule_presets) != 0 else []
+        return self._find_matching(index, names, [x[0] for x in identities], [x[1] for x in identities])
+
+    @staticmethod
+    def _find_matching(index: 'Config.PresetIndex', names: List[str], name_ids: List[Optional[int]],
+                       fingerprint_ids: Optional[List[Optional[int]]]) -> List['Config.Preset']:
+        with metrics.PRESET_MATCH_SECONDS.time():
+            matches = index.lookup(name_ids)
+
+            if fingerprint_ids is not None:
+                found = set(id(x) for x in matches)
+                matches.extend(x for x in index.lookup(fingerprint_ids) if id(x) not in found)
+                matches.sort(key=lambda x: index.preset_positions[id(x)])
 
-        matches = []
+            # Exact display lists always take precedence over the rules
+            if len(matches) == 0 and len(index.rule_presets) != 0:
+                matches = index.match_rules(names)
 
-        for preset in self.presets:
-            if preset.compare_case_insensitive(displays, True):
-                matches.append(preset)
+        if len(matches) == 0:
+            Log.debug('No preset contains exactly these displays')
 
         return matches
 
@@ -92,72 +611,281 @@ class Config:
             Log.error(f'OBS Websocket Commands Config not found: {self.obwsc_config}')
             return False
 
+        if any(x < 0 for x in self.timing()):
+            Log.error(f'Timing settings should not be negative: {self.timing()}')
+            return False
+
+        ambiguous = [x for x in self.presets
+                     if sum(1 for y in (x.displays, x.fingerprints, x.rules) if len(y) != 0) > 1]
+        for preset in ambiguous:
+            Log.error(f'Preset "{preset.name}" should define only one of "displays", "fingerprints" or "rules"')
+
+        if len(ambiguous) != 0:
+            return False
+
+        invalid_rules = [(x, y) for x in self.presets for y in x.rules
+                         if y.min_count < 0 or (y.max_count is not None and y.max_count < max(y.min_count, 1))]
+        for preset, rule in invalid_rules:
+            Log.error(f'Preset "{preset.name}" has a display rule with invalid counts: {rule}')
+
+        if len(invalid_rules) != 0:
+            return False
+
+        # Rules can't be compared exactly, so possible overlaps are only reported
+        self.warnings = [f'These presets might match the same displays: "{self.presets[i].name}" and '
+                         f'"{self.presets[j].name}", the switch is skipped if they do'
+                         for i, j in self._find_overlapping_rule_presets()]
+        for warning in self.warnings:
+            Log.warning(warning)
+
+        endpoint_names = set(x.name for x in self.obs_endpoints)
+        if len(endpoint_names) != len(self.obs_endpoints):
+            Log.error(f'OBS endpoint names should be unique: {[x.name for x in self.obs_endpoints]}')
+            return False
+
+        unknown_endpoints = [(x, y) for x in self.presets for y in x.endpoints if y not in endpoint_names]
+        for preset, endpoint in unknown_endpoints:
+            Log.error(f'Preset "{preset.name}" refers to an unknown OBS endpoint: "{endpoint}"')
+
+        if len(unknown_endpoints) != 0:
+            return False
+
         # Make sure that presets are unique enough
-        unique_enough = True
-        for i in range(len(self.presets)):
-            first = self.presets[i]
-            for j in range(i + 1, len(self.presets)):
-                second = self.presets[j]
-                if first.compare_case_insensitive(second, False):
-                    Log.error(f'These presets are not unique enough: "{first.name}" and "{second.name}"')
-                    unique_enough = False
-
-        return unique_enough
-
-    def subscribe_to_changes(self, listener: Callable[['Config'], None]):
+        collisions = self._find_colliding_presets()
+        for i, j in collisions:
+            Log.error(f'These presets are not unique enough: "{self.presets[i].name}" and "{self.presets[j].name}"')
+
+        return len(collisions) == 0
+
+    def _find_colliding_presets(self) -> List[Tuple[int, int]]:
+        """
+        Find all preset index pairs (i < j), for which presets[i].compare_case_insensitive(presets[j]) holds.
+        Presets are grouped by their display keys, so only actual collisions are visited.
+        """
+        result = []  # type: List[Tuple[int, int]]
+        seen_by_key = {}  # type: Dict[DisplayKey, List[int]]
+        seen_by_length = {}  # type: Dict[int, List[int]]
+
+        for j, second in enumerate(self.presets):
+            key = second.display_key
+            if key is None:
+                continue
+
+            length, names = key
+
+            if len(names) == length:
+                # Without duplicates, only an identical set of displays can collide
+                result.extend((i, j) for i in seen_by_key.get(key, []))
+            else:
+                result.extend((i, j) for i in seen_by_length.get(length, [])
+                              if names <= self.presets[i].display_key[1])
+
+            seen_by_key.setdefault(key, []).append(j)
+            seen_by_length.setdefault(length, []).append(j)
+
+        # Report in the same order as a pairwise comparison would
+        result.sort()
+        return result
+
+    def _find_overlapping_rule_presets(self) -> List[Tuple[int, int]]:
+        """
+        Find preset index pairs (i < j) of presets with rules, which are equally specific and might match the same
+        displays. Candidates are looked up by the rule prefixes, so unrelated presets are never compared.
+        """
+        by_specificity = {}  # type: Dict[Tuple[int, int], List[int]]
+        for position, preset in enumerate(self.presets):
+            if len(preset.rules) != 0:
+                by_specificity.setdefault(preset.specificity, []).append(position)
+
+        result = set()
+        for positions in by_specificity.values():
+            by_prefix = {}  # type: Dict[str, Set[int]]
+            for position in positions:
+                for rule in self.presets[position].rules:
+                    by_prefix.setdefault(rule.prefix, set()).add(position)
+            prefixes = sorted(by_prefix)
+
+            for i in positions:
+                first = self.presets[i]
+                anchor = first.required_prefix
+
+                # Rules, which are prefixes of the anchor, or start with it
+                candidates = set()  # type: Set[int]
+                for end in range(len(anchor)):
+                    candidates.update(by_prefix.get(anchor[:end], []))
+                for prefix in prefixes[bisect.bisect_left(prefixes, anchor):]:
+                    if not prefix.startswith(anchor):
+                        break
+                    candidates.update(by_prefix[prefix])
+
+                for j in candidates:
+                    second = self.presets[j]
+                    if j == i or (i, j) in result or (j, i) in result:
+                        continue
+
+                    if (first.max_displays is not None and second.min_displays > first.max_displays) or \
+                            (second.max_displays is not None and first.min_displays > second.max_displays):
+                        continue
+
+                    if Config._rules_may_overlap(first, second) and Config._rules_may_overlap(second, first):
+                        result.add((min(i, j), max(i, j)))
+
+        return sorted(result)
+
+    @staticmethod
+    def _rules_may_overlap(first: 'Config.Preset', second: 'Config.Preset') -> bool:
+        """ Every display, required by the first preset, has to match one of the rules of the second one """
+        return all(any(x.may_overlap(y) for y in second.rules) for x in first.rules if x.min_count > 0)
+
+    def subscribe_to_changes(self, listener: Callable[['Config', 'Config.Diff'], None]):
         self.on_change_listeners.append(listener)
 
-    def unsubscribe_from_changes(self, listener: Callable[['Config'], None]):
+    def unsubscribe_from_changes(self, listener: Callable[['Config', 'Config.Diff'], None]):
         try:
             self.on_change_listeners.remove(listener)
         except ValueError as e:
             print(f'Error unsubscribing from config changes: {e}')
 
     def _as_tuple(self):
-        return self.obwsc_config, self.grace_period, self.presets
+        return self.obwsc_config, self.obs_endpoints, self.timing(), self.presets
+
+    def timing(self) -> Tuple[float, float, float]:
+        return self.grace_period, self.settle_period, self.max_delay
 
     def __eq__(self, other: 'Config'):
         return self._as_tuple() == other._as_tuple()
 
+    def diff(self, other: 'Config') -> 'Config.Diff':
+        """ Compute changes, required to turn this configuration into the other one """
+        ours = {x.name: x for x in self.presets}
+        theirs = {x.name: x for x in other.presets}
+
+        added = [x for x in other.presets if x.name not in ours]
+        removed = [x for x in self.presets if x.name not in theirs]
+        modified = [(ours[x.name], x) for x in other.presets if x.name in ours and ours[x.name] != x]
+
+        return Config.Diff(added, removed, modified, self.timing() != other.timing(),
+                           self.obs_endpoints != other.obs_endpoints)
+
     @staticmethod
-    def contents_from_file(file_path):
-        file_contents = toml.load(file_path)
-        obwsc_config = file_contents['obwsc']['config']
-        grace_period = file_contents['settings']['grace_period']
+    def file_signature(file_path) -> Tuple[int, int]:
+        """ Cheap change indicator: modification time and size of the file """
+        stat = os.stat(file_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def content_hash_of(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def contents_from_string(text: str):
+        metrics.CONFIG_PARSES.inc()
+        file_contents = toml.loads(text)
+        obs_endpoints = Config.Endpoint.from_dict(file_contents['obwsc'])
+        settings = file_contents['settings']
+        timing = (settings['grace_period'], settings.get('settle_period', Config.DEFAULT_SETTLE_PERIOD),
+                  settings.get('max_delay', Config.DEFAULT_MAX_DELAY))
         presets = Config.Preset.from_dict(file_contents['presets'])
-        return obwsc_config, grace_period, presets
+        return obs_endpoints, timing, presets
+
+    @staticmethod
+    def contents_from_file(file_path):
+        with open(file_path, 'rb') as f:
+            return Config.contents_from_string(f.read().decode('utf-8'))
 
     @staticmethod
-    def load_from_file(file_path) -> 'Config':
+    def load_from_bytes(file_path, data: bytes) -> 'Config':
+        with metrics.CONFIG_LOAD_SECONDS.time():
+            return Config._load_from_bytes(file_path, data)
+
+    @staticmethod
+    def _load_from_bytes(file_path, data: bytes) -> 'Config':
         try:
-            obwsc_config, grace_period, presets = Config.contents_from_file(file_path)
-            res = Config(file_path, obwsc_config, grace_period, presets)
+            obs_endpoints, (grace_period, settle_period, max_delay), presets = \
+                Config.contents_from_string(data.decode('utf-8'))
+            res = Config(file_path, obs_endpoints[0].obwsc_config, grace_period, presets, settle_period, max_delay,
+                         obs_endpoints)
+            res.content_hash = Config.content_hash_of(data)
             if not res.validate():
                 raise RuntimeError(f'Invalid configuration: {file_path}')
             return res
         except toml.decoder.TomlDecodeError as e:
             raise RuntimeError(str(e))
+        except UnicodeDecodeError as e:
+            raise RuntimeError(f'Invalid configuration encoding: {file_path}: {e}')
+
+    @staticmethod
+    def _load_cached(file_path, signature: Tuple[int, int], data: bytes, cache: Optional['ConfigCache']) -> 'Config':
+        if cache is not None:
+            res = cache.load(file_path, signature, Config.content_hash_of(data))
+            if res is not None:
+                return res
+
+        res = Config.load_from_bytes(file_path, data)
+        if cache is not None:
+            cache.store(res, signature)
+
+        return res
+
+    @staticmethod
+    def load_from_file(file_path, cache: Optional['ConfigCache'] = None) -> 'Config':
+        """
+        :param cache: Compiled configurations, used for skipping the parsing and validation of unchanged files.
+        """
+        signature = Config.file_signature(file_path)
+        with open(file_path, 'rb') as f:
+            data = f.read()
+
+        res = Config._load_cached(file_path, signature, data, cache)
+        res.file_signature = signature
+        res.cache = cache
+        return res
 
     def reload(self):
         try:
-            new_config = Config.load_from_file(self.config_path)
-        except toml.decoder.TomlDecodeError as e:
-            Log.error(e)
+            signature = Config.file_signature(self.config_path)
+            if signature == self.file_signature:
+                return
+
+            with open(self.config_path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            Log.error(f'Error reading the configuration file: {e}')
+            return
+
+        self.file_signature = signature
+
+        content_hash = Config.content_hash_of(data)
+        if content_hash == self.content_hash:
+            Log.debug('Configuration file touched, but not changed: %s', self.config_path)
             return
+
+        self.content_hash = content_hash
+
+        try:
+            new_config = Config._load_cached(self.config_path, signature, data, self.cache)
         except RuntimeError as e:
             Log.error(e)
             return
 
-        changed = (self != new_config)
+        self.update(new_config)
+
+    def update(self, new_config: 'Config'):
+        """ Take over the settings and presets of another configuration, notifying the listeners if anything changed """
+        diff = self.diff(new_config)
 
-        if not changed:
+        if diff.is_empty():
             return
 
-        Log.debug(f'Configuration file changed {self.config_path}')
+        Log.debug('Configuration file changed %s: %s', self.config_path, diff)
 
         self.obwsc_config = new_config.obwsc_config
+        self.obs_endpoints = new_config.obs_endpoints
         self.grace_period = new_config.grace_period
+        self.settle_period = new_config.settle_period
+        self.max_delay = new_config.max_delay
         self.presets = new_config.presets
+        self.index = new_config.index
 
         for listener in self.on_change_listeners:
-            listener(self)
+            listener(self, diff)
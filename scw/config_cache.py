@@ -0,0 +1,95 @@
+from typing import Optional, Tuple
+
+import os
+import sys
+import marshal
+import hashlib
+
+from scw.log import Log
+from scw.config import Config
+from scw import metrics
+
+
+def default_cache_dir() -> str:
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Local')
+    elif sys.platform == 'darwin':
+        base = os.path.join(os.path.expanduser('~'), 'Library', 'Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+
+    return os.path.join(base, 'screen-config-watcher')
+
+
+class ConfigCache:
+    """
+    Compiled configurations, stored in a compact binary form (marshal), so that unchanged configuration files don't
+    have to be parsed and validated again. Entries are keyed by the configuration path, modification time, size and
+    content hash; any mismatch or a corrupt entry is treated as a cache miss.
+    """
+
+    # Bumped whenever the stored layout changes
+    FORMAT_VERSION = 5
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir if cache_dir is not None else default_cache_dir()
+
+    def _entry_path(self, config_path: str) -> str:
+        key = hashlib.sha256(os.path.abspath(config_path).encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f'{key}.bin')
+
+    def load(self, config_path: str, signature: Tuple[int, int], content_hash: str) -> Optional[Config]:
+        try:
+            with open(self._entry_path(config_path), 'rb') as f:
+                entry = marshal.load(f)
+
+            version, path, mtime_ns, size, cached_hash, obs_endpoints, timing, presets, warnings = entry
+            if (version, path, (mtime_ns, size), cached_hash) != \
+                    (ConfigCache.FORMAT_VERSION, os.path.abspath(config_path), signature, content_hash):
+                return None
+
+            grace_period, settle_period, max_delay = timing
+            obs_endpoints = [Config.Endpoint(*x) for x in obs_endpoints]
+            presets = [Config.Preset(name, list(displays), profile, scene_collection, list(fingerprints),
+                                     [Config.Rule(*x) for x in rules], list(endpoints),
+                                     [Config.Request(*x) for x in requests])
+                       for name, displays, profile, scene_collection, fingerprints, rules, endpoints, requests
+                       in presets]
+            warnings = [str(x) for x in warnings]
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, TypeError, RuntimeError) as e:
+            Log.debug('Ignoring a broken configuration cache entry for %s: %s', config_path, e)
+            return None
+
+        metrics.CONFIG_CACHE_HITS.inc()
+
+        result = Config(config_path, obs_endpoints[0].obwsc_config, grace_period, presets, settle_period, max_delay,
+                        obs_endpoints)
+        result.content_hash = content_hash
+
+        # Validation is skipped, but its warnings still apply
+        result.warnings = warnings
+        for warning in warnings:
+            Log.warning(warning)
+
+        return result
+
+    def store(self, config: Config, signature: Tuple[int, int]):
+        presets = [(x.name, list(x.displays), x.profile_name, x.scene_collection_name,
+                    [tuple(f) for f in x.fingerprints], [y._as_tuple() for y in x.rules], list(x.endpoints),
+                    [y._as_tuple() for y in x.requests]) for x in config.presets]
+        entry = (ConfigCache.FORMAT_VERSION, os.path.abspath(config.config_path), signature[0], signature[1],
+                 config.content_hash, [x._as_tuple() for x in config.obs_endpoints], config.timing(), presets,
+                 list(config.warnings))
+
+        entry_path = self._entry_path(config.config_path)
+        tmp_path = f'{entry_path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                marshal.dump(entry, f)
+            os.replace(tmp_path, entry_path)
+        except (OSError, ValueError) as e:
+            # The cache is only an optimization
+            Log.debug('Unable to store the configuration cache for %s: %s', config.config_path, e)
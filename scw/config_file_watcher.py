@@ -1,40 +1,87 @@
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler, FileModifiedEvent
+from typing import Callable, Dict, Optional
 
+from scw.log import Log
 from scw.config import Config
+from scw.file_watcher import FileWatcher, create_file_watcher
 
 import os
+import sys
+import threading
 
 
 class ConfigFileWatcher:
+    """
+    Reloads the configuration when its file changes, and reports changes of the referenced OBS Websocket Commands
+    configuration. Only these two files are watched, not their directories.
+    """
 
-    class EventHandler(FileSystemEventHandler):
-        def __init__(self, config: Config):
-            self.config = config
-            self.config_path = os.path.abspath(config.config_path)
-            self.dir_name = os.path.dirname(self.config_path)
+    # Time to wait for more file events before reloading the configuration (in seconds)
+    DEBOUNCE_PERIOD = 0.25
 
-        def on_modified(self, event):
-            if not isinstance(event, FileModifiedEvent):
-                # Ignore file changes
-                return
+    def __init__(self, config: Config, on_obwsc_config_change: Optional[Callable[[], None]] = None):
+        """
+        :param on_obwsc_config_change: Called (from a background thread), whenever the contents of the OBS Websocket
+                                       Commands configuration change.
+        """
+        self.config = config
+        self.on_obwsc_config_change = on_obwsc_config_change
 
-            if event.src_path != self.config_path:
-                return
+        self.lock = threading.Lock()
+        self.reload_timers = {}  # type: Dict[str, threading.Timer]
 
+        self.file_watcher = create_file_watcher(sys.platform, self._on_file_changed)  # type: FileWatcher
+
+    def _paths(self) -> Dict[str, bool]:
+        """ Watched paths, mapped to whether they are the configuration file itself """
+        result = {os.path.abspath(x.obwsc_config): False for x in self.config.obs_endpoints}
+        result[os.path.abspath(self.config.config_path)] = True
+        return result
+
+    def _on_file_changed(self, path: str):
+        # Editors tend to generate multiple events per save, only reload once the burst is over
+        with self.lock:
+            timer = self.reload_timers.get(path)
+            if timer is not None:
+                timer.cancel()
+
+            timer = threading.Timer(ConfigFileWatcher.DEBOUNCE_PERIOD, self._reload, (path,))
+            timer.daemon = True
+            self.reload_timers[path] = timer
+            timer.start()
+
+    def _reload(self, path: str):
+        with self.lock:
+            self.reload_timers.pop(path, None)
+
+        is_config = self._paths().get(path)
+        if is_config is None:
+            # No longer watched
+            return
+
+        if not os.path.exists(path):
+            Log.debug('Watched file removed: %s', path)
+            return
+
+        if is_config:
             self.config.reload()
+        elif self.on_obwsc_config_change is not None:
+            self.on_obwsc_config_change()
 
-    def __init__(self, config: Config):
-        config_path = os.path.abspath(config.config_path)
-        config_dir = os.path.dirname(config_path)
+    def _on_config_change(self, _: Config, diff: Config.Diff):
+        if diff.obwsc_config_changed:
+            self.file_watcher.watch(self._paths())
 
-        self.handler = ConfigFileWatcher.EventHandler(config)
-        self.observer = Observer()
-        self.observer.schedule(self.handler, path=config_dir)
+    def cancel(self):
+        with self.lock:
+            for timer in self.reload_timers.values():
+                timer.cancel()
+            self.reload_timers = {}
 
     def __enter__(self):
-        self.observer.start()
+        self.config.subscribe_to_changes(self._on_config_change)
+        self.file_watcher.watch(self._paths())
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.observer.stop()
-        self.observer.join()
+        self.config.unsubscribe_from_changes(self._on_config_change)
+        self.file_watcher.close()
+        self.cancel()
@@ -0,0 +1,257 @@
+from typing import Callable, Dict, Optional
+
+import os
+import sys
+import json
+import stat
+import socket
+import getpass
+import tempfile
+import threading
+import socketserver
+
+from scw.log import Log
+from scw.display_source import Display
+from scw import metrics
+
+if sys.platform == 'win32':
+    from multiprocessing.connection import Client, Listener
+
+
+def default_control_path() -> str:
+    if sys.platform == 'win32':
+        # Pipe names are machine-wide, so each user gets their own
+        return rf'\\.\pipe\screen-config-watcher-{getpass.getuser()}'
+
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'screen-config-watcher.sock')
+
+    return os.path.join(tempfile.gettempdir(), f'screen-config-watcher-{os.getuid()}.sock')
+
+
+class ControlServer:
+    """
+    Local JSON control API of a running watcher: one JSON object per request and response, newline-delimited on a
+    Unix domain socket, or one message each on a Windows named pipe. Requests are served on background threads, from
+    the state the engine caches on its own thread, so they never wait for the (e.g. Qt) event loop.
+
+    Requests are {"command": <name>, ...}, responses {"ok": true, "result": ...} or {"ok": false, "error": <message>}.
+    """
+
+    # Upper bound for a single request (in bytes)
+    MAX_REQUEST_SIZE = 1024 * 1024
+
+    class StreamHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            while True:
+                line = self.rfile.readline(ControlServer.MAX_REQUEST_SIZE)
+                if not line:
+                    return
+
+                if len(line) == ControlServer.MAX_REQUEST_SIZE and not line.endswith(b'\n'):
+                    self.wfile.write(b'{"ok": false, "error": "Request too large"}\n')
+                    return
+
+                if line.strip():
+                    self.wfile.write(self.server.control.handle_message(line) + b'\n')
+
+    class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    def __init__(self, engine, path: Optional[str] = None):
+        """
+        :param engine: WatcherEngine to query and control.
+        :param path: Socket path (or named pipe address on Windows), see default_control_path.
+        """
+        self.engine = engine
+        self.path = path if path is not None else default_control_path()
+        self.commands = {
+            'state': lambda _: self.engine.status(),
+            'displays': lambda _: self.engine.status()['displays'],
+            'preset': lambda _: self.engine.status()['preset'],
+            'timer': lambda _: self.engine.status()['timer'],
+            'apply': self._apply,
+            'match': self._match,
+            'metrics': lambda _: metrics.render(),
+        }  # type: Dict[str, Callable[[dict], object]]
+
+        self.server = None  # type: Optional[ControlServer.UnixServer]
+        self.listener = None  # type: Optional[Listener]
+        self.closed = False
+
+        if sys.platform == 'win32':
+            self._start_pipe_listener()
+        else:
+            self._start_unix_server()
+
+        Log.info(f'Serving the control API on {self.path}')
+
+    # Commands
+    def _apply(self, _: dict) -> dict:
+        self.engine.post_apply_now()
+        return {'scheduled': True}
+
+    def _match(self, request: dict) -> dict:
+        displays = request.get('displays')
+        if not isinstance(displays, list):
+            raise ValueError('"displays" should be a list of display names or objects')
+
+        # Matched without interning the displays, so that arbitrary requests don't grow the identity table
+        parsed = [Display(x) if isinstance(x, str) else Display.from_dict(x) for x in displays]
+        return {'presets': self.engine.match(parsed)}
+
+    def handle(self, request: dict) -> dict:
+        """ Response to a single, decoded request """
+        command = self.commands.get(request.get('command')) if isinstance(request, dict) else None
+        if command is None:
+            return {'ok': False, 'error': f'Unknown command, expected one of: {", ".join(self.commands)}'}
+
+        try:
+            return {'ok': True, 'result': command(request)}
+        except (ValueError, KeyError, TypeError, AttributeError, RuntimeError) as e:
+            return {'ok': False, 'error': str(e)}
+
+    def handle_message(self, message: bytes) -> bytes:
+        try:
+            request = json.loads(message)
+        except ValueError as e:
+            return json.dumps({'ok': False, 'error': f'Invalid JSON: {e}'}).encode('utf-8')
+
+        return json.dumps(self.handle(request)).encode('utf-8')
+
+    # Unix domain socket
+    def _remove_stale_socket(self):
+        try:
+            mode = os.lstat(self.path).st_mode
+        except FileNotFoundError:
+            return
+
+        if not stat.S_ISSOCK(mode):
+            raise RuntimeError(f'Refusing to replace {self.path}, which is not a socket')
+
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            # Left over by a process, that didn't exit cleanly
+            os.unlink(self.path)
+            return
+        finally:
+            probe.close()
+
+        raise RuntimeError(f'Another watcher is already serving the control API on {self.path}')
+
+    def _start_unix_server(self):
+        try:
+            self._remove_stale_socket()
+
+            # Only accessible by the current user
+            umask = os.umask(0o177)
+            try:
+                self.server = ControlServer.UnixServer(self.path, ControlServer.StreamHandler)
+            finally:
+                os.umask(umask)
+        except OSError as e:
+            raise RuntimeError(f'Error serving the control API on {self.path}: {e}')
+
+        self.server.control = self
+        threading.Thread(target=self.server.serve_forever, name='scw-control', daemon=True).start()
+
+    # Windows named pipe
+    def _start_pipe_listener(self):
+        try:
+            self.listener = Listener(self.path, family='AF_PIPE')
+        except OSError as e:
+            raise RuntimeError(f'Error serving the control API on {self.path}: {e}')
+
+        threading.Thread(target=self._accept_pipe_connections, name='scw-control', daemon=True).start()
+
+    def _accept_pipe_connections(self):
+        while not self.closed:
+            try:
+                connection = self.listener.accept()
+            except OSError as e:
+                if not self.closed:
+                    Log.error(f'Error accepting a control connection: {e}')
+                return
+
+            threading.Thread(target=self._serve_pipe_connection, args=(connection,), name='scw-control-client',
+                             daemon=True).start()
+
+    def _serve_pipe_connection(self, connection):
+        with connection:
+            try:
+                while True:
+                    connection.send_bytes(self.handle_message(connection.recv_bytes(ControlServer.MAX_REQUEST_SIZE)))
+            except (EOFError, OSError):
+                pass
+
+    def close(self):
+        if self.closed:
+            return
+
+        self.closed = True
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+        if self.listener is not None:
+            self.listener.close()
+
+
+class ControlClient:
+    """ Client side of the control API """
+
+    def __init__(self, path: Optional[str] = None, timeout: Optional[float] = 5.0):
+        self.path = path if path is not None else default_control_path()
+
+        try:
+            if sys.platform == 'win32':
+                self.connection = Client(self.path, family='AF_PIPE')
+                self.reader = None
+            else:
+                self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.connection.settimeout(timeout)
+                self.connection.connect(self.path)
+                self.reader = self.connection.makefile('rb')
+        except OSError as e:
+            raise RuntimeError(f'Unable to connect to the watcher on {self.path}: {e}')
+
+    def request(self, command: str, **kwargs) -> object:
+        """ Result of the command, raises RuntimeError on failure """
+        message = json.dumps(dict(kwargs, command=command)).encode('utf-8')
+
+        try:
+            if self.reader is None:
+                self.connection.send_bytes(message)
+                response = self.connection.recv_bytes()
+            else:
+                self.connection.sendall(message + b'\n')
+                response = self.reader.readline()
+        except (OSError, EOFError) as e:
+            raise RuntimeError(f'Error talking to the watcher on {self.path}: {e}')
+
+        if not response:
+            raise RuntimeError(f'The watcher on {self.path} closed the connection')
+
+        response = json.loads(response)
+        if not response.get('ok'):
+            raise RuntimeError(response.get('error'))
+
+        return response['result']
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
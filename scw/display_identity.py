@@ -0,0 +1,36 @@
+from typing import Dict, Optional
+
+import threading
+
+
+class IdentityTable:
+    """
+    Interns display identities (case-insensitive names and fingerprints) into compact integer IDs, so that matching
+    only has to compare integers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = {}  # type: Dict[str, int]
+
+    def intern(self, key: str) -> int:
+        result = self.ids.get(key)
+        if result is None:
+            with self.lock:
+                result = self.ids.setdefault(key, len(self.ids))
+        return result
+
+    def lookup(self, key: str) -> Optional[int]:
+        """ Same as intern, but doesn't grow the table: None for keys that were never interned """
+        return self.ids.get(key)
+
+
+IDENTITIES = IdentityTable()
+
+
+def name_key(name: str) -> str:
+    return 'name:' + name.lower()
+
+
+def fingerprint_key(manufacturer: str, model: str, serial: str) -> str:
+    return 'fingerprint:' + '/'.join(x.lower() for x in (manufacturer, model, serial))
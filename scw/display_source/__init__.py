@@ -0,0 +1,109 @@
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from scw.display_identity import IDENTITIES, name_key, fingerprint_key
+
+
+class Display:
+    def __init__(self, name: str, manufacturer: str = '', model: str = '', serial: str = ''):
+        self.name = name
+        self.manufacturer = manufacturer
+        self.model = model
+        self.serial = serial
+        self._identity = None  # type: Optional[Tuple[int, int]]
+
+    def __str__(self):
+        return f"name='{self.name}', manufacturer='{self.manufacturer}', model='{self.model}', s/n='{self.serial}'"
+
+    def __repr__(self):
+        return f"Display(name='{self.name}', manufacturer='{self.manufacturer}', model='{self.model}', " \
+               f"serial='{self.serial}')"
+
+    def _as_tuple(self) -> tuple:
+        return self.name, self.manufacturer, self.model, self.serial
+
+    def __eq__(self, other: 'Display'):
+        return self._as_tuple() == other._as_tuple()
+
+    def __hash__(self):
+        return hash(self._as_tuple())
+
+    def fingerprint(self) -> str:
+        return f'{self.manufacturer}/{self.model}/{self.serial}'
+
+    def identity(self) -> Tuple[int, int]:
+        """ Interned (name ID, fingerprint ID) pair, computed once per display object """
+        if self._identity is None:
+            self._identity = (IDENTITIES.intern(name_key(self.name)),
+                              IDENTITIES.intern(fingerprint_key(self.manufacturer, self.model, self.serial)))
+        return self._identity
+
+    def known_identity(self) -> Tuple[Optional[int], Optional[int]]:
+        """ Same as identity, but doesn't intern: None for a name or fingerprint no preset ever referred to """
+        return (IDENTITIES.lookup(name_key(self.name)),
+                IDENTITIES.lookup(fingerprint_key(self.manufacturer, self.model, self.serial)))
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'model': self.model,
+            'serial': self.serial,
+            'manufacturer': self.manufacturer,
+        }
+
+    @staticmethod
+    def from_dict(d: dict) -> 'Display':
+        return Display(d['name'], d.get('manufacturer', ''), d.get('model', ''), d.get('serial', ''))
+
+
+class DisplayCache:
+    """ Keeps Display objects (and thus their interned identities) per screen or connector, across enumerations """
+
+    def __init__(self):
+        self.displays = {}  # type: Dict[Hashable, Display]
+
+    def get(self, key: Hashable, factory: Callable[[], Display]) -> Display:
+        result = self.displays.get(key)
+        if result is None:
+            result = factory()
+            self.displays[key] = result
+        return result
+
+    def retain(self, keys: Iterable[Hashable]):
+        """ Forget about everything, that is not currently connected """
+        keys = set(keys)
+        self.displays = {k: v for k, v in self.displays.items() if k in keys}
+
+
+class DisplaySource:
+    """ Provides a list of currently connected displays. Instances are long-lived and reused across calls. """
+
+    def get_displays(self) -> List[Display]:
+        raise NotImplementedError()
+
+    def subscribe(self, callback: Callable[[], None]) -> bool:
+        """
+        Start reporting display changes. The callback might be called from any thread.
+        Returns False if this source is unable to detect changes.
+        """
+        return False
+
+    def close(self):
+        pass
+
+
+def create_display_source(platform: str, headless: bool = False) -> DisplaySource:
+    if platform == 'win32':
+        # Qt doesn't refresh its list of screens on Windows, so we have to ask the OS directly
+        from scw.display_source.windows import WindowsDisplaySource
+        return WindowsDisplaySource()
+
+    if headless and platform.startswith('linux'):
+        # Qt names screens after their connectors on Linux, so this one is only used when there is no Qt
+        from scw.display_source.linux import LinuxDisplaySource
+        return LinuxDisplaySource()
+
+    if headless:
+        raise RuntimeError(f'Headless mode is not supported on this platform: {platform}')
+
+    from scw.display_source.qt import QtDisplaySource
+    return QtDisplaySource()
@@ -0,0 +1,31 @@
+from typing import Callable, List, Optional
+
+from scw.display_source import Display, DisplaySource
+
+
+class FakeDisplaySource(DisplaySource):
+    """ Display source with a manually controlled display list (for testing and benchmarking). """
+
+    def __init__(self, displays: Optional[List[Display]] = None):
+        self.displays = list(displays) if displays is not None else []
+        self.num_calls = 0
+        self.callback = None  # type: Optional[Callable[[], None]]
+
+    def set_displays(self, displays: List[Display]):
+        self.displays = list(displays)
+        if self.callback is not None:
+            self.callback()
+
+    def set_display_names(self, names: List[str]):
+        self.set_displays([Display(x) for x in names])
+
+    def subscribe(self, callback: Callable[[], None]) -> bool:
+        self.callback = callback
+        return True
+
+    def close(self):
+        self.callback = None
+
+    def get_displays(self) -> List[Display]:
+        self.num_calls += 1
+        return list(self.displays)
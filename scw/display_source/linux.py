@@ -0,0 +1,25 @@
+from typing import Callable, List, Optional
+
+from scw.display_source import Display, DisplayCache, DisplaySource
+from scw.screen_change.linux import DRM_SYSFS_ROOT, UeventObserver, get_connected_displays
+
+
+class LinuxDisplaySource(DisplaySource):
+    """ In-process display source, based on the DRM connectors in sysfs and kernel hotplug uevents. """
+
+    def __init__(self, sysfs_root: str = DRM_SYSFS_ROOT):
+        self.sysfs_root = sysfs_root
+        self.observer = None  # type: Optional[UeventObserver]
+        self.cache = DisplayCache()
+
+    def get_displays(self) -> List[Display]:
+        return get_connected_displays(self.sysfs_root, self.cache)
+
+    def subscribe(self, callback: Callable[[], None]) -> bool:
+        self.observer = UeventObserver(callback)
+        return True
+
+    def close(self):
+        if self.observer is not None:
+            self.observer.destroy()
+            self.observer = None
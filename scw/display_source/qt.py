@@ -0,0 +1,40 @@
+from typing import Callable, List, Optional
+
+from PySide6.QtGui import QGuiApplication, QScreen
+
+from scw.display_source import Display, DisplayCache, DisplaySource
+from scw.log import Log
+
+
+def display_from_screen(screen: QScreen) -> Display:
+    return Display(screen.name(), screen.manufacturer(), screen.model(), screen.serialNumber())
+
+
+class QtDisplaySource(DisplaySource):
+    """ In-process display source, based on the screen list of the running Qt application. """
+
+    def __init__(self, app: Optional[QGuiApplication] = None):
+        self.app = app
+        self.cache = DisplayCache()
+
+    def _get_app(self) -> QGuiApplication:
+        return self.app if self.app is not None else QGuiApplication.instance()
+
+    def get_displays(self) -> List[Display]:
+        screens = self._get_app().screens()  # type: List[QScreen]
+        self.cache.retain(screens)
+        return [self.cache.get(x, lambda: display_from_screen(x)) for x in screens]
+
+    def subscribe(self, callback: Callable[[], None]) -> bool:
+        def screen_added(screen: QScreen):
+            Log.info(lambda: f'Screen added: {display_from_screen(screen)}')
+            callback()
+
+        def screen_removed(screen: QScreen):
+            Log.info(lambda: f'Screen removed: {display_from_screen(screen)}')
+            callback()
+
+        app = self._get_app()
+        app.screenAdded.connect(screen_added)
+        app.screenRemoved.connect(screen_removed)
+        return True
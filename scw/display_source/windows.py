@@ -0,0 +1,233 @@
+from typing import Callable, List, Optional
+
+import ctypes
+import winreg
+from ctypes import wintypes
+
+from scw.log import Log
+from scw.edid import parse_edid
+from scw.display_source import Display, DisplayCache, DisplaySource
+
+QDC_ONLY_ACTIVE_PATHS = 0x00000002
+
+DISPLAYCONFIG_DEVICE_INFO_GET_SOURCE_NAME = 1
+DISPLAYCONFIG_DEVICE_INFO_GET_TARGET_NAME = 2
+
+ERROR_SUCCESS = 0
+ERROR_INSUFFICIENT_BUFFER = 122
+
+
+class LUID(ctypes.Structure):
+    _fields_ = [('LowPart', wintypes.DWORD), ('HighPart', wintypes.LONG)]
+
+
+class DISPLAYCONFIG_RATIONAL(ctypes.Structure):
+    _fields_ = [('Numerator', ctypes.c_uint32), ('Denominator', ctypes.c_uint32)]
+
+
+class DISPLAYCONFIG_PATH_SOURCE_INFO(ctypes.Structure):
+    _fields_ = [
+        ('adapterId', LUID),
+        ('id', ctypes.c_uint32),
+        ('modeInfoIdx', ctypes.c_uint32),
+        ('statusFlags', ctypes.c_uint32),
+    ]
+
+
+class DISPLAYCONFIG_PATH_TARGET_INFO(ctypes.Structure):
+    _fields_ = [
+        ('adapterId', LUID),
+        ('id', ctypes.c_uint32),
+        ('modeInfoIdx', ctypes.c_uint32),
+        ('outputTechnology', ctypes.c_uint32),
+        ('rotation', ctypes.c_uint32),
+        ('scaling', ctypes.c_uint32),
+        ('refreshRate', DISPLAYCONFIG_RATIONAL),
+        ('scanLineOrdering', ctypes.c_uint32),
+        ('targetAvailable', wintypes.BOOL),
+        ('statusFlags', ctypes.c_uint32),
+    ]
+
+
+class DISPLAYCONFIG_PATH_INFO(ctypes.Structure):
+    _fields_ = [
+        ('sourceInfo', DISPLAYCONFIG_PATH_SOURCE_INFO),
+        ('targetInfo', DISPLAYCONFIG_PATH_TARGET_INFO),
+        ('flags', ctypes.c_uint32),
+    ]
+
+
+class DISPLAYCONFIG_MODE_INFO(ctypes.Structure):
+    # We never look into the mode union, it only has to have the right size (48 bytes, 8-byte aligned)
+    _fields_ = [
+        ('infoType', ctypes.c_uint32),
+        ('id', ctypes.c_uint32),
+        ('adapterId', LUID),
+        ('modeInfo', ctypes.c_uint64 * 6),
+    ]
+
+
+class DISPLAYCONFIG_DEVICE_INFO_HEADER(ctypes.Structure):
+    _fields_ = [
+        ('type', ctypes.c_uint32),
+        ('size', ctypes.c_uint32),
+        ('adapterId', LUID),
+        ('id', ctypes.c_uint32),
+    ]
+
+
+class DISPLAYCONFIG_SOURCE_DEVICE_NAME(ctypes.Structure):
+    _fields_ = [
+        ('header', DISPLAYCONFIG_DEVICE_INFO_HEADER),
+        ('viewGdiDeviceName', wintypes.WCHAR * 32),
+    ]
+
+
+class DISPLAYCONFIG_TARGET_DEVICE_NAME(ctypes.Structure):
+    _fields_ = [
+        ('header', DISPLAYCONFIG_DEVICE_INFO_HEADER),
+        ('flags', ctypes.c_uint32),
+        ('outputTechnology', ctypes.c_uint32),
+        ('edidManufactureId', ctypes.c_uint16),
+        ('edidProductCodeId', ctypes.c_uint16),
+        ('connectorInstance', ctypes.c_uint32),
+        ('monitorFriendlyDeviceName', wintypes.WCHAR * 64),
+        ('monitorDevicePath', wintypes.WCHAR * 128),
+    ]
+
+
+def _decode_pnp_id(edid_manufacture_id: int) -> str:
+    """ Decode the compressed 3-letter PNP manufacturer ID (stored big-endian in the EDID) """
+    if edid_manufacture_id == 0:
+        return ''
+
+    value = ((edid_manufacture_id & 0xFF) << 8) | (edid_manufacture_id >> 8)
+    return ''.join(chr(((value >> shift) & 0x1F) + ord('A') - 1) for shift in (10, 5, 0))
+
+
+def _read_edid(device_path: str) -> Optional[bytes]:
+    """
+    Read the EDID of a monitor from the registry, given its device interface path, e.g.
+    "\\\\?\\DISPLAY#DEL4109#5&1a2b3c&0&UID4353#{e6f07b5f-ee97-4a90-b076-33f57bf4eaa7}".
+    """
+    # The device instance ID is the interface path without the prefix and the interface class GUID
+    parts = device_path.split('\\')[-1].split('#')
+    if len(parts) < 3:
+        return None
+
+    key_path = 'SYSTEM\\CurrentControlSet\\Enum\\' + '\\'.join(parts[:3]) + '\\Device Parameters'
+    try:
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, key_path) as key:
+            value, value_type = winreg.QueryValueEx(key, 'EDID')
+    except OSError as e:
+        Log.debug('No EDID for %s: %s', device_path, e)
+        return None
+
+    return value if value_type == winreg.REG_BINARY else None
+
+
+def _display_from_target(name: str, target: DISPLAYCONFIG_TARGET_DEVICE_NAME) -> Display:
+    edid = parse_edid(_read_edid(target.monitorDevicePath) or b'')
+    if edid is not None:
+        # Same fingerprint as on Linux, which reads the very same EDID
+        manufacturer, model, serial = edid
+        return Display(name, manufacturer, model, serial)
+
+    return Display(name, _decode_pnp_id(target.edidManufactureId),
+                   f'{target.edidProductCodeId:04X}' if target.edidProductCodeId else '')
+
+
+# noinspection PyPep8Naming
+class WindowsDisplaySource(DisplaySource):
+    """ In-process display source, based on the Windows Display Configuration API. """
+
+    def __init__(self):
+        self.user32 = ctypes.WinDLL('user32')
+
+        self.GetDisplayConfigBufferSizes = self.user32.GetDisplayConfigBufferSizes
+        self.GetDisplayConfigBufferSizes.argtypes = [ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint32),
+                                                     ctypes.POINTER(ctypes.c_uint32)]
+        self.GetDisplayConfigBufferSizes.restype = wintypes.LONG
+
+        self.QueryDisplayConfig = self.user32.QueryDisplayConfig
+        self.QueryDisplayConfig.argtypes = [ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint32),
+                                            ctypes.POINTER(DISPLAYCONFIG_PATH_INFO), ctypes.POINTER(ctypes.c_uint32),
+                                            ctypes.POINTER(DISPLAYCONFIG_MODE_INFO), ctypes.c_void_p]
+        self.QueryDisplayConfig.restype = wintypes.LONG
+
+        self.DisplayConfigGetDeviceInfo = self.user32.DisplayConfigGetDeviceInfo
+        self.DisplayConfigGetDeviceInfo.argtypes = [ctypes.POINTER(DISPLAYCONFIG_DEVICE_INFO_HEADER)]
+        self.DisplayConfigGetDeviceInfo.restype = wintypes.LONG
+
+        self.change_thread = None
+        self.cache = DisplayCache()
+
+    def _query_paths(self) -> List[DISPLAYCONFIG_PATH_INFO]:
+        while True:
+            num_paths = ctypes.c_uint32(0)
+            num_modes = ctypes.c_uint32(0)
+            res = self.GetDisplayConfigBufferSizes(QDC_ONLY_ACTIVE_PATHS, ctypes.byref(num_paths),
+                                                   ctypes.byref(num_modes))
+            if res != ERROR_SUCCESS:
+                raise ctypes.WinError(res)
+
+            paths = (DISPLAYCONFIG_PATH_INFO * num_paths.value)()
+            modes = (DISPLAYCONFIG_MODE_INFO * num_modes.value)()
+            res = self.QueryDisplayConfig(QDC_ONLY_ACTIVE_PATHS, ctypes.byref(num_paths), paths,
+                                          ctypes.byref(num_modes), modes, None)
+            if res == ERROR_INSUFFICIENT_BUFFER:
+                # Display configuration changed between the two calls
+                continue
+
+            if res != ERROR_SUCCESS:
+                raise ctypes.WinError(res)
+
+            return list(paths[:num_paths.value])
+
+    def _get_device_info(self, info, info_type: int, adapter_id: LUID, device_id: int):
+        info.header.type = info_type
+        info.header.size = ctypes.sizeof(info)
+        info.header.adapterId = adapter_id
+        info.header.id = device_id
+
+        res = self.DisplayConfigGetDeviceInfo(ctypes.byref(info.header))
+        if res != ERROR_SUCCESS:
+            raise ctypes.WinError(res)
+
+        return info
+
+    def get_displays(self) -> List[Display]:
+        result = []  # type: List[Display]
+        keys = []
+
+        for path in self._query_paths():
+            target = self._get_device_info(DISPLAYCONFIG_TARGET_DEVICE_NAME(), DISPLAYCONFIG_DEVICE_INFO_GET_TARGET_NAME,
+                                           path.targetInfo.adapterId, path.targetInfo.id)
+
+            name = target.monitorFriendlyDeviceName
+            if not name:
+                # Some (mostly built-in) displays don't report a friendly name, use the GDI name instead
+                source = self._get_device_info(DISPLAYCONFIG_SOURCE_DEVICE_NAME(),
+                                               DISPLAYCONFIG_DEVICE_INFO_GET_SOURCE_NAME,
+                                               path.sourceInfo.adapterId, path.sourceInfo.id)
+                name = source.viewGdiDeviceName
+
+            # The EDID is only read from the registry for displays, that weren't seen before
+            key = (path.targetInfo.adapterId.LowPart, path.targetInfo.adapterId.HighPart, path.targetInfo.id, name,
+                   target.edidManufactureId, target.edidProductCodeId, target.monitorDevicePath)
+            keys.append(key)
+            result.append(self.cache.get(key, lambda: _display_from_target(name, target)))
+
+        self.cache.retain(keys)
+        return result
+
+    def subscribe(self, callback: Callable[[], None]) -> bool:
+        from scw.screen_change.windows import ScreenChangeThread
+        self.change_thread = ScreenChangeThread(lambda *_: callback())
+        return True
+
+    def close(self):
+        if self.change_thread is not None:
+            self.change_thread.stop()
+            self.change_thread = None
+        self.cache = DisplayCache()
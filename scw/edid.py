@@ -0,0 +1,49 @@
+from typing import Optional, Tuple
+
+EDID_HEADER = b'\x00\xff\xff\xff\xff\xff\xff\x00'
+EDID_BLOCK_SIZE = 128
+EDID_DESCRIPTOR_OFFSETS = (54, 72, 90, 108)
+EDID_DESCRIPTOR_SERIAL = 0xFF
+EDID_DESCRIPTOR_NAME = 0xFC
+
+
+def _edid_descriptor_text(descriptor: bytes) -> str:
+    text = descriptor[5:18].split(b'\x0a', 1)[0]
+    return text.decode('cp437').strip()
+
+
+def parse_edid(data: bytes) -> Optional[Tuple[str, str, str]]:
+    """ Extract the (manufacturer ID, monitor name, serial) from an EDID blob, None if the blob is invalid. """
+    if len(data) < EDID_BLOCK_SIZE or data[:8] != EDID_HEADER:
+        return None
+
+    # The bytes of the base block sum up to 0 (mod 256), anything else is a corrupt read
+    if sum(data[:EDID_BLOCK_SIZE]) & 0xFF != 0:
+        return None
+
+    vendor = (data[8] << 8) | data[9]
+    manufacturer = ''.join(chr(((vendor >> shift) & 0x1F) + ord('A') - 1) for shift in (10, 5, 0))
+
+    product_code = data[10] | (data[11] << 8)
+    serial_number = int.from_bytes(data[12:16], 'little')
+
+    name = ''
+    serial = ''
+    for offset in EDID_DESCRIPTOR_OFFSETS:
+        descriptor = data[offset:offset + 18]
+        if descriptor[0:2] != b'\x00\x00':
+            # Detailed timing descriptor
+            continue
+
+        if descriptor[3] == EDID_DESCRIPTOR_NAME:
+            name = _edid_descriptor_text(descriptor)
+        elif descriptor[3] == EDID_DESCRIPTOR_SERIAL:
+            serial = _edid_descriptor_text(descriptor)
+
+    if not name:
+        name = f'{manufacturer} {product_code:04X}'
+
+    if not serial and serial_number != 0:
+        serial = str(serial_number)
+
+    return manufacturer, name, serial
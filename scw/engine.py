@@ -0,0 +1,370 @@
+from typing import List, Optional, Tuple, Union, TYPE_CHECKING
+
+import sys
+
+from scw.log import Log
+from scw.options import Options
+from scw.config import Config
+from scw.display_source import Display, DisplaySource
+from scw.event_loop import EventLoop
+from scw.obs_fanout import ObsFanout
+from scw.settle_scheduler import SettleScheduler
+from scw.warm_state import WarmState, WarmStateStore, display_set_digest
+from scw import metrics
+
+if TYPE_CHECKING:
+    # Only imported when enabled
+    from scw.trace import TraceRecorder
+    from scw.metrics_exporter import MetricsHttpServer, MetricsTextfileWriter
+    from scw.control_server import ControlServer
+
+
+class WatcherEngine:
+    """
+    GUI-independent watcher logic: keeps track of the connected displays, matches them against the configured presets
+    and drives OBS. All the methods are expected to be called on the event loop thread.
+    """
+
+    def __init__(self, options: Options, display_source: DisplaySource, loop: EventLoop,
+                 obs: Optional[ObsFanout] = None, obs_queue: Optional[ObsFanout] = None,
+                 watch_screen_lock: bool = True):
+        """
+        :param obs: Reflects the OBS state, the command queue by default.
+        :param obs_queue: Executes the OBS commands, a fan-out to the configured OBS endpoints by default.
+        :param watch_screen_lock: Subscribe to the screen lock events of the OS (disabled e.g. for replaying traces).
+        """
+        self.options = options
+        self.display_source = display_source
+        self.loop = loop
+
+        if obs_queue is None:
+            obs_queue = ObsFanout(self.options.config.obs_endpoints, self._post_command_finished,
+                                  self._post_command_completed)
+        self.obs_queue = obs_queue
+        self.obs = obs if obs is not None else obs_queue
+        self.dry_run_applied = None  # type: Optional[Tuple[str, str]]
+
+        # Nothing is applied in the dry-run mode, so there is nothing to remember either
+        self.state_store = None  # type: Optional[WarmStateStore]
+        if self.options.state_file is not None and not self.options.dry_run:
+            self.state_store = WarmStateStore(self.options.state_file)
+
+        # State to store, once the switch to it has completed
+        self.pending_state = None  # type: Optional[WarmState]
+
+        self.scheduler = SettleScheduler(loop, self.options.config, self._has_single_match, self.apply_changes)
+
+        self.options.config.subscribe_to_changes(self._post_config_change)
+
+        Log.info('Listing current screens...')
+        displays = self.display_source.get_displays()
+        for display in displays:
+            Log.info('%s', display)
+
+        self.last_displays = displays
+        self.last_screens = [x.name for x in displays]
+
+        # Snapshots for the control API, replaced (never modified) on the event loop thread
+        self.applied_preset = None  # type: Optional[str]
+        self.status_displays = []  # type: List[dict]
+        self.status_preset = {}  # type: dict
+        self._update_status()
+
+        self.recorder = None  # type: Optional[TraceRecorder]
+        if self.options.trace_path is not None:
+            from scw.trace import TraceRecorder
+            self.recorder = TraceRecorder(self.options.trace_path, loop.time)
+            self.recorder.record_config(self.options.config.config_path)
+            self.recorder.record_displays(displays)
+
+        self.metrics_exporters = []  # type: List[Union[MetricsHttpServer, MetricsTextfileWriter]]
+        if self.options.metrics_port is not None:
+            from scw.metrics_exporter import MetricsHttpServer
+            self.metrics_exporters.append(MetricsHttpServer(self.options.metrics_port))
+        if self.options.metrics_textfile is not None:
+            from scw.metrics_exporter import MetricsTextfileWriter
+            self.metrics_exporters.append(MetricsTextfileWriter(self.options.metrics_textfile))
+
+        self.control_server = None  # type: Optional[ControlServer]
+        if self.options.control_socket is not None:
+            from scw.control_server import ControlServer
+            self.control_server = ControlServer(self, self.options.control_socket)
+
+        if not self.display_source.subscribe(self._post_display_change):
+            Log.warning('Display source does not report display changes')
+
+        self.screen_lock_listener = self._subscribe_to_screen_lock_events() if watch_screen_lock else None
+        self.closed = False
+
+    # Thread-safe entry points
+    def _post_display_change(self):
+        self.loop.call_soon_threadsafe(self.refresh_displays)
+
+    def _post_config_change(self, config: Config, diff: Config.Diff):
+        self.loop.call_soon_threadsafe(self.handle_config_change, config, diff)
+
+    def post_obwsc_config_change(self):
+        self.loop.call_soon_threadsafe(self.handle_obwsc_config_change)
+
+    def _post_command_finished(self, command: str, success: bool, error: str):
+        self.loop.call_soon_threadsafe(self._on_command_finished, command, success, error)
+
+    def post_apply_now(self):
+        self.loop.call_soon_threadsafe(self.apply_now)
+
+    def _post_command_completed(self, submission: ObsFanout.Submission):
+        self.loop.call_soon_threadsafe(self._on_command_completed, submission.command, len(submission.errors) == 0)
+
+    def refresh_displays(self):
+        Log.debug('Display configuration changed, getting a fresh display list')
+
+        try:
+            with metrics.DISPLAY_QUERY_SECONDS.time():
+                displays = self.display_source.get_displays()
+        except OSError as e:
+            Log.error(f'Error getting the display list: {e}')
+            return
+
+        if self.recorder is not None:
+            self.recorder.record_displays(displays)
+
+        # Identities are interned, so a renamed, but otherwise the same display set is still detected as a change
+        old_identities = sorted(x.identity() for x in self.last_displays)
+        new_identities = sorted(x.identity() for x in displays)
+
+        if old_identities != new_identities:
+            metrics.DISPLAY_CHANGES.inc()
+            Log.info('Software configuration changed')
+            for display in displays:
+                Log.info('%s', display)
+
+            self._restart_timer()
+
+        self.last_displays = displays
+        self.last_screens = [x.name for x in displays]
+        self._update_status()
+
+    def _subscribe_to_screen_lock_events(self):
+        if sys.platform == 'darwin':
+            from scw.screen_lock.macos import MacOS
+            return MacOS(on_lock=self.on_screen_locked, on_unlock=self.on_screen_unlocked)
+
+        if sys.platform.startswith('linux'):
+            from scw.screen_lock.linux import Logind
+            try:
+                return Logind(self.loop, on_lock=self.on_screen_locked, on_unlock=self.on_screen_unlocked)
+            except RuntimeError as e:
+                Log.warning(f'Screen lock events are not available, recording will not be paused on lock: {e}')
+                return None
+
+        # TODO: Windows
+
+    def _run_obws_command(self, *args, endpoints: Optional[List[str]] = None):
+        """
+        :param endpoints: Names of the OBS endpoints to run the command on, all of them by default.
+        """
+        Log.debug(lambda: f'Running OBWS command: {" ".join(str(x) for x in args)}')
+        if self.options.dry_run:
+            Log.debug('Dry run, skipping')
+            return
+
+        self.obs_queue.submit(*args, endpoints=endpoints)
+
+    def _on_command_finished(self, command: str, success: bool, error: str):
+        if success:
+            Log.debug('OBWS command finished: %s', command)
+        else:
+            Log.error(f'Command error ({command}): {error}')
+
+    def _on_command_completed(self, command: str, success: bool):
+        if not command.startswith('switch-profile-and-scene-collection '):
+            return
+
+        state, self.pending_state = self.pending_state, None
+        if success and state is not None and self.state_store is not None:
+            self.state_store.store(state)
+
+    def _current_state(self, preset: Config.Preset) -> Optional[WarmState]:
+        config = self.options.config
+        if self.state_store is None or config.content_hash is None:
+            return None
+
+        return WarmState(config.config_path, config.content_hash, display_set_digest(self.last_displays), preset.name)
+
+    def _try_warm_start(self) -> bool:
+        """ Skip the grace period and the switch, if the same preset was applied to the same displays before """
+        if self.state_store is None:
+            return False
+
+        stored = self.state_store.load()
+        if stored is None:
+            return False
+
+        presets = self.options.config.find_matching_preset_for_displays(self.last_displays)
+        if len(presets) != 1 or self._current_state(presets[0]) != stored:
+            Log.debug('Stale state file, applying the displays as usual: %s', stored)
+            return False
+
+        Log.info(f'Displays and configuration unchanged since the last run, keeping preset: {presets[0].name}')
+        self.applied_preset = presets[0].name
+        self._update_status(presets)
+        metrics.SWITCHES_SKIPPED.inc()
+        self._finish_startup_profile()
+        return True
+
+    def on_screen_locked(self):
+        if self.recorder is not None:
+            self.recorder.record_lock(True)
+
+        self._run_obws_command('pause-record')
+
+    def on_screen_unlocked(self):
+        if self.recorder is not None:
+            self.recorder.record_lock(False)
+
+        self._run_obws_command('resume-record')
+
+    def _restart_timer(self):
+        self.scheduler.notify()
+
+    def _has_single_match(self) -> bool:
+        return len(self.options.config.find_matching_preset_for_displays(self.last_displays)) == 1
+
+    def handle_config_change(self, config: Config, diff: Config.Diff):
+        self._update_status()
+
+        if self.recorder is not None:
+            try:
+                self.recorder.record_config(config.config_path)
+            except OSError as e:
+                Log.warning(f'Error recording the configuration change: {e}')
+
+        if diff.obwsc_config_changed:
+            # Potentially a different OBS instance, which has to be brought up to date
+            self.obs_queue.update_endpoints(config.obs_endpoints)
+            self._restart_timer()
+        elif diff.affects(self.last_displays):
+            self._restart_timer()
+        elif diff.timing_changed:
+            self.scheduler.reschedule()
+        else:
+            Log.debug('Configuration change does not affect the current displays')
+
+    def handle_obwsc_config_change(self):
+        # Potentially a different OBS instance, which has to be brought up to date
+        self.obs_queue.reload_connection_settings()
+        self._restart_timer()
+
+    def start(self):
+        if self.options.startup_profile is not None:
+            self.options.startup_profile.mark('engine started')
+
+        if not self._try_warm_start():
+            self._restart_timer()
+
+    def _finish_startup_profile(self):
+        profile = self.options.startup_profile
+        if profile is None or profile.has_mark('first match'):
+            return
+
+        profile.mark('first match')
+        profile.remove_import_hook()
+        print(profile.report(), file=sys.stderr)
+
+        # Might be called before the loop is running (see _try_warm_start), where stopping it would have no effect
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def _update_status(self, presets: Optional[List[Config.Preset]] = None):
+        if presets is None:
+            presets = self.options.config.find_matching_preset_for_displays(self.last_displays)
+
+        self.status_displays = [x.to_dict() for x in self.last_displays]
+        self.status_preset = {'matching': [x.name for x in presets], 'applied': self.applied_preset}
+
+    def status(self) -> dict:
+        """ Displays, matching presets and the switch timer state, safe to call from any thread """
+        return {'displays': self.status_displays, 'preset': self.status_preset, 'timer': self.scheduler.snapshot()}
+
+    def match(self, displays: List[Display]) -> List[str]:
+        """ Names of the presets, matching the displays (without applying anything), safe to call from any thread """
+        return [x.name for x in self.options.config.find_matching_preset_for_displays(displays)]
+
+    def apply_now(self):
+        """ Apply the current displays right away, without waiting for them to settle """
+        Log.info('Applying the current displays on request')
+        self.scheduler.stop()
+        self.apply_changes(force=True)
+
+    def apply_changes(self, force: bool = False):
+        """
+        :param force: Switch even if the preset is known to be active already.
+        """
+        Log.debug('Applying changes...')
+
+        presets = self.options.config.find_matching_preset_for_displays(self.last_displays)
+        self._finish_startup_profile()
+
+        if len(presets) == 0:
+            metrics.SWITCHES_UNMATCHED.inc()
+            Log.warning(f'No preset found for {self.last_screens}')
+            return
+
+        if len(presets) > 1:
+            metrics.SWITCHES_AMBIGUOUS.inc()
+            Log.warning(f'Multiple presets found for {self.last_screens}: {[x.name for x in presets]}')
+            return
+
+        preset = presets[0]
+        self.applied_preset = preset.name
+        self._update_status(presets)
+
+        state = self._current_state(preset)
+        if not force and not self._is_switch_needed(preset):
+            if state is not None:
+                self.state_store.store(state)
+
+            metrics.SWITCHES_SKIPPED.inc()
+            Log.debug('Preset already active: %s. Skipped switches: %d, applied switches: %d', preset.name,
+                      metrics.SWITCHES_SKIPPED.value, metrics.SWITCHES_APPLIED.value)
+            return
+
+        Log.debug('Applying preset: %s. Profile: %s, Scene Collection: %s', preset.name, preset.profile_name,
+                  preset.scene_collection_name)
+
+        metrics.SWITCHES_APPLIED.inc()
+        self.dry_run_applied = (preset.profile_name, preset.scene_collection_name)
+        self.pending_state = state
+        self._run_obws_command('switch-profile-and-scene-collection', preset.profile_name,
+                               preset.scene_collection_name, preset.request_batch, endpoints=preset.endpoints)
+
+    def _is_switch_needed(self, preset: Config.Preset) -> bool:
+        if self.obs_queue.has_pending('switch-profile-and-scene-collection'):
+            # Whatever is queued would override the current OBS state
+            return True
+
+        if self.options.dry_run:
+            return self.dry_run_applied != (preset.profile_name, preset.scene_collection_name)
+
+        return not self.obs.is_current(preset.profile_name, preset.scene_collection_name, preset.endpoints)
+
+    def close(self):
+        if self.closed:
+            return
+
+        self.closed = True
+        self.options.config.unsubscribe_from_changes(self._post_config_change)
+        self.scheduler.stop()
+        self.display_source.close()
+        self.obs_queue.close()
+
+        if self.control_server is not None:
+            self.control_server.close()
+
+        if self.screen_lock_listener is not None:
+            self.screen_lock_listener.close()
+
+        if self.recorder is not None:
+            self.recorder.close()
+
+        for exporter in self.metrics_exporters:
+            exporter.close()
@@ -0,0 +1,36 @@
+from typing import Callable
+
+import time
+
+
+class Timer:
+    """ Single-shot timer, provided by the event loop the engine is running on """
+
+    def start(self, seconds: float):
+        """ (Re-)start the timer """
+        raise NotImplementedError()
+
+    def stop(self):
+        raise NotImplementedError()
+
+    def is_active(self) -> bool:
+        raise NotImplementedError()
+
+
+class EventLoop:
+    """ Event loop, the engine is running on """
+
+    def create_timer(self, callback: Callable[[], None]) -> Timer:
+        raise NotImplementedError()
+
+    def call_soon_threadsafe(self, callback: Callable[..., None], *args):
+        """ Schedule a callback to be called on the event loop thread, can be called from any thread """
+        raise NotImplementedError()
+
+    def stop(self):
+        """ Stop running the loop, quitting the application """
+        raise NotImplementedError()
+
+    def time(self) -> float:
+        """ Current time of the event loop clock (in seconds) """
+        return time.monotonic()
@@ -0,0 +1,87 @@
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import os
+import threading
+
+from scw.log import Log
+
+# Inode, modification time and size: changes whenever a file is written, replaced or removed
+FileState = Optional[Tuple[int, int, int]]
+
+
+def file_state(path: str) -> FileState:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class FileWatcher:
+    """ Watches a set of individual files (not their directories), reporting changes from a background thread. """
+
+    def __init__(self, callback: Callable[[str], None]):
+        """
+        :param callback: Called with the absolute path of a watched file, whenever it might have changed.
+        """
+        self.callback = callback
+
+    def watch(self, paths: Iterable[str]):
+        """ Replace the set of watched files, the files don't have to exist yet """
+        raise NotImplementedError()
+
+    def close(self):
+        raise NotImplementedError()
+
+
+class PollingFileWatcher(FileWatcher):
+    """ Portable fallback: compares the stat results of the watched files periodically. """
+
+    # Time between two checks (in seconds)
+    INTERVAL = 1.0
+
+    def __init__(self, callback: Callable[[str], None], interval: float = INTERVAL):
+        super().__init__(callback)
+
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.states = {}  # type: Dict[str, FileState]
+        self.stopped = threading.Event()
+
+        self.thread = threading.Thread(target=self._run, name='scw-file-polling', daemon=True)
+        self.thread.start()
+
+    def watch(self, paths: Iterable[str]):
+        states = {x: file_state(x) for x in set(os.path.abspath(x) for x in paths)}
+        with self.lock:
+            self.states = states
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            with self.lock:
+                paths = list(self.states)
+
+            for path in paths:
+                state = file_state(path)
+                with self.lock:
+                    if path not in self.states or self.states[path] == state:
+                        continue
+                    self.states[path] = state
+
+                self.callback(path)
+
+    def close(self, timeout: Optional[float] = 5.0):
+        self.stopped.set()
+        self.thread.join(timeout)
+
+
+def create_file_watcher(platform: str, callback: Callable[[str], None]) -> FileWatcher:
+    if platform.startswith('linux'):
+        from scw.file_watcher.linux import InotifyFileWatcher
+        try:
+            return InotifyFileWatcher(callback)
+        except OSError as e:
+            Log.warning(f'Unable to use inotify ({e}), polling the configuration files instead')
+
+    return PollingFileWatcher(callback)
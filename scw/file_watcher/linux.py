@@ -0,0 +1,161 @@
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import os
+import ctypes
+import struct
+import socket
+import selectors
+import threading
+
+from scw.log import Log
+from scw.file_watcher import FileWatcher
+
+# From sys/inotify.h
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+# Changes of the watched file itself
+FILE_MASK = IN_CLOSE_WRITE | IN_ATTRIB | IN_DELETE_SELF | IN_MOVE_SELF
+
+# Only new directory entries (e.g. the rename target of an atomic save), not the writes to the other files
+DIRECTORY_MASK = IN_CREATE | IN_MOVED_TO | IN_ONLYDIR
+
+# struct inotify_event: wd, mask, cookie, len (followed by the name)
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_libc() -> ctypes.CDLL:
+    libc = ctypes.CDLL(None, use_errno=True)
+    if not hasattr(libc, 'inotify_init1'):
+        raise OSError('inotify is not supported by the C library')
+
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+class InotifyFileWatcher(FileWatcher):
+    """
+    Watches individual files through inotify. Besides the files themselves, only the creation and rename events of
+    their directories are subscribed to, so that atomic saves (write a temporary file and rename it) are noticed.
+    """
+
+    def __init__(self, callback: Callable[[str], None]):
+        super().__init__(callback)
+
+        self.libc = _load_libc()
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f'inotify_init1: {os.strerror(errno)}')
+
+        self.lock = threading.Lock()
+        self.file_watches = {}  # type: Dict[int, str]
+        self.directory_watches = {}  # type: Dict[int, str]
+        self.paths = set()  # type: Set[str]
+
+        self.stop_read, self.stop_write = socket.socketpair()
+
+        self.thread = threading.Thread(target=self._run, name='scw-inotify', daemon=True)
+        self.thread.start()
+
+    def _add_watch(self, path: str, mask: int) -> Optional[int]:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            Log.debug('Unable to watch %s: %s', path, os.strerror(ctypes.get_errno()))
+            return None
+        return wd
+
+    def _rewatch_file(self, path: str):
+        """ (Re-)subscribe to the file, currently at the path, e.g. after it was replaced """
+        for wd in [k for k, v in self.file_watches.items() if v == path]:
+            del self.file_watches[wd]
+            self.libc.inotify_rm_watch(self.fd, wd)
+
+        wd = self._add_watch(path, FILE_MASK)
+        if wd is not None:
+            self.file_watches[wd] = path
+
+    def watch(self, paths: Iterable[str]):
+        with self.lock:
+            for wd in list(self.file_watches) + list(self.directory_watches):
+                self.libc.inotify_rm_watch(self.fd, wd)
+
+            self.file_watches = {}
+            self.directory_watches = {}
+            self.paths = set(os.path.abspath(x) for x in paths)
+
+            for directory in set(os.path.dirname(x) for x in self.paths):
+                wd = self._add_watch(directory, DIRECTORY_MASK)
+                if wd is not None:
+                    self.directory_watches[wd] = directory
+
+            for path in self.paths:
+                self._rewatch_file(path)
+
+    def _handle_events(self, data: bytes) -> Set[str]:
+        changed = set()  # type: Set[str]
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\x00')
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost
+                changed.update(self.paths)
+            elif mask & IN_IGNORED:
+                continue
+            elif wd in self.directory_watches:
+                path = os.path.join(self.directory_watches[wd], os.fsdecode(name))
+                if path in self.paths:
+                    self._rewatch_file(path)
+                    changed.add(path)
+            elif wd in self.file_watches:
+                path = self.file_watches[wd]
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    # The watch stays with the old file, if it was renamed
+                    self._rewatch_file(path)
+                changed.add(path)
+
+        return changed
+
+    def _run(self):
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.fd, selectors.EVENT_READ)
+            selector.register(self.stop_read, selectors.EVENT_READ)
+
+            while True:
+                changed = []  # type: List[str]
+                for key, _ in selector.select():
+                    if key.fileobj is self.stop_read:
+                        return
+
+                    try:
+                        data = os.read(self.fd, 65536)
+                    except BlockingIOError:
+                        continue
+                    except OSError:
+                        return
+
+                    with self.lock:
+                        changed.extend(self._handle_events(data))
+
+                for path in changed:
+                    self.callback(path)
+
+    def close(self, timeout: Optional[float] = 5.0):
+        self.stop_write.send(b'\x00')
+        self.thread.join(timeout)
+
+        os.close(self.fd)
+        self.stop_read.close()
+        self.stop_write.close()
@@ -0,0 +1,97 @@
+from typing import Callable, Optional
+
+import asyncio
+import signal
+import sys
+
+from sys import platform
+
+from scw.log import Log
+from scw.options import Options
+from scw.config_file_watcher import ConfigFileWatcher
+from scw.display_source import DisplaySource, create_display_source
+from scw.engine import WatcherEngine
+from scw.event_loop import EventLoop, Timer
+
+
+class AsyncioTimer(Timer):
+    def __init__(self, loop: asyncio.AbstractEventLoop, callback: Callable[[], None]):
+        self.loop = loop
+        self.callback = callback
+        self.handle = None  # type: Optional[asyncio.TimerHandle]
+
+    def _on_timeout(self):
+        self.handle = None
+        self.callback()
+
+    def start(self, seconds: float):
+        self.stop()
+        self.handle = self.loop.call_later(seconds, self._on_timeout)
+
+    def stop(self):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+    def is_active(self) -> bool:
+        return self.handle is not None
+
+
+class AsyncioEventLoop(EventLoop):
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+
+    def create_timer(self, callback: Callable[[], None]) -> Timer:
+        return AsyncioTimer(self.loop, callback)
+
+    def call_soon_threadsafe(self, callback: Callable[..., None], *args):
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self):
+        self.loop.stop()
+
+    def time(self) -> float:
+        return self.loop.time()
+
+
+class HeadlessApp:
+    """ Runs the watcher engine on a plain asyncio event loop, without importing the Qt GUI stack. """
+
+    def __init__(self, options: Options, display_source: Optional[DisplaySource] = None):
+        self.options = options
+        self.loop = asyncio.new_event_loop()
+
+        if display_source is None:
+            display_source = create_display_source(platform, headless=True)
+
+        self.engine = WatcherEngine(options, display_source, AsyncioEventLoop(self.loop))
+
+    def _install_signal_handlers(self):
+        signals = [signal.SIGINT, signal.SIGTERM]
+        if platform != 'win32':
+            signals.append(signal.SIGQUIT)
+
+        for signal_number in signals:
+            try:
+                self.loop.add_signal_handler(signal_number, self.signal_handler, signal_number)
+            except NotImplementedError:
+                # Windows: the loop is still woken up through its wakeup file descriptor
+                signal.signal(signal_number,
+                              lambda n, _: self.loop.call_soon_threadsafe(self.signal_handler, n))
+
+    def signal_handler(self, signal_number):
+        Log.debug(f'Received signal: {signal_number}. Quitting...')
+        self.loop.stop()
+
+    def run(self):
+        self._install_signal_handlers()
+
+        with ConfigFileWatcher(config=self.options.config, on_obwsc_config_change=self.engine.post_obwsc_config_change):
+            self.engine.start()
+            try:
+                self.loop.run_forever()
+            finally:
+                self.engine.close()
+                self.loop.close()
+
+        sys.exit(0)
@@ -1,17 +1,28 @@
 from argparse import ArgumentParser
 
 import logging
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
 from obwsc.log import Log as ObwscLog
 
+if TYPE_CHECKING:
+    # Only imported at runtime if the queue is used, see Log.__init__
+    from logging.handlers import QueueListener
+
 
 class Log:
     INSTANCE = None  # type: Optional[Log]
     LOGGER_NAME = 'scw'
     FORMAT_STRING = '[%(asctime)s][%(levelname)s][%(name)s] %(message)s'
 
-    def __init__(self, level: int):
+    # Cached level checks, so that disabled messages cost a single attribute lookup
+    DEBUG_ENABLED = False
+    INFO_ENABLED = False
+
+    def __init__(self, level: int, use_queue: bool = False):
+        """
+        :param use_queue: Hand the records over to a listener thread, which does the actual (potentially slow) output.
+        """
         self.formatter = logging.Formatter(Log.FORMAT_STRING)
         self.level = level
 
@@ -19,18 +30,38 @@ class Log:
         self.logger.setLevel(level)
         self.logger.propagate = False
 
-        self._add_handler(self.logger, logging.StreamHandler())
+        self.listener = None  # type: Optional[QueueListener]
 
-    def _add_handler(self, logger, handler):
+        handler = logging.StreamHandler()
         handler.setLevel(self.level)
         handler.setFormatter(self.formatter)
-        logger.addHandler(handler)
+
+        if use_queue:
+            import atexit
+            import queue
+            from logging.handlers import QueueHandler, QueueListener
+
+            records = queue.SimpleQueue()
+            self.listener = QueueListener(records, handler, respect_handler_level=True)
+            self.listener.start()
+            atexit.register(self.listener.stop)
+
+            handler = QueueHandler(records)
+            handler.setLevel(self.level)
+
+        self.logger.addHandler(handler)
+
+        Log.DEBUG_ENABLED = self.logger.isEnabledFor(logging.DEBUG)
+        Log.INFO_ENABLED = self.logger.isEnabledFor(logging.INFO)
 
     @staticmethod
     def add_args(parser: ArgumentParser):
         verbosity = parser.add_mutually_exclusive_group()
         verbosity.add_argument('-v', dest='info', action='store_true', help='Log info messages')
         verbosity.add_argument('-vv', dest='debug', action='store_true', help='Log debug messages')
+        parser.add_argument('--log-queue', dest='log_queue', action='store_true',
+                            help='Write log messages from a background thread, so that a slow terminal or log file '
+                                 'never blocks the watcher')
 
     @staticmethod
     def setup(args):
@@ -45,7 +76,7 @@ class Log:
             ObwscLog.setup(args)
             ObwscLog.INSTANCE.update_level(level)
 
-            Log.INSTANCE = Log(level)
+            Log.INSTANCE = Log(level, getattr(args, 'log_queue', False))
         else:
             raise RuntimeError('Logger already initialized')
 
@@ -57,31 +88,36 @@ class Log:
                 log_obj.disabled = True
 
     @staticmethod
-    def debug(*args, **kwargs):
-        assert Log.INSTANCE is not None
-        Log.INSTANCE.logger.debug(*args, **kwargs)
+    def _message(msg):
+        # Callable messages are only evaluated if the message is going to be logged
+        return msg() if callable(msg) else msg
 
     @staticmethod
-    def info(*args, **kwargs):
-        assert Log.INSTANCE is not None
-        Log.INSTANCE.logger.info(*args, **kwargs)
+    def debug(msg, *args, **kwargs):
+        if Log.DEBUG_ENABLED:
+            Log.INSTANCE.logger.debug(Log._message(msg), *args, **kwargs)
+
+    @staticmethod
+    def info(msg, *args, **kwargs):
+        if Log.INFO_ENABLED:
+            Log.INSTANCE.logger.info(Log._message(msg), *args, **kwargs)
 
     @staticmethod
-    def warning(*args, **kwargs):
+    def warning(msg, *args, **kwargs):
         assert Log.INSTANCE is not None
-        Log.INSTANCE.logger.warning(*args, **kwargs)
+        Log.INSTANCE.logger.warning(Log._message(msg), *args, **kwargs)
 
     @staticmethod
-    def error(*args, **kwargs):
+    def error(msg, *args, **kwargs):
         assert Log.INSTANCE is not None
-        Log.INSTANCE.logger.error(*args, **kwargs)
+        Log.INSTANCE.logger.error(Log._message(msg), *args, **kwargs)
 
     @staticmethod
-    def exception(*args, **kwargs):
+    def exception(msg, *args, **kwargs):
         assert Log.INSTANCE is not None
-        Log.INSTANCE.logger.exception(*args, **kwargs)
+        Log.INSTANCE.logger.exception(Log._message(msg), *args, **kwargs)
 
     @staticmethod
-    def fatal(*args, **kwargs):
+    def fatal(msg, *args, **kwargs):
         assert Log.INSTANCE is not None
-        Log.INSTANCE.logger.fatal(*args, **kwargs)
+        Log.INSTANCE.logger.fatal(Log._message(msg), *args, **kwargs)
@@ -0,0 +1,138 @@
+from typing import List, Sequence, Union
+
+import bisect
+import threading
+import time
+
+# Histograms only record anything while an exporter is running, counters are always updated
+ENABLED = False
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+class Counter:
+    """ Monotonically increasing value """
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+
+        # Incremented from multiple threads (e.g. the config watcher, the OBS command queue and the event loop)
+        self.lock = threading.Lock()
+        self.value = 0
+
+        REGISTRY.append(self)
+
+    def inc(self, amount: int = 1):
+        with self.lock:
+            self.value += amount
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter', f'{self.name} {self.value}']
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _HistogramTimer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: 'Histogram'):
+        self.histogram = histogram
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram:
+    """ Distribution of durations (in seconds) """
+
+    DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(self.buckets) + 1)  # Per bucket (not cumulative), the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+        REGISTRY.append(self)
+
+    def observe(self, value: float):
+        if not ENABLED:
+            return
+
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> Union[_HistogramTimer, _NullTimer]:
+        """ Context manager, observing the duration of its body """
+        return _HistogramTimer(self) if ENABLED else _NULL_TIMER
+
+    def render(self) -> List[str]:
+        with self.lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+
+        result = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            result.append(f'{self.name}_bucket{{le="{le}"}} {cumulative}')
+
+        result.append(f'{self.name}_sum {total}')
+        result.append(f'{self.name}_count {count}')
+        return result
+
+
+REGISTRY = []  # type: List[Union[Counter, Histogram]]
+
+
+def render() -> str:
+    """ All the metrics in the Prometheus text exposition format """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+
+    return '\n'.join(lines) + '\n'
+
+
+SWITCHES_APPLIED = Counter('scw_preset_switches_applied_total', 'Preset switches sent to OBS')
+SWITCHES_SKIPPED = Counter('scw_preset_switches_skipped_total',
+                           'Preset switches skipped, because the preset was already active')
+SWITCHES_AMBIGUOUS = Counter('scw_preset_switches_ambiguous_total',
+                             'Preset switches not performed, because multiple presets matched the displays')
+SWITCHES_UNMATCHED = Counter('scw_preset_switches_unmatched_total',
+                             'Preset switches not performed, because no preset matched the displays')
+CONFIG_PARSES = Counter('scw_config_parses_total', 'Configuration file contents parsed')
+CONFIG_CACHE_HITS = Counter('scw_config_cache_hits_total', 'Configurations loaded from the compiled cache')
+DISPLAY_CHANGES = Counter('scw_display_changes_total', 'Changes of the connected display set')
+OBS_COMMAND_FAILURES = Counter('scw_obs_command_failures_total', 'OBS commands, which failed to execute')
+
+DISPLAY_QUERY_SECONDS = Histogram('scw_display_query_seconds', 'Time spent listing the connected displays')
+PRESET_MATCH_SECONDS = Histogram('scw_preset_match_seconds', 'Time spent matching the displays against the presets')
+CONFIG_LOAD_SECONDS = Histogram('scw_config_load_seconds', 'Time spent parsing and validating the configuration')
+OBS_COMMAND_SECONDS = Histogram('scw_obs_command_seconds', 'Round-trip time of the OBS commands')
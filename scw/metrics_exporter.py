@@ -0,0 +1,85 @@
+from typing import Optional
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scw.log import Log
+from scw import metrics
+
+
+class MetricsHttpServer:
+    """ Serves the metrics for Prometheus on http://<host>:<port>/metrics, on a background thread. """
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    class RequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', MetricsHttpServer.CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            Log.debug('Metrics request: ' + format, *args)
+
+    def __init__(self, port: int, host: str = '127.0.0.1'):
+        metrics.enable()
+
+        try:
+            self.server = ThreadingHTTPServer((host, port), MetricsHttpServer.RequestHandler)
+        except OSError as e:
+            raise RuntimeError(f'Error serving metrics on {host}:{port}: {e}')
+
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name='scw-metrics-http', daemon=True)
+        self.thread.start()
+
+        Log.info(f'Serving metrics on http://{host}:{self.server.server_address[1]}/metrics')
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+class MetricsTextfileWriter:
+    """ Periodically writes the metrics into a file, e.g. for the node exporter's textfile collector. """
+
+    # Time between two writes (in seconds)
+    INTERVAL = 15.0
+
+    def __init__(self, file_path: str, interval: float = INTERVAL):
+        metrics.enable()
+
+        self.file_path = file_path
+        self.interval = interval
+        self.stopped = threading.Event()
+
+        self.thread = threading.Thread(target=self._run, name='scw-metrics-textfile', daemon=True)
+        self.thread.start()
+
+    def write(self):
+        # Write atomically, so that the collector never sees a partial file
+        tmp_path = self.file_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(metrics.render())
+            os.replace(tmp_path, self.file_path)
+        except OSError as e:
+            Log.error(f'Error writing metrics to {self.file_path}: {e}')
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def close(self, timeout: Optional[float] = 5.0):
+        self.stopped.set()
+        self.thread.join(timeout)
+        self.write()
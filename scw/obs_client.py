@@ -0,0 +1,413 @@
+from typing import Callable, List, Optional, Tuple
+
+import sys
+import json
+import itertools
+import threading
+import time
+
+import toml
+
+from scw.log import Log
+from scw.config import Config
+
+# The OBS Websocket SDK takes a while to import, so it is only loaded by the first command (on the command queue
+# thread), see _import_sdk.
+obs = None
+OBSSDKError = OBSSDKRequestError = None
+WebSocketTimeoutException = None
+
+# obs-websocket v5 operation code of request batch results
+OP_REQUEST_BATCH_RESPONSE = 9
+
+# Errors, meaning that the connection is gone (e.g. OBS was restarted) and has to be re-established
+CONNECTION_ERRORS = (OSError,)
+
+
+def _import_sdk():
+    global obs, OBSSDKError, OBSSDKRequestError, WebSocketTimeoutException, CONNECTION_ERRORS
+    if obs is not None:
+        return
+
+    import obsws_python
+    from obsws_python.error import OBSSDKError as SDKError, OBSSDKTimeoutError, OBSSDKRequestError as RequestError
+    from websocket import WebSocketException, WebSocketTimeoutException as TimeoutException
+
+    OBSSDKError, OBSSDKRequestError, WebSocketTimeoutException = SDKError, RequestError, TimeoutException
+    # Includes WebSocketTimeoutException: a timed out request is retried on a new connection, which is not what we
+    # want for request batches, see _send_batch
+    CONNECTION_ERRORS = (OSError, WebSocketException, OBSSDKTimeoutError)
+    obs = obsws_python
+
+
+class ObsClient:
+    """
+    Long-lived OBS Websocket connection, based on the same configuration file as the OBS Websocket Commands.
+    The connection is established lazily, health-checked before use and re-established on the next command after a
+    failure.
+    """
+
+    # Ping OBS before a command, if the connection was idle for longer than this (in seconds)
+    HEALTH_CHECK_INTERVAL = 5.0
+
+    # Time to wait for the connection and request responses (in seconds)
+    REQUEST_TIMEOUT = 5.0
+
+    # Time to wait for the OBS events confirming a state change (in seconds)
+    EVENT_TIMEOUT = 30.0
+
+    # Failures of the batched requests, which only mean that there was nothing to do: starting an active recording
+    # (OutputRunning) and stopping an inactive one (OutputNotRunning)
+    EXPECTED_FAILURES = {('StartRecord', 500), ('StopRecord', 501)}
+
+    def __init__(self, obwsc_config: str, timeout: Optional[float] = None):
+        """
+        :param timeout: Upper bound for a single command (in seconds), no limit by default.
+        """
+        self.obwsc_config = obwsc_config
+        self.timeout = timeout
+        self.deadline = None  # type: Optional[float]
+
+        self.requests = None  # type: Optional[obsws_python.ReqClient]
+        self.events = None  # type: Optional[obsws_python.EventClient]
+        self.last_success = 0.0
+        self.connection_settings = None  # type: Optional[dict]
+
+        # Mirror of the OBS state, kept up to date through events while connected (None if unknown)
+        self.current_profile = None  # type: Optional[str]
+        self.current_scene_collection = None  # type: Optional[str]
+        self.profiles = []  # type: List[str]
+        self.scene_collections = []  # type: List[str]
+
+        self.request_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.expected_events = []  # type: List[Tuple[str, Callable[[object], bool], threading.Event]]
+
+        self.commands = {
+            'switch-profile-and-scene-collection': self.switch_profile_and_scene_collection,
+            'pause-record': self.pause_record,
+            'resume-record': self.resume_record,
+        }
+
+    def set_config_path(self, obwsc_config: str):
+        if obwsc_config == self.obwsc_config:
+            return
+
+        self.obwsc_config = obwsc_config
+        self.disconnect()
+
+    def reload_connection_settings(self):
+        """ Reconnect on the next command, if the connection settings have changed """
+        if self.connection_settings is None:
+            return
+
+        try:
+            settings = self._load_connection_settings()
+        except RuntimeError as e:
+            Log.error(e)
+            return
+
+        if settings != self.connection_settings:
+            Log.info('OBS connection settings changed, reconnecting')
+            self.disconnect()
+
+    def _load_connection_settings(self) -> dict:
+        try:
+            obs_config = toml.load(self.obwsc_config)['obs']
+        except (OSError, toml.decoder.TomlDecodeError, KeyError) as e:
+            raise RuntimeError(f'Error reading OBS Websocket Commands config "{self.obwsc_config}": {e}')
+
+        if obs_config.get('host') is None or obs_config.get('port') is None:
+            raise RuntimeError(f'Host and port values are required in "{self.obwsc_config}"')
+
+        request_timeout = ObsClient.REQUEST_TIMEOUT
+        if self.timeout is not None:
+            request_timeout = min(request_timeout, self.timeout)
+
+        return {
+            'host': obs_config['host'],
+            'port': obs_config['port'],
+            'password': obs_config.get('password') or '',
+            'timeout': request_timeout,
+        }
+
+    def connect(self):
+        _import_sdk()
+        settings = self._load_connection_settings()
+        Log.debug(f'Connecting to OBS at {settings["host"]}:{settings["port"]}')
+
+        try:
+            self.requests = obs.ReqClient(**settings)
+            self.events = obs.EventClient(**settings)
+
+            # We don't need any logs from the WS library
+            for logger in (self.requests.logger, self.requests.base_client.logger, self.events.base_client.logger):
+                logger.disabled = True
+
+            self.events.callback.register([self.on_record_state_changed, self.on_current_profile_changed,
+                                           self.on_current_scene_collection_changed, self.on_exit_started])
+        except (OBSSDKError, *CONNECTION_ERRORS):
+            self.disconnect()
+            raise
+
+        self.last_success = time.monotonic()
+        self.connection_settings = settings
+
+    def disconnect(self):
+        requests, self.requests = self.requests, None
+        events, self.events = self.events, None
+        self.connection_settings = None
+        self.current_profile = None
+        self.current_scene_collection = None
+
+        for client in (requests, events):
+            if client is None:
+                continue
+
+            try:
+                client.disconnect()
+            except CONNECTION_ERRORS as e:
+                Log.debug(f'Error closing OBS connection: {e}')
+
+    def is_connected(self) -> bool:
+        events = self.events
+        return self.requests is not None and events is not None and events.worker.is_alive()
+
+    def is_current(self, profile: str, collection: str) -> bool:
+        """ Check whether OBS is known to have the profile and scene collection active, without any round trips. """
+        return self.is_connected() and self.current_profile == profile and self.current_scene_collection == collection
+
+    def _ensure_connected(self):
+        if self.is_connected() and time.monotonic() - self.last_success > ObsClient.HEALTH_CHECK_INTERVAL:
+            try:
+                self.requests.get_version()
+                self.last_success = time.monotonic()
+            except CONNECTION_ERRORS as e:
+                Log.info(f'OBS connection lost ({e}), reconnecting')
+                self.disconnect()
+
+        if not self.is_connected():
+            self.disconnect()
+            self.connect()
+
+    def execute(self, command: str, *args):
+        """
+        Execute a command by its OBS Websocket Commands name, re-connecting once if the connection turns out to be
+        broken.
+        Raises RuntimeError on failure.
+        """
+        fn = self.commands.get(command)
+        if fn is None:
+            raise RuntimeError(f'Unknown OBS command: {command}')
+
+        _import_sdk()
+
+        self.deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        try:
+            try:
+                self._ensure_connected()
+                fn(*args)
+            except CONNECTION_ERRORS as e:
+                # The connection might have dropped right after the health check, e.g. when OBS was restarted
+                Log.info(f'OBS connection error ({e}), retrying')
+                self.disconnect()
+                self.connect()
+                fn(*args)
+        except CONNECTION_ERRORS as e:
+            self.disconnect()
+            raise RuntimeError(f'Unable to reach OBS, please make sure it is running: {e}')
+        except OBSSDKError as e:
+            raise RuntimeError(str(e))
+
+        self.last_success = time.monotonic()
+
+    # Event handling
+    def _expect(self, event_type: str, predicate: Callable[[object], bool]) -> threading.Event:
+        """ Register interest in an event, should be called before sending the request that triggers it """
+        done = threading.Event()
+        with self.lock:
+            self.expected_events.append((event_type, predicate, done))
+        return done
+
+    def _wait(self, done: threading.Event, what: str):
+        timeout = ObsClient.EVENT_TIMEOUT
+        if self.deadline is not None:
+            timeout = max(0.0, min(timeout, self.deadline - time.monotonic()))
+
+        try:
+            if not done.wait(timeout):
+                raise RuntimeError(f'Timeout waiting for OBS: {what}')
+        finally:
+            with self.lock:
+                self.expected_events = [x for x in self.expected_events if x[2] is not done]
+
+    def _on_event(self, event_type: str, event):
+        with self.lock:
+            for expected_type, predicate, done in self.expected_events:
+                if expected_type == event_type and predicate(event):
+                    done.set()
+
+    def on_record_state_changed(self, event):
+        self._on_event('RecordStateChanged', event)
+
+    def on_current_profile_changed(self, event):
+        self.current_profile = event.profile_name
+        self._on_event('CurrentProfileChanged', event)
+
+    def on_current_scene_collection_changed(self, event):
+        self.current_scene_collection = event.scene_collection_name
+        self._on_event('CurrentSceneCollectionChanged', event)
+
+    def on_exit_started(self, _):
+        Log.warning('OBS is shutting down')
+        self.current_profile = None
+        self.current_scene_collection = None
+        with self.lock:
+            for _, _, done in self.expected_events:
+                done.set()
+
+    # Commands
+    def _set_record_state(self, output_state: str, request: Callable[[], None]):
+        done = self._expect('RecordStateChanged', lambda e: e.output_state == output_state)
+        request()
+        self._wait(done, output_state)
+
+    def stop_record(self):
+        status = self.requests.get_record_status()
+        if not status.output_active:
+            Log.debug('Recording is already stopped')
+            return
+
+        self._set_record_state('OBS_WEBSOCKET_OUTPUT_STOPPED', self.requests.stop_record)
+
+    def pause_record(self):
+        status = self.requests.get_record_status()
+        if not status.output_active:
+            raise RuntimeError('Recording is not active')
+
+        if status.output_paused:
+            Log.debug('Recording is already paused')
+            return
+
+        self._set_record_state('OBS_WEBSOCKET_OUTPUT_PAUSED', self.requests.pause_record)
+
+    def resume_record(self):
+        status = self.requests.get_record_status()
+        if not status.output_active:
+            raise RuntimeError('Recording is not active')
+
+        if not status.output_paused:
+            Log.debug('Recording is already running')
+        else:
+            self._set_record_state('OBS_WEBSOCKET_OUTPUT_RESUMED', self.requests.resume_record)
+
+        self._restart_macos_inputs()
+
+    def _restart_macos_inputs(self):
+        # On macOS the "screen capture" inputs get "broken" after locking the screen, but luckily OBS provides a button
+        # for restarting the capture.
+        if sys.platform != 'darwin':
+            return
+
+        resp = self.requests.get_input_list('screen_capture')
+        for capture in resp.inputs:
+            try:
+                self.requests.press_input_properties_button(capture['inputName'], 'reactivate_capture')
+            except OBSSDKRequestError:
+                Log.debug(f'Screen capture reactivation failed for "{capture["inputName"]}"')
+
+    def _refresh_current(self):
+        profiles = self.requests.get_profile_list()
+        self.profiles = profiles.profiles
+        self.current_profile = profiles.current_profile_name
+
+        scene_collections = self.requests.get_scene_collection_list()
+        self.scene_collections = scene_collections.scene_collections
+        self.current_scene_collection = scene_collections.current_scene_collection_name
+
+    def _send_batch(self, message: str, request_id: str) -> List[dict]:
+        """
+        Send an encoded request batch and wait for its results. Timeouts raise RuntimeError: unlike a lost connection,
+        they must not lead to the batch being sent again, as OBS might still be executing it.
+        """
+        timeout = ObsClient.EVENT_TIMEOUT
+        if self.deadline is not None:
+            timeout = min(timeout, self.deadline - time.monotonic())
+            if timeout <= 0:
+                # A zero timeout would make the socket non-blocking instead
+                raise RuntimeError('Timeout waiting for OBS: no time left for the request batch')
+
+        # A batch can take longer than a single request, e.g. when loading a large scene collection
+        ws = self.requests.base_client.ws
+        previous_timeout = ws.gettimeout()
+        ws.settimeout(timeout)
+        try:
+            ws.send(message)
+            while True:
+                response = json.loads(ws.recv())
+                if response.get('op') == OP_REQUEST_BATCH_RESPONSE and response['d'].get('requestId') == request_id:
+                    return response['d']['results']
+        except WebSocketTimeoutException:
+            # The late results would be taken for the response to the next request on this connection. It is dropped
+            # without a closing handshake, which OBS would only answer after the batch.
+            ws.shutdown()
+            self.disconnect()
+            raise RuntimeError(f'Timeout waiting for OBS: request batch ({timeout:.1f}s)')
+        finally:
+            ws.settimeout(previous_timeout)
+
+    def switch_profile_and_scene_collection(self, profile: str, collection: str,
+                                            batch: Optional[Config.RequestBatch] = None):
+        """
+        Switch to the profile and scene collection, and execute the follow-up requests of the batch, in a single round
+        trip (except for the first switch after connecting).
+        """
+        if batch is None:
+            batch = Config.RequestBatch(profile, collection, [])
+
+        if self.current_profile is None or self.current_scene_collection is None or profile not in self.profiles \
+                or collection not in self.scene_collections:
+            self._refresh_current()
+
+        if profile not in self.profiles:
+            raise RuntimeError(f'Profile "{profile}" does not exist')
+
+        if collection not in self.scene_collections:
+            raise RuntimeError(f'Scene collection "{collection}" does not exist')
+
+        change_profile = self.current_profile != profile
+        change_scene = self.current_scene_collection != collection
+
+        if not change_profile and not change_scene and len(batch.requests) == 0:
+            Log.debug('Profile and scene collection already active')
+            return
+
+        if change_profile:
+            # Waits for the confirmation, OBS would refuse to switch profiles with a recording still being finalized
+            self.stop_record()
+
+        request_id = str(next(self.request_ids))
+        results = self._send_batch(batch.encode(request_id, change_profile, change_scene), request_id)
+
+        failures = []  # type: List[str]
+        for result in results:
+            request_type = result.get('requestType')
+            status = result.get('requestStatus', {})
+            code = status.get('code')
+            Log.debug('OBS request %s: code=%s %s', request_type, code, status.get('comment') or '')
+
+            if status.get('result'):
+                # Confirmed by the results, the events might only arrive later
+                if request_type == 'SetCurrentProfile':
+                    self.current_profile = profile
+                elif request_type == 'SetCurrentSceneCollection':
+                    self.current_scene_collection = collection
+                continue
+
+            if (request_type, code) in ObsClient.EXPECTED_FAILURES:
+                continue
+
+            failures.append(f'{request_type} ({code}{": " + status["comment"] if status.get("comment") else ""})')
+
+        if len(failures) != 0:
+            raise RuntimeError(f'OBS requests failed: {", ".join(failures)}')
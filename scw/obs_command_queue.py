@@ -0,0 +1,142 @@
+from typing import Any, Callable, Deque, Optional
+
+import threading
+from collections import deque
+
+from scw.log import Log
+from scw.obs_client import ObsClient
+from scw import metrics
+
+
+class ObsCommandQueue:
+    """
+    Executes OBS commands in order on a background thread, so that a slow or unreachable OBS never blocks the caller.
+    Pending commands, which would override each other (e.g. pause and resume), are coalesced: only the latest one is
+    executed.
+    """
+
+    # Maximal number of commands waiting for execution, the oldest ones are dropped first
+    MAX_PENDING = 16
+
+    # Commands, sharing a key, override each other
+    COALESCE_KEYS = {
+        'pause-record': 'record-state',
+        'resume-record': 'record-state',
+        'switch-profile-and-scene-collection': 'profile-and-scene-collection',
+    }
+
+    class Command:
+        def __init__(self, name: str, args: tuple, fn: Callable[[], None], token: Any = None):
+            self.name = name
+            self.args = args
+            self.fn = fn
+            self.key = ObsCommandQueue.COALESCE_KEYS.get(name)
+
+            # Passed back to on_finished, identifies the submission (the description is ambiguous)
+            self.token = token
+
+        def __str__(self):
+            return ' '.join(str(x) for x in (self.name,) + self.args)
+
+        def same_as(self, other: 'ObsCommandQueue.Command') -> bool:
+            return self.name == other.name and self.args == other.args
+
+    def __init__(self, obs: ObsClient, on_finished: Callable[[str, bool, str, Any], None]):
+        """
+        :param obs: Client to execute the commands with, only used from the worker thread afterward.
+        :param on_finished: Called from the worker thread with the command description, success flag, error message
+                            and the token the command was submitted with.
+        """
+        self.obs = obs
+        self.on_finished = on_finished
+
+        self.condition = threading.Condition()
+        self.pending = deque()  # type: Deque[ObsCommandQueue.Command]
+        self.current = None  # type: Optional[ObsCommandQueue.Command]
+        self.running = True
+
+        self.thread = threading.Thread(target=self._run, name='scw-obs-commands', daemon=True)
+        self.thread.start()
+
+    def submit(self, command: str, *args, token: Any = None):
+        self._enqueue(ObsCommandQueue.Command(command, args, lambda: self.obs.execute(command, *args), token))
+
+    def set_config_path(self, obwsc_config: str):
+        self._enqueue(ObsCommandQueue.Command('set-config-path', (obwsc_config,),
+                                              lambda: self.obs.set_config_path(obwsc_config)))
+
+    def reload_connection_settings(self):
+        self._enqueue(ObsCommandQueue.Command('reload-connection-settings', (),
+                                              self.obs.reload_connection_settings))
+
+    def has_pending(self, command: str) -> bool:
+        """ Check whether a command, overriding the given one, is waiting or being executed. """
+        key = ObsCommandQueue.COALESCE_KEYS.get(command)
+        with self.condition:
+            queued = list(self.pending) + ([self.current] if self.current is not None else [])
+            return any(x.name == command or (key is not None and x.key == key) for x in queued)
+
+    def _enqueue(self, command: 'ObsCommandQueue.Command'):
+        with self.condition:
+            if command.key is not None:
+                superseded = [x for x in self.pending if x.key == command.key]
+                for x in superseded:
+                    Log.debug('Dropping superseded OBS command: %s', x)
+                    self.pending.remove(x)
+
+                if self.current is not None and self.current.same_as(command):
+                    # Everything in between was dropped, and the very same command is already being executed
+                    Log.debug('OBS command already in progress: %s', command)
+                    self.current.token = command.token
+                    return
+
+            if len(self.pending) >= ObsCommandQueue.MAX_PENDING:
+                Log.warning(f'Too many pending OBS commands, dropping: {self.pending.popleft()}')
+
+            self.pending.append(command)
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and len(self.pending) == 0:
+                    self.condition.wait()
+
+                if not self.running:
+                    return
+
+                self.current = self.pending.popleft()
+
+            command = self.current
+            try:
+                with metrics.OBS_COMMAND_SECONDS.time():
+                    command.fn()
+                success, error = True, ''
+            except RuntimeError as e:
+                success, error = False, str(e)
+            except Exception as e:
+                Log.exception(f'Unexpected error executing "{command}"')
+                success, error = False, str(e)
+
+            if not success:
+                metrics.OBS_COMMAND_FAILURES.inc()
+
+            with self.condition:
+                self.current = None
+                token = command.token
+
+            self.on_finished(str(command), success, error, token)
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """ Drop all pending commands, wait for the current one and disconnect from OBS. """
+        with self.condition:
+            self.pending.clear()
+            self.running = False
+            self.condition.notify()
+
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            Log.warning('OBS command still in progress, not waiting for it')
+            return
+
+        self.obs.disconnect()
@@ -0,0 +1,218 @@
+from typing import Any, Callable, Dict, List, Optional
+
+import threading
+import time
+
+from scw.log import Log
+from scw.config import Config
+from scw.obs_client import ObsClient
+from scw.obs_command_queue import ObsCommandQueue
+
+
+class ObsFanout:
+    """
+    Drives several OBS instances (endpoints) at once. Every endpoint has its own connection and command queue, so a
+    command, submitted to multiple endpoints, is executed on all of them concurrently: it takes as long as the slowest
+    endpoint, not as long as all of them together.
+    """
+
+    class Endpoint:
+        def __init__(self, config: Config.Endpoint, on_finished: Callable[[str, bool, str, Any], None]):
+            self.config = config
+            self.obs = ObsClient(config.obwsc_config, config.timeout)
+            self.queue = ObsCommandQueue(self.obs, on_finished)
+
+    class Submission:
+        """ Outcome of a command, submitted to multiple endpoints """
+
+        def __init__(self, command: str, key: str, endpoints: List[str]):
+            self.command = command
+            self.key = key
+            self.endpoints = endpoints
+            self.started = time.monotonic()
+            self.pending = set(endpoints)
+            self.errors = {}  # type: Dict[str, str]
+            self.timers = []  # type: List[threading.Timer]
+
+        def duration(self) -> float:
+            return time.monotonic() - self.started
+
+    def __init__(self, endpoints: List[Config.Endpoint], on_finished: Callable[[str, bool, str], None],
+                 on_completed: Optional[Callable[['ObsFanout.Submission'], None]] = None):
+        """
+        :param on_finished: Called from the endpoint threads with the command description (naming the endpoint), success
+                            flag and error message, once per endpoint.
+        :param on_completed: Called from an endpoint thread, once a command has finished on all of its endpoints (from
+                             the submitting thread, if none of its endpoints exist).
+        """
+        self.on_finished = on_finished
+        self.on_completed = on_completed
+
+        self.lock = threading.Lock()
+        self.endpoints = {}  # type: Dict[str, ObsFanout.Endpoint]
+        self.submissions = {}  # type: Dict[str, ObsFanout.Submission]
+
+        self.update_endpoints(endpoints)
+
+    def _create_endpoint(self, config: Config.Endpoint) -> 'ObsFanout.Endpoint':
+        def on_finished(command: str, success: bool, error: str, submission: Optional[ObsFanout.Submission]):
+            self._on_finished(config.name, command, success, error, submission)
+
+        return ObsFanout.Endpoint(config, on_finished)
+
+    def update_endpoints(self, endpoints: List[Config.Endpoint]):
+        """ Connect new endpoints, drop removed ones and take over changed settings """
+        with self.lock:
+            removed = [x for name, x in self.endpoints.items() if name not in set(y.name for y in endpoints)]
+            current = {}  # type: Dict[str, ObsFanout.Endpoint]
+
+            for config in endpoints:
+                endpoint = self.endpoints.get(config.name)
+                if endpoint is None:
+                    endpoint = self._create_endpoint(config)
+                elif endpoint.config != config:
+                    endpoint.obs.timeout = config.timeout
+                    endpoint.queue.set_config_path(config.obwsc_config)
+                    endpoint.queue.reload_connection_settings()
+                    endpoint.config = config
+
+                current[config.name] = endpoint
+
+            self.endpoints = current
+
+        for endpoint in removed:
+            Log.info(f'OBS endpoint removed: {endpoint.config.name}')
+            endpoint.queue.close()
+
+    def _targets(self, endpoints: Optional[List[str]]) -> List['ObsFanout.Endpoint']:
+        if endpoints is None or len(endpoints) == 0:
+            return list(self.endpoints.values())
+
+        return [self.endpoints[x] for x in endpoints if x in self.endpoints]
+
+    def submit(self, command: str, *args, endpoints: Optional[List[str]] = None):
+        """
+        :param endpoints: Names of the endpoints to execute the command on, all of them by default.
+        """
+        description = ' '.join(str(x) for x in (command,) + args)
+        key = ObsCommandQueue.COALESCE_KEYS.get(command, command)
+
+        with self.lock:
+            targets = self._targets(endpoints)
+
+        if len(targets) == 0:
+            # Nothing would ever finish, so fail right away
+            Log.error(f'"{description}" not executed, none of its OBS endpoints exist: {endpoints}')
+            submission = ObsFanout.Submission(description, key, [])
+            submission.errors = {x: 'unknown OBS endpoint' for x in endpoints or []}
+            if self.on_completed is not None:
+                self.on_completed(submission)
+            return
+
+        with self.lock:
+            submission = ObsFanout.Submission(description, key, [x.config.name for x in targets])
+            superseded = self.submissions.get(key)
+            if superseded is not None:
+                if len(superseded.pending) != 0:
+                    Log.debug('OBS command superseded on %s: %s', sorted(superseded.pending), superseded.command)
+                for timer in superseded.timers:
+                    timer.cancel()
+            self.submissions[key] = submission
+
+            for endpoint in targets:
+                if endpoint.config.timeout is not None:
+                    timer = threading.Timer(endpoint.config.timeout, self._on_timeout,
+                                            (submission, endpoint.config.name, endpoint.config.timeout))
+                    timer.daemon = True
+                    submission.timers.append(timer)
+                    timer.start()
+
+        for endpoint in targets:
+            endpoint.queue.submit(command, *args, token=submission)
+
+    def _is_pending(self, submission: Optional['ObsFanout.Submission'], endpoint: str) -> bool:
+        """ Superseded submissions are never settled (the lock has to be held) """
+        return submission is not None and endpoint in submission.pending and \
+            self.submissions.get(submission.key) is submission
+
+    def _on_finished(self, endpoint: str, command: str, success: bool, error: str,
+                     submission: Optional['ObsFanout.Submission']):
+        self.on_finished(f'{command} [{endpoint}]', success, error)
+
+        with self.lock:
+            if not self._is_pending(submission, endpoint):
+                return
+
+            complete = self._settle(submission, endpoint, None if success else error)
+
+        if complete:
+            self._report(submission)
+
+    def _on_timeout(self, submission: 'ObsFanout.Submission', endpoint: str, timeout: float):
+        """ Report the endpoint as failed, the command itself might still finish later """
+        with self.lock:
+            if not self._is_pending(submission, endpoint):
+                return
+
+            complete = self._settle(submission, endpoint, f'no response within {timeout}s')
+
+        if complete:
+            self._report(submission)
+
+    def _settle(self, submission: 'ObsFanout.Submission', endpoint: str, error: Optional[str]) -> bool:
+        """ Record the result of an endpoint, returns True if the submission is complete (the lock has to be held) """
+        submission.pending.discard(endpoint)
+        if error is not None:
+            submission.errors[endpoint] = error
+
+        if len(submission.pending) != 0:
+            return False
+
+        for timer in submission.timers:
+            timer.cancel()
+
+        del self.submissions[submission.key]
+        return True
+
+    def _report(self, submission: 'ObsFanout.Submission'):
+        if len(submission.endpoints) > 1:
+            if len(submission.errors) != 0:
+                Log.error(f'"{submission.command}" failed on {len(submission.errors)} of {len(submission.endpoints)} '
+                          f'OBS endpoints: ' + ', '.join(f'{k} ({v})' for k, v in sorted(submission.errors.items())))
+            else:
+                Log.info('"%s" finished on %d OBS endpoints in %.3fs', submission.command, len(submission.endpoints),
+                         submission.duration())
+
+        if self.on_completed is not None:
+            self.on_completed(submission)
+
+    def reload_connection_settings(self):
+        with self.lock:
+            endpoints = list(self.endpoints.values())
+
+        for endpoint in endpoints:
+            endpoint.queue.reload_connection_settings()
+
+    def has_pending(self, command: str) -> bool:
+        with self.lock:
+            endpoints = list(self.endpoints.values())
+
+        return any(x.queue.has_pending(command) for x in endpoints)
+
+    def is_current(self, profile: str, collection: str, endpoints: Optional[List[str]] = None) -> bool:
+        """ Check whether all the (given) endpoints are known to have the profile and scene collection active """
+        with self.lock:
+            targets = self._targets(endpoints)
+
+        return all(x.obs.is_current(profile, collection) for x in targets)
+
+    def close(self, timeout: Optional[float] = 5.0):
+        with self.lock:
+            endpoints, self.endpoints = list(self.endpoints.values()), {}
+            for submission in self.submissions.values():
+                for timer in submission.timers:
+                    timer.cancel()
+            self.submissions = {}
+
+        for endpoint in endpoints:
+            endpoint.queue.close(timeout)
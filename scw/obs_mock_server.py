@@ -0,0 +1,245 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+
+# Appended to the client key, to compute the handshake response (RFC 6455)
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+# obs-websocket v5 operation codes
+OP_HELLO = 0
+OP_IDENTIFY = 1
+OP_IDENTIFIED = 2
+OP_EVENT = 5
+OP_REQUEST = 6
+OP_REQUEST_RESPONSE = 7
+OP_REQUEST_BATCH = 8
+OP_REQUEST_BATCH_RESPONSE = 9
+
+# obs-websocket v5 request status codes
+STATUS_SUCCESS = 100
+STATUS_UNKNOWN_REQUEST_TYPE = 204
+STATUS_OUTPUT_RUNNING = 500
+STATUS_OUTPUT_NOT_RUNNING = 501
+STATUS_RESOURCE_NOT_FOUND = 600
+
+
+class MockObsServer:
+    """
+    Minimal obs-websocket v5 server (without authentication) for benchmarks: keeps track of the profile, scene
+    collection and recording state, and answers every request (or request batch) after a fixed latency. Runs its own
+    event loop on a background thread.
+    """
+
+    # Requests, which are accepted without changing the mocked state
+    STATELESS_REQUESTS = {'SetCurrentProgramScene', 'SetSceneItemEnabled', 'SetInputMute', 'SetVideoSettings',
+                          'SetStreamServiceSettings', 'TriggerHotkeyByName'}
+
+    def __init__(self, latency: float = 0.0, host: str = '127.0.0.1', port: int = 0,
+                 profiles: Optional[List[str]] = None, scene_collections: Optional[List[str]] = None):
+        """
+        :param latency: Time to wait before answering a request (in seconds).
+        :param port: Port to listen on, a random free one by default (see the port attribute).
+        """
+        self.latency = latency
+        self.profiles = profiles if profiles is not None else ['Default']
+        self.scene_collections = scene_collections if scene_collections is not None else ['Default']
+
+        self.current_profile = self.profiles[0]
+        self.current_scene_collection = self.scene_collections[0]
+        self.record_active = False
+        self.record_paused = False
+
+        # (request type, request data) of every request, in order
+        self.requests = []  # type: List[Tuple[str, dict]]
+        self.writers = set()  # type: Set[asyncio.StreamWriter]
+        self.event_writers = set()  # type: Set[asyncio.StreamWriter]
+
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(asyncio.start_server(self._serve, host, port))
+        self.host = host
+        self.port = self.server.sockets[0].getsockname()[1]
+
+        self.thread = threading.Thread(target=self.loop.run_forever, name='scw-mock-obs', daemon=True)
+        self.thread.start()
+
+    def write_obwsc_config(self, file_path: str):
+        """ OBS Websocket Commands configuration, pointing to this server """
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(f'[obs]\nhost = "{self.host}"\nport = {self.port}\npassword = ""\n')
+
+    # WebSocket framing
+    @staticmethod
+    async def _handshake(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        headers = {}  # type: Dict[str, str]
+        for line in (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')[1:]:
+            if ':' in line:
+                key, value = line.split(':', 1)
+                headers[key.strip().lower()] = value.strip()
+
+        accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + WEBSOCKET_GUID).encode()).digest())
+        writer.write(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                     b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+
+    @staticmethod
+    async def _read_message(reader: asyncio.StreamReader) -> Optional[Tuple[int, bytes]]:
+        """ Opcode and payload of the next frame (fragmented messages are not supported) """
+        first, second = await reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', await reader.readexactly(8))[0]
+
+        mask = await reader.readexactly(4) if second & 0x80 else b'\x00\x00\x00\x00'
+        payload = await reader.readexactly(length)
+        unmasked = (int.from_bytes(payload, 'big') ^ int.from_bytes((mask * (length // 4 + 1))[:length], 'big'))
+        return first & 0x0F, unmasked.to_bytes(length, 'big')
+
+    @staticmethod
+    def _frame(opcode: int, payload: bytes) -> bytes:
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+        return header + payload
+
+    @staticmethod
+    def _send(writer: asyncio.StreamWriter, op: int, data: dict):
+        writer.write(MockObsServer._frame(0x1, json.dumps({'op': op, 'd': data}).encode('utf-8')))
+
+    # obs-websocket protocol
+    def _emit(self, event_type: str, event_data: dict):
+        for writer in list(self.event_writers):
+            MockObsServer._send(writer, OP_EVENT, {'eventType': event_type, 'eventIntent': 0, 'eventData': event_data})
+
+    def _set_record_state(self, active: bool, paused: bool, state: str):
+        self.record_active, self.record_paused = active, paused
+        self._emit('RecordStateChanged', {'outputActive': active, 'outputState': state})
+
+    def handle_request(self, request_type: str, data: dict) -> Tuple[int, Optional[dict]]:
+        """ Status code and response data of a single request """
+        self.requests.append((request_type, data))
+
+        if request_type == 'GetVersion':
+            return STATUS_SUCCESS, {'obsVersion': '30.0.0', 'obsWebSocketVersion': '5.3.0', 'rpcVersion': 1}
+        elif request_type == 'GetProfileList':
+            return STATUS_SUCCESS, {'currentProfileName': self.current_profile, 'profiles': self.profiles}
+        elif request_type == 'GetSceneCollectionList':
+            return STATUS_SUCCESS, {'currentSceneCollectionName': self.current_scene_collection,
+                                    'sceneCollections': self.scene_collections}
+        elif request_type == 'SetCurrentProfile':
+            if data.get('profileName') not in self.profiles:
+                return STATUS_RESOURCE_NOT_FOUND, None
+            self.current_profile = data['profileName']
+            self._emit('CurrentProfileChanged', {'profileName': self.current_profile})
+        elif request_type == 'SetCurrentSceneCollection':
+            if data.get('sceneCollectionName') not in self.scene_collections:
+                return STATUS_RESOURCE_NOT_FOUND, None
+            self.current_scene_collection = data['sceneCollectionName']
+            self._emit('CurrentSceneCollectionChanged', {'sceneCollectionName': self.current_scene_collection})
+        elif request_type == 'GetRecordStatus':
+            return STATUS_SUCCESS, {'outputActive': self.record_active, 'outputPaused': self.record_paused,
+                                    'outputTimecode': '00:00:00.000', 'outputDuration': 0, 'outputBytes': 0}
+        elif request_type == 'StartRecord':
+            if self.record_active:
+                return STATUS_OUTPUT_RUNNING, None
+            self._set_record_state(True, False, 'OBS_WEBSOCKET_OUTPUT_STARTED')
+        elif request_type == 'StopRecord':
+            if not self.record_active:
+                return STATUS_OUTPUT_NOT_RUNNING, None
+            self._set_record_state(False, False, 'OBS_WEBSOCKET_OUTPUT_STOPPED')
+        elif request_type == 'PauseRecord':
+            self._set_record_state(True, True, 'OBS_WEBSOCKET_OUTPUT_PAUSED')
+        elif request_type == 'ResumeRecord':
+            self._set_record_state(True, False, 'OBS_WEBSOCKET_OUTPUT_RESUMED')
+        elif request_type not in MockObsServer.STATELESS_REQUESTS:
+            return STATUS_UNKNOWN_REQUEST_TYPE, None
+
+        return STATUS_SUCCESS, None
+
+    def _response(self, request_type: str, request_id, data: dict) -> dict:
+        code, response_data = self.handle_request(request_type, data)
+        response = {'requestType': request_type, 'requestId': request_id,
+                    'requestStatus': {'result': code == STATUS_SUCCESS, 'code': code}}
+        if response_data is not None:
+            response['responseData'] = response_data
+        return response
+
+    async def _batch_response(self, data: dict) -> dict:
+        """ Results of a serially executed request batch """
+        results = []  # type: List[dict]
+        for request in data.get('requests', []):
+            request_type = request.get('requestType')
+            if request_type == 'Sleep':
+                self.requests.append((request_type, request.get('requestData', {})))
+                await asyncio.sleep(request.get('requestData', {}).get('sleepMillis', 0) / 1000.0)
+                result = {'requestType': request_type, 'requestStatus': {'result': True, 'code': STATUS_SUCCESS}}
+            else:
+                result = self._response(request_type, request.get('requestId'), request.get('requestData', {}))
+                del result['requestId']
+
+            results.append(result)
+            if data.get('haltOnFailure') and not result['requestStatus']['result']:
+                break
+
+        return {'requestId': data.get('requestId'), 'results': results}
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.writers.add(writer)
+        try:
+            await MockObsServer._handshake(reader, writer)
+            MockObsServer._send(writer, OP_HELLO, {'obsWebSocketVersion': '5.3.0', 'rpcVersion': 1})
+
+            while True:
+                opcode, payload = await MockObsServer._read_message(reader)
+                if opcode == 0x8:
+                    writer.write(MockObsServer._frame(0x8, payload[:2]))
+                    break
+                elif opcode == 0x9:
+                    writer.write(MockObsServer._frame(0xA, payload))
+                    continue
+                elif opcode != 0x1:
+                    continue
+
+                message = json.loads(payload)
+                op, data = message['op'], message.get('d', {})
+                if op == OP_IDENTIFY:
+                    if data.get('eventSubscriptions', 0) != 0:
+                        self.event_writers.add(writer)
+                    MockObsServer._send(writer, OP_IDENTIFIED, {'negotiatedRpcVersion': 1})
+                elif op == OP_REQUEST:
+                    await asyncio.sleep(self.latency)
+                    response = self._response(data['requestType'], data.get('requestId'), data.get('requestData', {}))
+                    MockObsServer._send(writer, OP_REQUEST_RESPONSE, response)
+                elif op == OP_REQUEST_BATCH:
+                    # A single round trip for the whole batch
+                    await asyncio.sleep(self.latency)
+                    MockObsServer._send(writer, OP_REQUEST_BATCH_RESPONSE, await self._batch_response(data))
+
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, KeyError, ValueError):
+            pass
+        finally:
+            self.writers.discard(writer)
+            self.event_writers.discard(writer)
+            writer.close()
+
+    def close(self):
+        async def shutdown():
+            self.server.close()
+            for writer in list(self.writers):
+                writer.close()
+            await self.server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(5.0)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5.0)
+        self.loop.close()
@@ -5,13 +5,30 @@ import os
 import sys
 
 from scw.log import Log
+from scw import metrics
 from scw.config import Config
+from scw.config_cache import ConfigCache
+from scw.startup_profile import StartupProfile
+from scw.warm_state import default_state_path
 
 
 class Options:
-    def __init__(self, dry_run: bool, config: Config):
+    def __init__(self, dry_run: bool, config: Config, headless: bool = False, trace_path: Optional[str] = None,
+                 metrics_port: Optional[int] = None, metrics_textfile: Optional[str] = None,
+                 state_file: Optional[str] = None, control_socket: Optional[str] = None):
+        """
+        :param state_file: Path to the warm restart state file, disabled if None.
+        :param control_socket: Path of the control API socket (or named pipe), disabled if None.
+        """
         self.dry_run = dry_run
         self.config = config
+        self.headless = headless
+        self.trace_path = trace_path
+        self.metrics_port = metrics_port
+        self.metrics_textfile = metrics_textfile
+        self.state_file = state_file
+        self.control_socket = control_socket
+        self.startup_profile = None  # type: Optional[StartupProfile]
 
     @staticmethod
     def _get_default_working_dir() -> str:
@@ -39,6 +56,42 @@ class Options:
         parser.add_argument('--dry-run', '-d', action='store_true', required=False,
                             help="Don't actually change anything (useful for preparing the presets, use together "
                                  "with -vv).")
+        parser.add_argument('--no-config-cache', action='store_true', required=False,
+                            help="Always parse and validate the configuration file, instead of loading a compiled "
+                                 "version of it from the cache.")
+        parser.add_argument('--headless', action='store_true', required=False,
+                            help="Run without the Qt GUI stack (requires a native display backend for the platform).")
+
+        parser.add_argument('--record-trace', metavar='PATH', required=False,
+                            help="Record display, screen lock and configuration events into a trace file (JSON lines, "
+                                 "gzip-compressed if the path ends with .gz), for replaying with "
+                                 "screen-config-replay.")
+        parser.add_argument('--profile-startup', action='store_true', required=False,
+                            help="Print per-phase and per-import start-up timings after the first preset match, "
+                                 "and quit.")
+        parser.add_argument('--import-budget', type=float, metavar='MS', required=False,
+                            help="With --profile-startup: fail if parsing the options and importing the application "
+                                 "takes longer than MS milliseconds.")
+        parser.add_argument('--startup-budget', type=float, metavar='MS', required=False,
+                            help="With --profile-startup: fail if starting the engine (everything before waiting for "
+                                 "the displays) takes longer than MS milliseconds.")
+        parser.add_argument('--metrics-port', type=int, metavar='PORT', required=False,
+                            help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+        parser.add_argument('--metrics-textfile', metavar='PATH', required=False,
+                            help="Periodically write Prometheus metrics into a file (e.g. for the node exporter's "
+                                 "textfile collector)")
+
+        parser.add_argument('--state-file', metavar='PATH', required=False,
+                            help="Where to remember the last applied preset, so that a restart with unchanged displays "
+                                 "and configuration skips the grace period and the switch (default: a per-user state "
+                                 "directory).")
+        parser.add_argument('--no-warm-restart', action='store_true', required=False,
+                            help="Always wait for the grace period and switch OBS on start, without reading or "
+                                 "writing the state file.")
+
+        parser.add_argument('--control-socket', metavar='PATH', nargs='?', const='', required=False,
+                            help="Serve a local JSON control API (see screen-config-control), on a Unix domain "
+                                 "socket or a Windows named pipe. Uses a per-user default path if PATH is omitted.")
 
         if extra_args_fn is not None:
             extra_args_fn(parser)
@@ -47,9 +100,24 @@ class Options:
 
         Log.setup(args)
 
+        # Before the first configuration load, so that its duration is recorded too
+        if args.metrics_port is not None or args.metrics_textfile is not None:
+            metrics.enable()
+
         if os.path.exists(args.config) and os.path.isfile(args.config):
-            config = Config.load_from_file(args.config)
+            cache = None if args.no_config_cache else ConfigCache()
+            config = Config.load_from_file(args.config, cache)
         else:
             raise RuntimeError(f'Configuration file not found: {args.config}')
 
-        return Options(args.dry_run, config), args
+        state_file = None
+        if not args.no_warm_restart:
+            state_file = args.state_file if args.state_file is not None else default_state_path()
+
+        control_socket = args.control_socket
+        if control_socket == '':
+            from scw.control_server import default_control_path
+            control_socket = default_control_path()
+
+        return Options(args.dry_run, config, args.headless, args.record_trace, args.metrics_port,
+                       args.metrics_textfile, state_file, control_socket), args
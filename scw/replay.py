@@ -0,0 +1,122 @@
+from typing import List, Optional, Tuple
+
+import bisect
+import time
+
+from scw.log import Log
+from scw.config import Config
+from scw.options import Options
+from scw.display_source import Display
+from scw.display_source.fake import FakeDisplaySource
+from scw.engine import WatcherEngine
+from scw.simulation import VirtualEventLoop
+from scw import trace
+
+
+class MockObs:
+    """
+    Stands in for both the OBS client and the command queue during a replay: commands are executed synchronously and
+    only recorded, together with the virtual time.
+    """
+
+    def __init__(self, loop: VirtualEventLoop):
+        self.loop = loop
+        self.commands = []  # type: List[Tuple[float, str, tuple]]
+        self.current_profile = None  # type: Optional[str]
+        self.current_scene_collection = None  # type: Optional[str]
+
+    def submit(self, command: str, *args, endpoints: Optional[List[str]] = None):
+        self.commands.append((self.loop.time(), command, args))
+        if command == 'switch-profile-and-scene-collection':
+            self.current_profile, self.current_scene_collection = args[:2]
+
+    def update_endpoints(self, endpoints: List[Config.Endpoint]):
+        pass
+
+    def reload_connection_settings(self):
+        pass
+
+    def has_pending(self, command: str) -> bool:
+        return False
+
+    def is_current(self, profile: str, scene_collection: str, endpoints: Optional[List[str]] = None) -> bool:
+        return self.current_profile == profile and self.current_scene_collection == scene_collection
+
+    def close(self):
+        pass
+
+    def switches(self) -> List[float]:
+        return [x for x, command, _ in self.commands if command == 'switch-profile-and-scene-collection']
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """ Nearest-rank percentile of a sorted list """
+    index = max(0, min(len(values) - 1, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+class ReplayReport:
+    def __init__(self, num_events: int, num_commands: int, latencies: List[float], cpu_time: float):
+        self.num_events = num_events
+        self.num_commands = num_commands
+        self.latencies = sorted(latencies)  # End-to-end, from the last input event to each switch (in seconds)
+        self.cpu_time = cpu_time
+
+    def __str__(self):
+        result = f'events={self.num_events}, commands={self.num_commands}, switches={len(self.latencies)}, ' \
+                 f'cpu_time={self.cpu_time * 1000:.3f}ms'
+
+        if len(self.latencies) != 0:
+            p50, p90, p99 = (percentile(self.latencies, x) for x in (0.5, 0.9, 0.99))
+            result += f', latency: p50={p50:.3f}s, p90={p90:.3f}s, p99={p99:.3f}s, max={self.latencies[-1]:.3f}s'
+
+        return result
+
+
+def replay(events: List[dict], trace_name: str = '<trace>') -> ReplayReport:
+    """
+    Feed a recorded trace through the watcher engine, using a virtual clock. The trace has to start with the
+    configuration and the initial display list, as recorded by the TraceRecorder.
+    """
+    if len(events) < 2 or events[0]['type'] != trace.CONFIG or events[1]['type'] != trace.DISPLAYS:
+        raise RuntimeError(f'{trace_name}: trace should start with the configuration and the display list')
+
+    cpu_start = time.process_time()
+
+    loop = VirtualEventLoop()
+    obs = MockObs(loop)
+
+    config = Config.load_from_bytes(trace_name, events[0]['text'].encode('utf-8'))
+    display_source = FakeDisplaySource([Display.from_dict(x) for x in events[1]['displays']])
+
+    engine = WatcherEngine(Options(False, config), display_source, loop, obs, obs, watch_screen_lock=False)
+    engine.start()
+
+    input_times = []  # type: List[float]
+    for event in events[2:]:
+        loop.run_until(event['t'])
+        input_times.append(event['t'])
+
+        event_type = event['type']
+        if event_type == trace.DISPLAYS:
+            display_source.set_displays([Display.from_dict(x) for x in event['displays']])
+        elif event_type == trace.LOCK:
+            engine.on_screen_locked()
+        elif event_type == trace.UNLOCK:
+            engine.on_screen_unlocked()
+        elif event_type == trace.CONFIG:
+            try:
+                config.update(Config.load_from_bytes(trace_name, event['text'].encode('utf-8')))
+            except RuntimeError as e:
+                Log.error(e)
+
+    loop.run_all()
+    engine.close()
+
+    latencies = []  # type: List[float]
+    for switch_time in obs.switches():
+        # The switch was caused by the last input before it (or by the start-up)
+        index = bisect.bisect_right(input_times, switch_time)
+        latencies.append(switch_time - (input_times[index - 1] if index != 0 else 0.0))
+
+    return ReplayReport(len(events), len(obs.commands), latencies, time.process_time() - cpu_start)
@@ -0,0 +1,138 @@
+from typing import Callable, Dict, List, Optional
+
+import os
+import json
+import socket
+import selectors
+import threading
+
+from scw.display_source import Display, DisplayCache
+from scw.edid import parse_edid
+
+DRM_SYSFS_ROOT = '/sys/class/drm'
+
+# Not exported by the socket module
+NETLINK_KOBJECT_UEVENT = 15
+
+# Multicast group, used by the kernel for broadcasting uevents (udev re-broadcasts them in group 2)
+UEVENT_KERNEL_GROUP = 1
+
+
+def _read_file(path: str, mode: str = 'r'):
+    try:
+        with open(path, mode) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _display_from_edid(connector: str, data: bytes) -> Display:
+    edid = parse_edid(data)
+    if edid is None:
+        return Display(connector)
+
+    manufacturer, name, serial = edid
+    return Display(name, manufacturer, name, serial)
+
+
+def get_connected_displays(sysfs_root: str = DRM_SYSFS_ROOT, cache: Optional[DisplayCache] = None) -> List[Display]:
+    """
+    List displays, connected to any of the DRM connectors. Displays are named after the monitor name from their
+    EDID, falling back to the connector name (e.g. "eDP-1") if there is none.
+    """
+    result = []  # type: List[Display]
+    cache = cache if cache is not None else DisplayCache()
+    keys = []
+
+    try:
+        entries = sorted(os.listdir(sysfs_root))
+    except OSError:
+        return result
+
+    for entry in entries:
+        # Connectors are named after their card, e.g. "card0-DP-1"
+        if not entry.startswith('card') or '-' not in entry:
+            continue
+
+        connector_path = os.path.join(sysfs_root, entry)
+        status = _read_file(os.path.join(connector_path, 'status'))
+        if status is None or status.strip() != 'connected':
+            continue
+
+        connector = entry.split('-', 1)[1]
+        data = _read_file(os.path.join(connector_path, 'edid'), 'rb') or b''
+
+        key = (entry, data)
+        keys.append(key)
+        result.append(cache.get(key, lambda: _display_from_edid(connector, data)))
+
+    cache.retain(keys)
+    return result
+
+
+def parse_uevent(message: bytes) -> Optional[Dict[str, str]]:
+    """ Parse a kernel uevent message ("action@devpath\\0KEY=VALUE\\0..."), None for anything else. """
+    parts = message.split(b'\x00')
+    if len(parts) == 0 or b'@' not in parts[0]:
+        # E.g. udev's re-broadcasts, which start with a "libudev" header
+        return None
+
+    result = {}
+    for part in parts[1:]:
+        key, sep, value = part.partition(b'=')
+        if sep:
+            result[key.decode('utf-8', 'replace')] = value.decode('utf-8', 'replace')
+
+    return result
+
+
+class UeventObserver:
+    """ Listens for DRM uevents (connector hotplug) on a netlink socket, on a background thread. """
+
+    def __init__(self, callback: Callable[[], None], sock: Optional[socket.socket] = None):
+        """
+        :param callback: Called from the observer thread for every DRM change event.
+        :param sock: Socket to read the uevents from, a kernel uevent netlink socket by default.
+        """
+        self.callback = callback
+
+        if sock is None:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+            sock.bind((0, UEVENT_KERNEL_GROUP))
+
+        self.sock = sock
+        self.stop_read, self.stop_write = socket.socketpair()
+
+        self.thread = threading.Thread(target=self._run, name='scw-drm-uevents', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.sock, selectors.EVENT_READ)
+            selector.register(self.stop_read, selectors.EVENT_READ)
+
+            while True:
+                for key, _ in selector.select():
+                    if key.fileobj is self.stop_read:
+                        return
+
+                    try:
+                        message = self.sock.recv(16384)
+                    except OSError:
+                        return
+
+                    event = parse_uevent(message)
+                    if event is not None and event.get('SUBSYSTEM') == 'drm':
+                        self.callback()
+
+    def destroy(self, timeout: Optional[float] = 5.0):
+        self.stop_write.send(b'\x00')
+        self.thread.join(timeout)
+
+        self.sock.close()
+        self.stop_read.close()
+        self.stop_write.close()
+
+
+def get_display_list():
+    print(json.dumps([x.to_dict() for x in get_connected_displays()]))
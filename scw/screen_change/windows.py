@@ -1,8 +1,10 @@
-from typing import Callable
+from typing import Callable, Optional
+
+import threading
 
 import win32con
-from win32gui import CreateWindowEx, WNDCLASS, RegisterClass, DefWindowProc, DestroyWindow
-from win32api import GetModuleHandle
+from win32gui import CreateWindowEx, WNDCLASS, RegisterClass, DefWindowProc, DestroyWindow, PumpMessages
+from win32api import GetModuleHandle, GetCurrentThreadId, PostThreadMessage
 
 
 class ScreenChangeObserver:
@@ -47,22 +49,39 @@ class ScreenChangeObserver:
         return DefWindowProc(hwnd, msg, wparam, lparam)
 
 
+class ScreenChangeThread:
+    """ Runs a ScreenChangeObserver with its own message loop on a background thread. """
+
+    def __init__(self, callback: Callable[[int, int, int], None]):
+        self.callback = callback
+        self.thread_id = None  # type: Optional[int]
+
+        started = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(started,), name='scw-display-changes', daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def _run(self, started: threading.Event):
+        self.thread_id = GetCurrentThreadId()
+        observer = ScreenChangeObserver(self.callback)
+        started.set()
+
+        try:
+            PumpMessages()
+        finally:
+            observer.destroy()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        if self.thread_id is not None:
+            PostThreadMessage(self.thread_id, win32con.WM_QUIT, 0, 0)
+
+        self.thread.join(timeout)
+
+
 def get_display_list():
     from PySide6.QtWidgets import QApplication
-    from PySide6.QtGui import QScreen
-    from typing import List
+    from scw.display_source.qt import QtDisplaySource
     import json
 
     app = QApplication([])
-    screens = app.screens()  # type: List[QScreen]
-
-    res = []
-    for screen in screens:
-        res.append({
-            'name': screen.name(),
-            'model': screen.model(),
-            'serial': screen.serialNumber(),
-            'manufacturer': screen.manufacturer(),
-        })
-
-    print(json.dumps(res))
+    print(json.dumps([x.to_dict() for x in QtDisplaySource(app).get_displays()]))
@@ -0,0 +1,203 @@
+from typing import Callable
+
+import os
+import socket
+import threading
+
+from scw.log import Log
+from scw.event_loop import EventLoop
+
+LOGIND_BUS_NAME = 'org.freedesktop.login1'
+LOGIND_PATH = '/org/freedesktop/login1'
+MANAGER_INTERFACE = 'org.freedesktop.login1.Manager'
+SESSION_INTERFACE = 'org.freedesktop.login1.Session'
+USER_INTERFACE = 'org.freedesktop.login1.User'
+PROPERTIES_INTERFACE = 'org.freedesktop.DBus.Properties'
+
+# jeepney is only needed (and loaded) on Linux, see _import_jeepney
+jeepney = None
+
+
+def _import_jeepney():
+    global jeepney
+    if jeepney is not None:
+        return
+
+    try:
+        import jeepney.io.blocking
+        import jeepney.wrappers
+    except ImportError as e:
+        jeepney = None
+        raise RuntimeError(f'jeepney is required for the logind screen lock events: {e}')
+
+
+class LockStateMachine:
+    """
+    Debounces the session lock state: the lock state has to stay the same for the debounce period before it is
+    reported, so that rapid lock/unlock toggles collapse into at most one callback (or none at all, if the session ends
+    up in the state it was reported in). All the methods are expected to be called on the event loop thread.
+    """
+
+    # Time, the lock state has to stay unchanged for, before it is reported (in seconds)
+    DEBOUNCE_PERIOD = 0.5
+
+    def __init__(self, loop: EventLoop, on_lock: Callable[[], None], on_unlock: Callable[[], None],
+                 locked: bool = False, debounce_period: float = DEBOUNCE_PERIOD):
+        """
+        :param locked: Initial (already reported) lock state.
+        """
+        self.on_lock = on_lock
+        self.on_unlock = on_unlock
+        self.debounce_period = debounce_period
+        self.timer = loop.create_timer(self._settle)
+
+        self.locked = locked
+        self.reported = locked
+
+    def update(self, locked: bool, immediate: bool = False):
+        """
+        :param immediate: Report the state right away, e.g. because the system is about to go to sleep.
+        """
+        self.locked = locked
+        if immediate:
+            self.timer.stop()
+            self._settle()
+        elif locked != self.reported:
+            self.timer.start(self.debounce_period)
+        else:
+            # Back to the reported state before the debounce period was over
+            self.timer.stop()
+
+    def _settle(self):
+        if self.locked == self.reported:
+            return
+
+        self.reported = self.locked
+        if self.locked:
+            self.on_lock()
+        else:
+            self.on_unlock()
+
+    def stop(self):
+        self.timer.stop()
+
+
+class Logind:
+    """
+    Screen lock events of the current session, as reported by systemd-logind over D-Bus: the session's Lock/Unlock
+    signals and LockedHint property, and the PrepareForSleep signal. The signals are received on a background thread
+    (blocking on the bus socket, without any polling) and debounced on the event loop thread.
+    """
+
+    # Time to wait for a D-Bus reply (in seconds)
+    CALL_TIMEOUT = 5.0
+
+    def __init__(self, loop: EventLoop, on_lock: Callable[[], None], on_unlock: Callable[[], None],
+                 bus: str = 'SYSTEM', debounce_period: float = LockStateMachine.DEBOUNCE_PERIOD):
+        """
+        :param bus: D-Bus to connect to: 'SYSTEM', 'SESSION' or a bus address (e.g. of a private bus for testing).
+        """
+        _import_jeepney()
+
+        self.loop = loop
+        self.closed = False
+
+        try:
+            self.connection = jeepney.io.blocking.open_dbus_connection(bus=bus)
+        except (OSError, KeyError, ValueError) as e:
+            raise RuntimeError(f'Unable to connect to the {bus} D-Bus: {e}')
+
+        try:
+            self.session_path = self._find_session()
+
+            rules = [
+                jeepney.MatchRule(type='signal', sender=LOGIND_BUS_NAME, interface=SESSION_INTERFACE,
+                                  path=self.session_path),
+                jeepney.MatchRule(type='signal', sender=LOGIND_BUS_NAME, interface=PROPERTIES_INTERFACE,
+                                  member='PropertiesChanged', path=self.session_path),
+                jeepney.MatchRule(type='signal', sender=LOGIND_BUS_NAME, interface=MANAGER_INTERFACE,
+                                  member='PrepareForSleep', path=LOGIND_PATH),
+            ]
+            for rule in rules:
+                self._call(jeepney.message_bus.AddMatch(rule))
+
+            session = jeepney.DBusAddress(self.session_path, bus_name=LOGIND_BUS_NAME, interface=SESSION_INTERFACE)
+            self.locked_hint = bool(self._call(jeepney.Properties(session).get('LockedHint'))[0][1])
+        except (jeepney.DBusErrorResponse, OSError, TimeoutError) as e:
+            self.connection.close()
+            raise RuntimeError(f'Unable to subscribe to the logind session events: {e}')
+
+        Log.debug('Watching the logind session %s (locked: %s)', self.session_path, self.locked_hint)
+        self.state = LockStateMachine(loop, on_lock, on_unlock, self.locked_hint, debounce_period)
+
+        self.thread = threading.Thread(target=self._run, name='scw-logind', daemon=True)
+        self.thread.start()
+
+    def _call(self, message) -> tuple:
+        """ Body of the reply, raises DBusErrorResponse on errors """
+        return jeepney.wrappers.unwrap_msg(self.connection.send_and_get_reply(message, timeout=Logind.CALL_TIMEOUT))
+
+    def _find_session(self) -> str:
+        """ Object path of the current session, or the user's graphical session if not running inside of one """
+        manager = jeepney.DBusAddress(LOGIND_PATH, bus_name=LOGIND_BUS_NAME, interface=MANAGER_INTERFACE)
+
+        session_id = os.environ.get('XDG_SESSION_ID')
+        if session_id:
+            return self._call(jeepney.new_method_call(manager, 'GetSession', 's', (session_id,)))[0]
+
+        user_path = self._call(jeepney.new_method_call(manager, 'GetUser', 'u', (os.getuid(),)))[0]
+        user = jeepney.DBusAddress(user_path, bus_name=LOGIND_BUS_NAME, interface=USER_INTERFACE)
+        _, (_, session_path) = self._call(jeepney.Properties(user).get('Display'))[0]
+        if session_path == '/':
+            raise OSError(f'No graphical session found for the user {os.getuid()}')
+
+        return session_path
+
+    def _run(self):
+        while not self.closed:
+            try:
+                message = self.connection.receive()
+            except (OSError, EOFError, ValueError) as e:
+                if not self.closed:
+                    Log.error(f'Lost the logind D-Bus connection: {e}')
+                return
+
+            if message.header.message_type != jeepney.MessageType.signal:
+                continue
+
+            fields = message.header.fields
+            interface, member = fields.get(jeepney.HeaderFields.interface), fields.get(jeepney.HeaderFields.member)
+            Log.debug('logind signal: %s.%s %s', interface, member, message.body)
+
+            if interface == SESSION_INTERFACE and member in ('Lock', 'Unlock'):
+                self._post(member == 'Lock')
+            elif interface == PROPERTIES_INTERFACE and member == 'PropertiesChanged':
+                changed = message.body[1]
+                if message.body[0] == SESSION_INTERFACE and 'LockedHint' in changed:
+                    self.locked_hint = bool(changed['LockedHint'][1])
+                    self._post(self.locked_hint)
+            elif interface == MANAGER_INTERFACE and member == 'PrepareForSleep':
+                if message.body[0]:
+                    # Pause before going to sleep, there won't be a debounce period to wait for
+                    self._post(True, immediate=True)
+                else:
+                    # Stays paused if the screen locker kicked in before the sleep
+                    self._post(self.locked_hint)
+
+    def _post(self, locked: bool, immediate: bool = False):
+        self.loop.call_soon_threadsafe(self.state.update, locked, immediate)
+
+    def close(self):
+        """ Should be called on the event loop thread """
+        if self.closed:
+            return
+
+        self.closed = True
+        try:
+            # Wakes up the receiving thread
+            self.connection.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.thread.join(5.0)
+        self.connection.close()
+        self.state.stop()
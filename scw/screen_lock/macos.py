@@ -5,12 +5,15 @@ class MacOS:
         self.on_unlock = on_unlock
 
         from Foundation import NSDistributedNotificationCenter
-        dnc = NSDistributedNotificationCenter.defaultCenter()
-        dnc.addObserver_selector_name_object_(self, '_on_screen_locked', 'com.apple.screenIsLocked', None)
-        dnc.addObserver_selector_name_object_(self, '_on_screen_unlocked', 'com.apple.screenIsUnlocked', None)
+        self.dnc = NSDistributedNotificationCenter.defaultCenter()
+        self.dnc.addObserver_selector_name_object_(self, '_on_screen_locked', 'com.apple.screenIsLocked', None)
+        self.dnc.addObserver_selector_name_object_(self, '_on_screen_unlocked', 'com.apple.screenIsUnlocked', None)
 
     def _on_screen_locked(self):
         self.on_lock()
 
     def _on_screen_unlocked(self):
         self.on_unlock()
+
+    def close(self):
+        self.dnc.removeObserver_(self)
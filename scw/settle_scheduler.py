@@ -0,0 +1,89 @@
+from typing import Callable, Optional
+
+from scw.log import Log
+from scw.config import Config
+from scw.event_loop import EventLoop
+
+
+class SettleScheduler:
+    """
+    Decides when a burst of display changes is over.
+
+    A switch happens as soon as the displays stay unchanged for the settle period and match exactly one preset.
+    Otherwise, the scheduler falls back to waiting for the full grace period after the last change. A continuous
+    stream of changes can't postpone the switch for longer than the max delay, counted from the first change.
+    """
+
+    def __init__(self, loop: EventLoop, config: Config, is_ready: Callable[[], bool], callback: Callable[[], None]):
+        """
+        :param is_ready: Checks whether the current displays can be switched to without waiting for the grace period.
+        :param callback: Called once a burst of changes is over.
+        """
+        self.loop = loop
+        self.config = config
+        self.is_ready = is_ready
+        self.callback = callback
+        self.timer = loop.create_timer(self._on_timer)
+
+        self.burst_start = None  # type: Optional[float]
+        self.last_change = None  # type: Optional[float]
+
+        # Set once the settle period is over, or doesn't matter anymore
+        self.waiting_for_deadline = False
+
+    def notify(self):
+        """ Register a change """
+        now = self.loop.time()
+        if self.burst_start is None:
+            self.burst_start = now
+
+        self.last_change = now
+        self._schedule(now)
+
+    def reschedule(self):
+        """ Re-evaluate a pending switch, e.g. after the timing settings changed """
+        if self.is_pending():
+            self._schedule(self.loop.time())
+
+    def is_pending(self) -> bool:
+        return self.burst_start is not None
+
+    def snapshot(self) -> dict:
+        """ Timer state, safe to call from any thread """
+        burst_start, last_change, waiting_for_deadline = self.burst_start, self.last_change, self.waiting_for_deadline
+        if burst_start is None or last_change is None:
+            return {'pending': False}
+
+        deadline = min(last_change + self.config.grace_period, burst_start + self.config.max_delay)
+        settled_at = last_change + self.config.settle_period
+        due = deadline if waiting_for_deadline else min(settled_at, deadline)
+        now = self.loop.time()
+        return {'pending': True, 'waiting_for_deadline': waiting_for_deadline, 'remaining': max(0.0, due - now),
+                'deadline_remaining': max(0.0, deadline - now)}
+
+    def deadline(self) -> float:
+        """ Latest point in time, the current burst of changes will be over at """
+        return min(self.last_change + self.config.grace_period, self.burst_start + self.config.max_delay)
+
+    def _schedule(self, now: float):
+        deadline = self.deadline()
+        settled_at = self.last_change + self.config.settle_period
+
+        self.waiting_for_deadline = settled_at >= deadline
+        self.timer.start(max(0.0, min(settled_at, deadline) - now))
+
+    def _on_timer(self):
+        if not self.waiting_for_deadline and not self.is_ready():
+            Log.debug('Displays settled, but do not match a single preset, waiting for the grace period')
+            self.waiting_for_deadline = True
+            self.timer.start(max(0.0, self.deadline() - self.loop.time()))
+            return
+
+        self.stop()
+        self.callback()
+
+    def stop(self):
+        self.timer.stop()
+        self.burst_start = None
+        self.last_change = None
+        self.waiting_for_deadline = False
@@ -0,0 +1,180 @@
+from typing import Callable, List, Optional, Tuple
+
+import copy
+import heapq
+import json
+import functools
+import itertools
+
+from scw.log import Log
+from scw.config import Config
+from scw.event_loop import EventLoop, Timer
+from scw.settle_scheduler import SettleScheduler
+
+
+class VirtualTimer(Timer):
+    def __init__(self, loop: 'VirtualEventLoop', callback: Callable[[], None]):
+        self.loop = loop
+        self.callback = callback
+        self.generation = 0
+        self.active = False
+
+    def _on_timeout(self, generation: int):
+        if generation != self.generation or not self.active:
+            # Restarted or stopped in the meantime
+            return
+
+        self.active = False
+        self.callback()
+
+    def start(self, seconds: float):
+        self.generation += 1
+        self.active = True
+        self.loop.call_at(self.loop.time() + seconds, self._on_timeout, self.generation)
+
+    def stop(self):
+        self.active = False
+
+    def is_active(self) -> bool:
+        return self.active
+
+
+class VirtualEventLoop(EventLoop):
+    """ Single-threaded event loop with a virtual clock, which only advances when told to """
+
+    def __init__(self):
+        self.now = 0.0
+        self.queue = []  # type: List[Tuple[float, int, Callable[[], None]]]
+        self.sequence = itertools.count()
+
+    def create_timer(self, callback: Callable[[], None]) -> Timer:
+        return VirtualTimer(self, callback)
+
+    def call_soon_threadsafe(self, callback: Callable[..., None], *args):
+        self.call_at(self.now, callback, *args)
+
+    def call_at(self, when: float, callback: Callable[..., None], *args):
+        heapq.heappush(self.queue, (when, next(self.sequence), functools.partial(callback, *args)))
+
+    def stop(self):
+        self.queue.clear()
+
+    def time(self) -> float:
+        return self.now
+
+    def run_until(self, when: float):
+        """ Run all the callbacks, scheduled up to (and including) the specified point in time """
+        while len(self.queue) != 0 and self.queue[0][0] <= when:
+            self.now, _, callback = heapq.heappop(self.queue)
+            callback()
+
+        self.now = max(self.now, when)
+
+    def run_all(self):
+        while len(self.queue) != 0:
+            self.run_until(self.queue[0][0])
+
+
+# Point in time (in seconds) and the names of the displays, connected from that point on
+TimelineEvent = Tuple[float, List[str]]
+
+
+def load_timeline(file_path: str) -> List[TimelineEvent]:
+    """ Read a timeline from a JSON lines file: one {"time": <seconds>, "displays": [<names>]} object per line """
+    result = []  # type: List[TimelineEvent]
+
+    with open(file_path, 'r') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+
+            try:
+                entry = json.loads(line)
+                result.append((float(entry['time']), list(entry['displays'])))
+            except (ValueError, KeyError, TypeError) as e:
+                raise RuntimeError(f'{file_path}:{line_number}: invalid timeline event: {e}')
+
+    result.sort(key=lambda x: x[0])
+    return result
+
+
+class Switch:
+    """ A single switch, performed during a simulation """
+
+    def __init__(self, burst_start: float, last_change: float, applied_at: float, preset: Optional[str]):
+        self.burst_start = burst_start
+        self.last_change = last_change
+        self.applied_at = applied_at
+        self.preset = preset
+
+    def __str__(self):
+        return f"burst_start={self.burst_start:.3f}, last_change={self.last_change:.3f}, " \
+               f"applied_at={self.applied_at:.3f}, preset='{self.preset}'"
+
+    def __repr__(self):
+        return f'Switch({self})'
+
+    def time_to_switch(self) -> float:
+        """ Time between the displays becoming final and the switch """
+        return self.applied_at - self.last_change
+
+
+def fixed_grace_period(config: Config) -> Config:
+    """ Timing of a plain single-shot timer, restarted on each change (the behavior before the settle scheduler) """
+    result = copy.copy(config)
+    result.settle_period = config.grace_period
+    result.max_delay = float('inf')
+    return result
+
+
+def simulate(config: Config, timeline: List[TimelineEvent]) -> List[Switch]:
+    """ Replay a timeline against the settle scheduler, using the config timing and presets """
+    loop = VirtualEventLoop()
+    result = []  # type: List[Switch]
+
+    state = {'displays': [], 'burst_start': 0.0, 'last_change': 0.0}
+
+    def has_single_match() -> bool:
+        return len(config.find_matching_preset(state['displays'])) == 1
+
+    def apply_changes():
+        presets = config.find_matching_preset(state['displays'])
+        preset = presets[0].name if len(presets) == 1 else None
+        result.append(Switch(state['burst_start'], state['last_change'], loop.time(), preset))
+
+    scheduler = SettleScheduler(loop, config, has_single_match, apply_changes)
+
+    for when, displays in timeline:
+        loop.run_until(when)
+
+        if sorted(x.lower() for x in displays) == sorted(x.lower() for x in state['displays']):
+            continue
+
+        if not scheduler.is_pending():
+            state['burst_start'] = when
+
+        state['displays'] = displays
+        state['last_change'] = when
+        scheduler.notify()
+
+    loop.run_all()
+    return result
+
+
+def summarize(switches: List[Switch]) -> str:
+    if len(switches) == 0:
+        return 'no switches'
+
+    delays = sorted(x.time_to_switch() for x in switches)
+    return f'switches={len(switches)}, time_to_switch: mean={sum(delays) / len(delays):.3f}s, ' \
+           f'median={delays[len(delays) // 2]:.3f}s, max={delays[-1]:.3f}s'
+
+
+def compare(config: Config, timeline: List[TimelineEvent]):
+    """ Print the switches for the adaptive and the fixed scheduling """
+    for title, timing in (('adaptive', config), ('fixed', fixed_grace_period(config))):
+        switches = simulate(timing, timeline)
+        for switch in switches:
+            Log.debug(f'{title}: {switch}')
+
+        print(f'{title}: {summarize(switches)}')
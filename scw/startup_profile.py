@@ -0,0 +1,75 @@
+from typing import Dict, List, Optional, Tuple
+
+import builtins
+import sys
+import time
+
+
+class StartupProfile:
+    """ Collects per-phase and per-import timings of the start-up, up to the first preset match """
+
+    # Number of the slowest imports to report
+    MAX_IMPORTS = 15
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = []  # type: List[Tuple[str, float]]
+        self.imports = {}  # type: Dict[str, float]
+        self.original_import = None
+
+        # Maximal time (since the start of the profiling) per phase, in seconds
+        self.budgets = {}  # type: Dict[str, float]
+
+    def install_import_hook(self):
+        """ Time the first import of each module (including everything it imports in turn) """
+        original_import = builtins.__import__
+        imports = self.imports
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level != 0 or name in sys.modules:
+                return original_import(name, globals, locals, fromlist, level)
+
+            start = time.perf_counter()
+            try:
+                return original_import(name, globals, locals, fromlist, level)
+            finally:
+                imports.setdefault(name, time.perf_counter() - start)
+
+        self.original_import = original_import
+        builtins.__import__ = timed_import
+
+    def remove_import_hook(self):
+        if self.original_import is not None:
+            builtins.__import__ = self.original_import
+            self.original_import = None
+
+    def mark(self, phase: str):
+        """ Record the end of a start-up phase """
+        self.phases.append((phase, time.perf_counter() - self.start))
+
+    def has_mark(self, phase: str) -> bool:
+        return any(x == phase for x, _ in self.phases)
+
+    def set_budget(self, phase: str, seconds: float):
+        self.budgets[phase] = seconds
+
+    def exceeded_budgets(self) -> List[str]:
+        """ Descriptions of the phases, which took longer than their budget (phases not reached are ignored) """
+        return [f'{phase} after {at * 1000:.1f} ms (budget: {self.budgets[phase] * 1000:.1f} ms)'
+                for phase, at in self.phases if phase in self.budgets and at > self.budgets[phase]]
+
+    def report(self, max_imports: Optional[int] = MAX_IMPORTS) -> str:
+        lines = ['Start-up phases (since the start of the profiling, duration):']
+
+        previous = 0.0
+        for phase, at in self.phases:
+            lines.append(f'  {phase:<24} {at * 1000:9.1f} ms  (+{(at - previous) * 1000:.1f} ms)')
+            previous = at
+
+        slowest = sorted(self.imports.items(), key=lambda x: x[1], reverse=True)[:max_imports]
+        if len(slowest) != 0:
+            lines.append('Slowest imports (including their own imports):')
+            for name, duration in slowest:
+                lines.append(f'  {name:<40} {duration * 1000:9.1f} ms')
+
+        return '\n'.join(lines)
@@ -0,0 +1,77 @@
+from typing import Callable, IO, List
+
+import gzip
+import json
+
+from scw.display_source import Display
+
+# Event types
+DISPLAYS = 'displays'
+LOCK = 'lock'
+UNLOCK = 'unlock'
+CONFIG = 'config'
+
+
+def open_trace(file_path: str, mode: str) -> IO[str]:
+    """ Open a trace file in text mode, traces with the ".gz" extension are gzip-compressed """
+    if file_path.endswith('.gz'):
+        return gzip.open(file_path, mode + 't', encoding='utf-8')
+
+    return open(file_path, mode, encoding='utf-8')
+
+
+class TraceRecorder:
+    """
+    Records the watcher inputs (display lists, screen lock state and configuration contents) as JSON lines, one
+    timestamped event per line. Only used from the event loop thread.
+    """
+
+    def __init__(self, file_path: str, clock: Callable[[], float]):
+        """
+        :param clock: Source of the timestamps (in seconds), the events are stored relative to the first call.
+        """
+        self.file_path = file_path
+        self.clock = clock
+        self.start = clock()
+        self.file = open_trace(file_path, 'w')
+
+    def record(self, event_type: str, **kwargs):
+        event = {'t': round(self.clock() - self.start, 6), 'type': event_type}
+        event.update(kwargs)
+
+        self.file.write(json.dumps(event, separators=(',', ':')) + '\n')
+        self.file.flush()
+
+    def record_displays(self, displays: List[Display]):
+        self.record(DISPLAYS, displays=[x.to_dict() for x in displays])
+
+    def record_lock(self, locked: bool):
+        self.record(LOCK if locked else UNLOCK)
+
+    def record_config(self, config_path: str):
+        with open(config_path, 'rb') as f:
+            self.record(CONFIG, text=f.read().decode('utf-8'))
+
+    def close(self):
+        self.file.close()
+
+
+def load_trace(file_path: str) -> List[dict]:
+    result = []  # type: List[dict]
+
+    with open_trace(file_path, 'r') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+
+            try:
+                event = json.loads(line)
+                event['t'] = float(event['t'])
+                if event['type'] not in (DISPLAYS, LOCK, UNLOCK, CONFIG):
+                    raise ValueError(f'unknown event type: {event["type"]}')
+            except (ValueError, KeyError, TypeError) as e:
+                raise RuntimeError(f'{file_path}:{line_number}: invalid trace event: {e}')
+
+            result.append(event)
+
+    return result
@@ -0,0 +1,109 @@
+from typing import List, Optional
+
+import os
+import sys
+import json
+import hashlib
+
+from scw.log import Log
+from scw.display_identity import name_key, fingerprint_key
+from scw.display_source import Display
+
+
+def default_state_path() -> str:
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Local')
+    elif sys.platform == 'darwin':
+        base = os.path.join(os.path.expanduser('~'), 'Library', 'Application Support')
+    else:
+        base = os.environ.get('XDG_STATE_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'state')
+
+    return os.path.join(base, 'screen-config-watcher', 'state.json')
+
+
+def display_set_digest(displays: List[Display]) -> str:
+    """ Order-independent digest of the display names and fingerprints, stable across process restarts """
+    keys = sorted(f'{name_key(x.name)}|{fingerprint_key(x.manufacturer, x.model, x.serial)}' for x in displays)
+    return hashlib.sha256('\n'.join(keys).encode('utf-8')).hexdigest()
+
+
+class WarmState:
+    """ Preset, applied to a display set under a configuration, as remembered across process restarts """
+
+    def __init__(self, config_path: str, config_hash: str, displays: str, preset: str):
+        """
+        :param displays: Digest of the display set, see display_set_digest.
+        """
+        self.config_path = config_path
+        self.config_hash = config_hash
+        self.displays = displays
+        self.preset = preset
+
+    def __str__(self):
+        return f"config_path='{self.config_path}', config_hash='{self.config_hash}', displays='{self.displays}', " \
+               f"preset='{self.preset}'"
+
+    def __repr__(self):
+        return f"WarmState(config_path='{self.config_path}', config_hash='{self.config_hash}', " \
+               f"displays='{self.displays}', preset='{self.preset}')"
+
+    def _as_tuple(self) -> tuple:
+        return self.config_path, self.config_hash, self.displays, self.preset
+
+    def __eq__(self, other: 'WarmState'):
+        return self._as_tuple() == other._as_tuple()
+
+
+class WarmStateStore:
+    """
+    Keeps the last applied preset in a small JSON file, so that a restarted watcher doesn't have to wait for the grace
+    period and switch OBS again if nothing has changed in the meantime. A missing, corrupt or outdated file is
+    treated as no state at all.
+    """
+
+    # Bumped whenever the stored layout changes
+    FORMAT_VERSION = 1
+
+    def __init__(self, file_path: Optional[str] = None):
+        self.file_path = file_path if file_path is not None else default_state_path()
+        self.last_stored = None  # type: Optional[WarmState]
+
+    def load(self) -> Optional[WarmState]:
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+
+            if entry.get('version') != WarmStateStore.FORMAT_VERSION:
+                return None
+
+            fields = (entry['config_path'], entry['config_hash'], entry['displays'], entry['preset'])
+            if not all(isinstance(x, str) for x in fields):
+                raise ValueError('unexpected field types')
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            Log.debug('Ignoring a broken state file %s: %s', self.file_path, e)
+            return None
+
+        self.last_stored = WarmState(*fields)
+        return self.last_stored
+
+    def store(self, state: WarmState):
+        if self.last_stored is not None and state == self.last_stored:
+            return
+
+        entry = {'version': WarmStateStore.FORMAT_VERSION, 'config_path': state.config_path,
+                 'config_hash': state.config_hash, 'displays': state.displays, 'preset': state.preset}
+
+        tmp_path = f'{self.file_path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.file_path)), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self.file_path)
+        except OSError as e:
+            # Only costs a grace period on the next start
+            Log.warning(f'Unable to store the state file {self.file_path}: {e}')
+            return
+
+        self.last_stored = state
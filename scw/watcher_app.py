@@ -1,160 +1,79 @@
-from typing import List
+from typing import Callable, Optional
 
-from PySide6.QtCore import QTimer, Signal, Qt
-from PySide6.QtGui import QGuiApplication, QScreen
+from PySide6.QtCore import QCoreApplication, QObject, QTimer, QSocketNotifier, Signal, Qt
 from PySide6.QtWidgets import QMainWindow, QApplication
 
 import sys
 import signal
-import subprocess
-import json
+import socket
+import functools
 
 from sys import platform
 
 from scw.log import Log
 from scw.options import Options
-from scw.config import Config
 from scw.config_file_watcher import ConfigFileWatcher
+from scw.display_source import DisplaySource, create_display_source
+from scw.engine import WatcherEngine
+from scw.event_loop import EventLoop, Timer
 
-from obwsc.cli.obws_command import main
 
+class QtTimer(Timer):
+    def __init__(self, callback: Callable[[], None]):
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(callback)
 
-# noinspection PyUnresolvedReferences
-class MainWindow(QMainWindow):
-    config_changed = Signal()
-
-    @staticmethod
-    def print_screen_info(screen: QScreen):
-        Log.info(f"name='{screen.name()}', manufacturer='{screen.manufacturer()}', "
-                 f"model='{screen.model()}', s/n='{screen.serialNumber()}'")
-
-    def __init__(self, options: Options, **kwargs):
-        super().__init__(**kwargs)
-
-        self.options = options
-
-        self.app = QGuiApplication.instance()
-        self.app.screenAdded.connect(self.screen_added)
-        self.app.screenRemoved.connect(self.screen_removed)
-
-        self.apply_changes_timer = QTimer()
-        self.apply_changes_timer.setSingleShot(True)
-        self.apply_changes_timer.timeout.connect(self.apply_changes)
+    def start(self, seconds: float):
+        self.timer.start(int(seconds * 1000))
 
-        self.options.config.subscribe_to_changes(self.handle_config_change)
-        self.config_changed.connect(self._restart_timer)
+    def stop(self):
+        self.timer.stop()
 
-        Log.info('Listing current screens...')
-        screens = self.app.screens()  # type: List[QScreen]
-        for screen in screens:
-            self.print_screen_info(screen)
+    def is_active(self) -> bool:
+        return self.timer.isActive()
 
-        self.last_screens = [x.name() for x in screens]
 
-        self.screen_change_observer = self._subscribe_to_screen_change_events()
-        self.screen_lock_listener = self._subscribe_to_screen_lock_events()
-
-    def _manual_recheck(self):
-        Log.debug(f'Display configuration changed, getting a fresh display list')
-
-        code = """from scw.screen_change.windows import get_display_list
-get_display_list() 
-        """
-        try:
-            get_res = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
-        except subprocess.CalledProcessError as e:
-            Log.error("Error while running the target function:", e)
-            return
-
-        monitors_json = json.loads(get_res)
-        new_list = [x['name'] for x in monitors_json]
-
-        if sorted(self.last_screens) != sorted(new_list):
-            Log.info('Software configuration changed')
-            self._restart_timer()
-
-        self.last_screens = new_list
+# noinspection PyUnresolvedReferences
+class QtEventLoop(QObject, EventLoop):
+    invoke = Signal(object)
 
-    def _subscribe_to_screen_lock_events(self):
-        if sys.platform == 'darwin':
-            from scw.screen_lock.macos import MacOS
-            return MacOS(on_lock=self._on_screen_locked, on_unlock=self._on_screen_unlocked)
+    def __init__(self):
+        super().__init__()
+        self.invoke.connect(self._on_invoke, Qt.ConnectionType.QueuedConnection)
 
-        # TODO: Linux and Windows
+    @staticmethod
+    def _on_invoke(fn: Callable[[], None]):
+        fn()
 
-    def _subscribe_to_screen_change_events(self):
-        if platform == 'win32':
-            # Handle screen configuration changes on Windows: Qt somehow doesn't generate a new list of screens
-            from scw.screen_change.windows import ScreenChangeObserver
+    def create_timer(self, callback: Callable[[], None]) -> Timer:
+        return QtTimer(callback)
 
-            def screen_change(*_):
-                self._manual_recheck()
+    def call_soon_threadsafe(self, callback: Callable[..., None], *args):
+        self.invoke.emit(functools.partial(callback, *args))
 
-            return ScreenChangeObserver(screen_change)
+    def stop(self):
+        QCoreApplication.quit()
 
-    def _run_obws_command(self, *args):
-        Log.debug(f'Running OBWS command: {" ".join(args)}')
-        if self.options.dry_run:
-            Log.debug('Dry run, skipping')
-            return
 
-        try:
-            # noinspection PyTypeChecker
-            main(args)
-        except RuntimeError as e:
-            Log.error(f'Command error: {e}')
-
-    def _on_screen_locked(self):
-        self._run_obws_command('--config', self.options.config.obwsc_config, 'pause-record')
+# noinspection PyUnresolvedReferences
+class MainWindow(QMainWindow):
+    def __init__(self, options: Options, display_source: Optional[DisplaySource] = None, **kwargs):
+        super().__init__(**kwargs)
 
-    def _on_screen_unlocked(self):
-        self._run_obws_command('--config', self.options.config.obwsc_config, 'resume-record')
+        self.options = options
+        self.loop = QtEventLoop()
 
-    def _restart_timer(self):
-        self.apply_changes_timer.start(self.options.config.grace_period * 1000)
+        if display_source is None:
+            display_source = create_display_source(platform)
 
-    def handle_config_change(self, _: Config):
-        self.config_changed.emit()
+        self.engine = WatcherEngine(options, display_source, self.loop)
 
     def start(self):
-        self._restart_timer()
-
-    def screen_added(self, screen: QScreen):
-        Log.info('Screen added')
-        MainWindow.print_screen_info(screen)
-        self.last_screens = [x.name() for x in self.app.screens()]
-        self._restart_timer()
-
-    def screen_removed(self, screen: QScreen):
-        Log.info('Screen removed')
-        MainWindow.print_screen_info(screen)
-        self.last_screens = [x.name() for x in self.app.screens()]
-        self._restart_timer()
-
-    def apply_changes(self):
-        Log.debug('Applying changes...')
-
-        presets = self.options.config.find_matching_preset(self.last_screens)
-        if len(presets) == 0:
-            Log.warning(f'No preset found for {self.last_screens}')
-            return
-
-        if len(presets) > 1:
-            Log.warning(f'Multiple presets found for {self.last_screens}: {[x.name for x in presets]}')
-            return
-
-        preset = presets[0]
-
-        Log.debug(f'Applying preset: {preset.name}. Profile: {preset.profile_name}, '
-                  f'Scene Collection: {preset.scene_collection_name}')
-
-        self._run_obws_command('--config', self.options.config.obwsc_config, 'switch-profile-and-scene-collection',
-                               preset.profile_name, preset.scene_collection_name)
+        self.engine.start()
 
     def closeEvent(self, event):
-        if self.screen_change_observer is not None:
-            self.observer.destroy()
-
+        self.engine.close()
         event.accept()
 
 
@@ -163,7 +82,7 @@ class ScreenConfigWatcherApp:
     INSTANCE = None  # type: ScreenConfigWatcherApp
     SIGNAL_TIMER_MS = 100
 
-    def __init__(self, options: Options):
+    def __init__(self, options: Options, display_source: Optional[DisplaySource] = None):
         self.hide_dock()
         self.app = QApplication(sys.argv)
 
@@ -171,17 +90,35 @@ class ScreenConfigWatcherApp:
         signal.signal(signal.SIGTERM, ScreenConfigWatcherApp.signal_handler)
         if platform != 'win32':
             signal.signal(signal.SIGQUIT, ScreenConfigWatcherApp.signal_handler)
+
+            # Wake the interpreter up through a socket whenever a signal arrives, otherwise the Python signal handlers
+            # only get to run once Qt calls back into Python for some other reason.
+            self.signal_read, self.signal_write = socket.socketpair()
+            self.signal_read.setblocking(False)
+            self.signal_write.setblocking(False)
+            signal.set_wakeup_fd(self.signal_write.fileno())
+
+            self.signal_notifier = QSocketNotifier(self.signal_read.fileno(), QSocketNotifier.Type.Read)
+            self.signal_notifier.activated.connect(self._drain_signal_socket)
+            self.signal_timer = None
         else:
             self.app.setAttribute(Qt.ApplicationAttribute.AA_NativeWindows, True)
 
-        # Let the interpreter run each 500 ms, otherwise we can't receive signals
-        self.signal_timer = QTimer()
-        self.signal_timer.timeout.connect(lambda: None)
+            # Let the interpreter run each 100 ms, otherwise we can't receive signals
+            self.signal_timer = QTimer()
+            self.signal_timer.timeout.connect(lambda: None)
 
-        self.widget = MainWindow(options)
+        self.widget = MainWindow(options, display_source)
 
         ScreenConfigWatcherApp.INSTANCE = self
 
+    def _drain_signal_socket(self):
+        try:
+            while self.signal_read.recv(64):
+                pass
+        except BlockingIOError:
+            pass
+
     # noinspection PyPackageRequirements
     @staticmethod
     def hide_dock():
@@ -196,9 +133,13 @@ class ScreenConfigWatcherApp:
         ScreenConfigWatcherApp.INSTANCE.app.quit()
 
     def run(self):
-        with ConfigFileWatcher(config=self.widget.options.config):
-            self.signal_timer.start(ScreenConfigWatcherApp.SIGNAL_TIMER_MS)
+        with ConfigFileWatcher(config=self.widget.options.config,
+                               on_obwsc_config_change=self.widget.engine.post_obwsc_config_change):
+            if self.signal_timer is not None:
+                self.signal_timer.start(ScreenConfigWatcherApp.SIGNAL_TIMER_MS)
+
             self.widget.start()
             res = self.app.exec()
 
+        self.widget.engine.close()
         sys.exit(res)
@@ -0,0 +1,12 @@
+import argparse
+
+import pytest
+
+from scw.log import Log
+
+
+@pytest.fixture(autouse=True, scope='session')
+def log():
+    # Can only be set up once per process, warnings and errors need it
+    if Log.INSTANCE is None:
+        Log.setup(argparse.Namespace(info=False, debug=False))
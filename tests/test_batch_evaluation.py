@@ -0,0 +1,116 @@
+import json
+
+import pytest
+
+from scw.batch_evaluation import AMBIGUOUS, ERROR, NO_MATCH, UNIQUE, BatchEvaluator, Summary, evaluate
+from scw.config import Config
+
+CONFIG = '''
+[obwsc]
+config = "obwsc.toml"
+
+[settings]
+grace_period = 1
+
+[presets.docked]
+displays = ["DELL U2720Q", "Built-in Retina Display"]
+profile = "Docked"
+scene_collection = "Docked"
+
+[presets.laptop]
+displays = ["Built-in Retina Display"]
+profile = "Laptop"
+scene_collection = "Laptop"
+
+[presets.any_lg]
+rules = [{ glob = "LG*" }]
+profile = "LG"
+scene_collection = "LG"
+
+[presets.any_lg_again]
+rules = [{ regex = "LG.*" }]
+profile = "LG"
+scene_collection = "LG"
+'''
+
+INVENTORY = [
+    '["Built-in Retina Display", "dell u2720q"]',
+    '[{"name": "Built-in Retina Display", "manufacturer": "APP", "model": "", "serial": ""}]',
+    '["Unknown"]',
+    '["LG HDR 4K"]',
+    '',
+    'not json',
+    '{"name": "DELL U2720Q"}',
+    '[{"name": 5}]',
+    '[{"model": "U2720Q"}]',
+    '[5]',
+]
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / 'config.toml'
+    path.write_text(CONFIG)
+    return str(path)
+
+
+def test_evaluate(config_path):
+    config = Config.load_from_file(config_path)
+    results = [evaluate(config, i, line) for i, line in enumerate(INVENTORY, start=1) if line]
+
+    assert [(x['line'], x['result'], x.get('presets')) for x in results] == [
+        (1, UNIQUE, ['docked']),
+        (2, UNIQUE, ['laptop']),
+        (3, NO_MATCH, []),
+        (4, AMBIGUOUS, ['any_lg', 'any_lg_again']),
+        (6, ERROR, None),
+        (7, ERROR, None),
+        (8, ERROR, None),
+        (9, ERROR, None),
+        (10, ERROR, None),
+    ]
+
+
+def test_summary(config_path):
+    summary = Summary()
+    for result, preset, _ in BatchEvaluator(config_path).evaluate(INVENTORY):
+        summary.add(result, preset)
+
+    assert summary.results == {NO_MATCH: 1, UNIQUE: 2, AMBIGUOUS: 1, ERROR: 5}
+    assert summary.presets == {'docked': 1, 'laptop': 1}
+
+
+def make_inventory(count: int):
+    names = ['"Built-in Retina Display"', '"DELL U2720Q"', '"LG HDR 4K"', '"Unknown"', '5']
+    return [f'[{names[i % len(names)]}, {names[i * 7 % len(names)]}]' for i in range(count)]
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_output_order(config_path, processes):
+    inventory = make_inventory(500)
+    expected = list(BatchEvaluator(config_path, 1).evaluate(inventory))
+
+    results = list(BatchEvaluator(config_path, processes, chunk_size=7).evaluate(inventory))
+    assert results == expected
+    assert [json.loads(x[2])['line'] for x in results] == list(range(1, len(inventory) + 1))
+
+
+def test_input_is_read_in_bounded_windows(config_path):
+    inventory = make_inventory(2000)
+    chunk_size = 10
+    evaluator = BatchEvaluator(config_path, 2, chunk_size=chunk_size)
+    window = 2 * BatchEvaluator.CHUNKS_PER_PROCESS * chunk_size
+
+    consumed = 0
+
+    def lines():
+        nonlocal consumed
+        for line in inventory:
+            consumed += 1
+            yield line
+
+    # Never more than one window ahead of the results
+    for count, _ in enumerate(evaluator.evaluate(lines()), start=1):
+        assert consumed - count <= window
+
+    assert consumed == len(inventory)
@@ -0,0 +1,142 @@
+import os
+import marshal
+
+import pytest
+
+from scw import metrics
+from scw.config import Config
+from scw.config_cache import ConfigCache
+from scw.log import Log
+
+CONFIG = '''
+[obwsc]
+config = "obwsc.toml"
+
+[settings]
+grace_period = 1
+
+[presets.docked]
+displays = ["DELL U2720Q", "Built-in Retina Display"]
+profile = "Docked"
+scene_collection = "Docked"
+
+[presets.first]
+rules = [{ glob = "LG*" }]
+profile = "First"
+scene_collection = "First"
+
+[presets.second]
+rules = [{ regex = "LG.*" }]
+profile = "Second"
+scene_collection = "Second"
+'''
+
+OVERLAP_WARNING = 'These presets might match the same displays: "first" and "second", the switch is skipped if they do'
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / 'config.toml'
+    path.write_text(CONFIG)
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ConfigCache(str(tmp_path / 'cache'))
+
+
+@pytest.fixture
+def warnings(monkeypatch):
+    result = []
+    monkeypatch.setattr(Log, 'warning', lambda msg, *args, **kwargs: result.append(msg))
+    return result
+
+
+def load(config_path, cache):
+    signature = Config.file_signature(config_path)
+    with open(config_path, 'rb') as f:
+        return cache.load(config_path, signature, Config.content_hash_of(f.read()))
+
+
+def test_round_trip(config_path, cache):
+    config = Config.load_from_file(config_path, cache)
+
+    hits = metrics.CONFIG_CACHE_HITS.value
+    cached = load(config_path, cache)
+    assert cached == config
+    assert cached.content_hash == config.content_hash
+    assert metrics.CONFIG_CACHE_HITS.value == hits + 1
+
+
+def test_cache_hit_reports_warnings(config_path, cache, warnings):
+    Config.load_from_file(config_path, cache)
+    assert warnings == [OVERLAP_WARNING]
+
+    warnings.clear()
+    parses = metrics.CONFIG_PARSES.value
+    config = Config.load_from_file(config_path, cache)
+    assert metrics.CONFIG_PARSES.value == parses
+    assert warnings == [OVERLAP_WARNING]
+    assert config.warnings == [OVERLAP_WARNING]
+
+
+@pytest.mark.parametrize('corrupt', [
+    lambda data: data[:len(data) // 2],
+    lambda data: data[:1],
+    lambda data: b'',
+    lambda data: os.urandom(len(data)),
+    lambda data: b'\xff' * 64,
+    lambda data: marshal.dumps((ConfigCache.FORMAT_VERSION, 'config.toml')),
+    lambda data: marshal.dumps('not a tuple'),
+], ids=['truncated', 'one-byte', 'empty', 'random', 'garbage', 'short-entry', 'wrong-type'])
+def test_corrupt_entry(config_path, cache, warnings, corrupt):
+    Config.load_from_file(config_path, cache)
+    entry_path = cache._entry_path(config_path)
+    with open(entry_path, 'rb') as f:
+        data = f.read()
+    with open(entry_path, 'wb') as f:
+        f.write(corrupt(data))
+
+    assert load(config_path, cache) is None
+
+    # A miss falls back to parsing, and replaces the broken entry
+    assert Config.load_from_file(config_path, cache).presets[0].name == 'docked'
+    assert load(config_path, cache) is not None
+
+
+def test_format_version_mismatch(config_path, cache, monkeypatch):
+    Config.load_from_file(config_path, cache)
+    monkeypatch.setattr(ConfigCache, 'FORMAT_VERSION', ConfigCache.FORMAT_VERSION + 1)
+    assert load(config_path, cache) is None
+
+
+def test_changed_signature(config_path, cache):
+    Config.load_from_file(config_path, cache)
+    mtime_ns, size = Config.file_signature(config_path)
+
+    with open(config_path, 'rb') as f:
+        content_hash = Config.content_hash_of(f.read())
+    assert cache.load(config_path, (mtime_ns, size), content_hash) is not None
+    assert cache.load(config_path, (mtime_ns + 1, size), content_hash) is None
+    assert cache.load(config_path, (mtime_ns, size + 1), content_hash) is None
+
+
+def test_changed_content_hash(config_path, cache):
+    Config.load_from_file(config_path, cache)
+    signature = Config.file_signature(config_path)
+
+    assert cache.load(config_path, signature, Config.content_hash_of(b'something else')) is None
+
+
+def test_changed_file_is_parsed_again(config_path, cache):
+    Config.load_from_file(config_path, cache)
+
+    with open(config_path, 'a') as f:
+        f.write('\n[presets.laptop]\ndisplays = ["Built-in Retina Display"]\nprofile = "Laptop"\n'
+                'scene_collection = "Laptop"\n')
+
+    parses = metrics.CONFIG_PARSES.value
+    config = Config.load_from_file(config_path, cache)
+    assert metrics.CONFIG_PARSES.value == parses + 1
+    assert [x.name for x in config.presets] == ['docked', 'first', 'second', 'laptop']
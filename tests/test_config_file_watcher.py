@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+from scw import metrics
+from scw.config import Config
+from scw.config_file_watcher import ConfigFileWatcher
+
+CONFIG = '''
+[obwsc]
+config = "{obwsc}"
+
+[settings]
+grace_period = {grace_period}
+
+[presets.docked]
+displays = ["DELL U2720Q"]
+profile = "Docked"
+scene_collection = "Docked"
+'''
+
+# Time to wait for a reload (in seconds), generous for the polling watcher
+RELOAD_TIMEOUT = 10.0
+
+
+@pytest.fixture
+def watched(tmp_path, monkeypatch):
+    monkeypatch.setattr(ConfigFileWatcher, 'DEBOUNCE_PERIOD', 0.1)
+
+    obwsc = tmp_path / 'obwsc.toml'
+    obwsc.write_text('[obs]\nhost = "localhost"\nport = 4455\n')
+    path = tmp_path / 'config.toml'
+
+    def render(grace_period: int) -> str:
+        return CONFIG.format(obwsc=obwsc.as_posix(), grace_period=grace_period)
+
+    path.write_text(render(1))
+
+    config = Config.load_from_file(str(path))
+    changed = threading.Event()
+    config.subscribe_to_changes(lambda *_: changed.set())
+
+    with ConfigFileWatcher(config):
+        yield config, path, changed, render
+
+
+def test_burst_of_writes_is_parsed_once(watched):
+    config, path, changed, render = watched
+    parses = metrics.CONFIG_PARSES.value
+
+    for _ in range(5):
+        path.write_text(render(2))
+
+    assert changed.wait(RELOAD_TIMEOUT)
+    assert config.grace_period == 2
+
+    # No other reload pending
+    changed.clear()
+    assert not changed.wait(0.5)
+    assert metrics.CONFIG_PARSES.value - parses == 1
+
+
+def test_atomic_rename_is_parsed_once(watched):
+    config, path, changed, render = watched
+    parses = metrics.CONFIG_PARSES.value
+
+    tmp_path = path.with_name('config.toml.tmp')
+    tmp_path.write_text(render(3))
+    tmp_path.replace(path)
+
+    assert changed.wait(RELOAD_TIMEOUT)
+    assert config.grace_period == 3
+
+    changed.clear()
+    assert not changed.wait(0.5)
+    assert metrics.CONFIG_PARSES.value - parses == 1
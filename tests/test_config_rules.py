@@ -0,0 +1,223 @@
+import itertools
+import random
+from typing import List
+
+import pytest
+
+from scw.config import Config
+from scw.log import Log
+
+Rule = Config.Rule
+
+
+def preset(name: str, *rules: Rule, displays=None) -> Config.Preset:
+    return Config.Preset(name, displays or [], name, name, rules=list(rules))
+
+
+def config(*presets: Config.Preset) -> Config:
+    return Config('config.toml', 'obwsc.toml', 1, list(presets))
+
+
+def names_of(presets: List[Config.Preset]) -> List[str]:
+    return [x.name for x in presets]
+
+
+def brute_force_matches(rules: List[Rule], names: List[str]) -> bool:
+    """ Tries every assignment of the displays to the rules """
+    options = [[i for i, rule in enumerate(rules) if rule.matches(name)] for name in names]
+    for assignment in itertools.product(*options):
+        counts = [assignment.count(i) for i in range(len(rules))]
+        if all(x.min_count <= c and (x.max_count is None or c <= x.max_count) for x, c in zip(rules, counts)):
+            return True
+    return False
+
+
+def linear_match_rules(presets: List[Config.Preset], names: List[str]) -> List[Config.Preset]:
+    """ Most specific of all the rule presets, matching the displays, without the prefix index """
+    matches = [x for x in presets if len(x.rules) != 0 and x.matches_names(names)]
+    best = max((x.specificity for x in matches), default=None)
+    return [x for x in matches if x.specificity == best]
+
+
+# Single rules
+@pytest.mark.parametrize('kind, pattern, name, expected', [
+    ('name', 'DELL U2720Q', 'dell u2720q', True),
+    ('name', 'DELL U2720Q', 'DELL U2720Q ', False),
+    ('name', 'DELL *', 'DELL U2720Q', False),
+    ('glob', 'DELL U27*', 'dell u2720q', True),
+    ('glob', 'DELL U27*', 'DELL P2720Q', False),
+    ('glob', 'DELL U27?0Q', 'DELL U2720Q', True),
+    ('glob', 'DELL U27[0-9]0Q', 'DELL U27X0Q', False),
+    ('regex', r'Built-in .* Display', 'built-in retina display', True),
+    ('regex', r'Built-in .* Display', 'Built-in Retina Display 2', False),
+    ('regex', r'HDMI-[0-9]+', 'HDMI-12', True),
+])
+def test_rule_matches(kind, pattern, name, expected):
+    assert Rule(kind, pattern).matches(name) == expected
+
+
+@pytest.mark.parametrize('d, expected', [
+    ({'glob': 'DELL*'}, (1, 1)),
+    ({'glob': 'DELL*', 'count': 2}, (2, 2)),
+    ({'glob': 'DELL*', 'min': 0}, (0, None)),
+    ({'glob': 'DELL*', 'min': 1, 'max': 3}, (1, 3)),
+    ({'glob': 'DELL*', 'max': 3}, (1, 3)),
+])
+def test_rule_counts_from_dict(d, expected):
+    rule = Rule.from_dict(d)
+    assert (rule.min_count, rule.max_count) == expected
+
+
+@pytest.mark.parametrize('d', [{}, {'glob': 'A*', 'regex': 'A.*'}, {'regex': '('}])
+def test_invalid_rules(d):
+    with pytest.raises(RuntimeError):
+        Rule.from_dict(d)
+
+
+@pytest.mark.parametrize('kind, pattern, prefix', [
+    ('name', 'DELL U2720Q', 'dell u2720q'),
+    ('glob', 'DELL U27*', 'dell u27'),
+    ('glob', '*DELL', ''),
+    ('regex', r'Built-in .* Display', 'built-in '),
+    ('regex', r'^DELL\ U', 'dell u'),
+    ('regex', r'DELLS?', 'dell'),
+    ('regex', r'DELL|LG', ''),
+])
+def test_literal_prefix(kind, pattern, prefix):
+    assert Rule(kind, pattern).prefix == prefix
+
+
+# Counts
+def test_counts():
+    docked = preset('docked', Rule('glob', 'DELL*', 2, 2), Rule('regex', 'Built-in .*', 0, 1))
+    assert docked.matches_names(['DELL A', 'dell b'])
+    assert docked.matches_names(['DELL A', 'Built-in Retina', 'DELL B'])
+    assert not docked.matches_names(['DELL A'])
+    assert not docked.matches_names(['DELL A', 'DELL B', 'DELL C'])
+    assert not docked.matches_names(['DELL A', 'DELL B', 'Built-in 1', 'Built-in 2'])
+    assert not docked.matches_names(['DELL A', 'DELL B', 'LG'])
+
+
+def test_unlimited_count():
+    any_dell = preset('any_dell', Rule('glob', 'DELL*', 1, None))
+    assert any_dell.max_displays is None
+    assert not any_dell.matches_names([])
+    assert any_dell.matches_names(['DELL A'])
+    assert any_dell.matches_names([f'DELL {i}' for i in range(20)])
+    assert not any_dell.matches_names(['DELL A', 'LG'])
+
+
+def test_overlapping_rules_are_assigned():
+    # "DELL U2720Q" matches both rules, but is only needed by the first one
+    dell = preset('dell', Rule('name', 'DELL U2720Q'), Rule('glob', 'DELL*', 1, 2))
+    assert dell.matches_names(['DELL P2419H', 'DELL U2720Q'])
+    assert dell.matches_names(['DELL U2720Q', 'DELL U2720Q', 'DELL U2720Q'])
+    assert not dell.matches_names(['DELL P2419H', 'DELL P2419H'])
+
+
+def test_assignment_against_brute_force():
+    rng = random.Random(19)
+    patterns = [('glob', 'A*'), ('glob', '*B'), ('name', 'AB'), ('regex', '[AB]+'), ('glob', '?')]
+    names = ['A', 'B', 'AB', 'BA', 'AAB', 'C']
+
+    for _ in range(2000):
+        rules = []
+        for kind, pattern in rng.sample(patterns, rng.randint(1, 3)):
+            min_count = rng.randint(0, 2)
+            max_count = rng.choice([None, min_count, min_count + 1, min_count + 2])
+            if max_count is None or max_count > 0:
+                rules.append(Rule(kind, pattern, min_count, max_count))
+        if len(rules) == 0:
+            continue
+
+        displays = [rng.choice(names) for _ in range(rng.randint(0, 4))]
+        assert preset('p', *rules).matches_names(displays) == brute_force_matches(rules, displays), (rules, displays)
+
+
+# Precedence
+def test_exact_displays_take_precedence():
+    c = config(preset('any_dell', Rule('glob', 'DELL*', 1, None)),
+               Config.Preset('exact', ['DELL U2720Q'], 'exact', 'exact'))
+    assert names_of(c.find_matching_preset(['dell u2720q'])) == ['exact']
+    assert names_of(c.find_matching_preset(['DELL P2419H'])) == ['any_dell']
+    assert names_of(c.find_matching_preset(['LG'])) == []
+
+
+def test_more_specific_rules_take_precedence():
+    c = config(preset('any', Rule('glob', '*', 1, None)),
+               preset('any_dell', Rule('glob', 'DELL*', 1, None)),
+               preset('dell_pair', Rule('glob', 'DELL*', 2, 2)),
+               preset('u27_pair', Rule('glob', 'DELL U27*', 2, 2)))
+
+    assert names_of(c.find_matching_preset(['LG'])) == ['any']
+    assert names_of(c.find_matching_preset(['DELL A'])) == ['any_dell']
+    assert names_of(c.find_matching_preset(['DELL A', 'DELL B'])) == ['dell_pair']
+    assert names_of(c.find_matching_preset(['DELL U2720Q', 'DELL U2719D'])) == ['u27_pair']
+    assert names_of(c.find_matching_preset(['DELL U2720Q', 'DELL B', 'LG'])) == ['any']
+
+
+def test_optional_rules_match_no_displays():
+    c = config(preset('dell', Rule('glob', 'DELL*')), preset('optional', Rule('glob', 'DELL*', 0, None)))
+    assert names_of(c.find_matching_preset([])) == ['optional']
+    assert names_of(c.find_matching_preset(['DELL A', 'DELL B'])) == ['optional']
+
+
+def test_equally_specific_rules_are_ambiguous():
+    c = config(preset('first', Rule('glob', 'DELL*')), preset('second', Rule('glob', 'DELL*')))
+    assert names_of(c.find_matching_preset(['DELL A'])) == ['first', 'second']
+
+
+def test_prefix_index_matches_linear_scan():
+    rng = random.Random(1019)
+    words = ['dell', 'del', 'lg', 'built-in', 'benq', 'b']
+    kinds = ['name', 'glob', 'regex']
+
+    presets = []
+    for i in range(200):
+        rules = []
+        for _ in range(rng.randint(1, 2)):
+            word, kind = rng.choice(words), rng.choice(kinds)
+            pattern = {'name': word + ' 1', 'glob': word + '*', 'regex': word + ' [0-9]'}[kind]
+            min_count = rng.randint(0, 2)
+            rules.append(Rule(kind, pattern.upper() if rng.random() < 0.5 else pattern, min_count,
+                              rng.choice([None, max(min_count, 1), min_count + 1])))
+        presets.append(preset(f'p{i}', *rules))
+
+    c = config(*presets)
+    for _ in range(1000):
+        displays = [rng.choice(words) + rng.choice([' 1', ' 2', 'x', '']) for _ in range(rng.randint(0, 3))]
+        assert names_of(c.index.match_rules(displays)) == names_of(linear_match_rules(presets, displays)), displays
+
+
+# Validation
+@pytest.fixture
+def warnings(monkeypatch):
+    result = []
+    monkeypatch.setattr(Log, 'warning', lambda msg, *args, **kwargs: result.append(msg))
+    return result
+
+
+def test_overlap_warning(warnings):
+    c = config(preset('first', Rule('glob', 'DELL*')), preset('second', Rule('regex', 'DELL.*')),
+               preset('other', Rule('glob', 'LG*')), preset('more_specific', Rule('glob', 'DELL U27*')))
+    assert c.validate()
+    assert warnings == ['These presets might match the same displays: "first" and "second", the switch is skipped if '
+                        'they do']
+
+
+def test_no_overlap_warning_for_disjoint_counts(warnings):
+    c = config(preset('one', Rule('glob', 'DELL*', 1, 1)), preset('two', Rule('glob', 'DELL*', 2, 2)))
+    assert c.validate()
+    assert warnings == []
+
+
+@pytest.mark.parametrize('rule', [Rule('glob', 'DELL*', -1, 1), Rule('glob', 'DELL*', 2, 1),
+                                  Rule('glob', 'DELL*', 0, 0)])
+def test_invalid_counts(monkeypatch, rule):
+    monkeypatch.setattr(Log, 'error', lambda *args, **kwargs: None)
+    assert not config(preset('p', rule)).validate()
+
+
+def test_ambiguous_preset(monkeypatch):
+    monkeypatch.setattr(Log, 'error', lambda *args, **kwargs: None)
+    assert not config(preset('p', Rule('glob', 'DELL*'), displays=['DELL'])).validate()
@@ -0,0 +1,72 @@
+import socket
+import sys
+
+import pytest
+
+from scw.config import Config
+from scw.display_identity import IDENTITIES
+
+if sys.platform == 'win32':
+    pytest.skip('Unix domain socket tests', allow_module_level=True)
+
+from scw.control_server import ControlClient, ControlServer
+
+
+class FakeEngine:
+    def __init__(self, config: Config):
+        self.config = config
+
+    def match(self, displays):
+        return [x.name for x in self.config.find_matching_preset_for_displays(displays)]
+
+
+@pytest.fixture
+def engine():
+    return FakeEngine(Config('config.toml', 'obwsc.toml', 1, [Config.Preset('docked', ['DELL U2720Q'], 'P', 'S')]))
+
+
+def test_match_doesnt_intern_displays(engine, tmp_path):
+    server = ControlServer(engine, str(tmp_path / 'control.sock'))
+    try:
+        with ControlClient(server.path) as client:
+            assert client.request('match', displays=['dell u2720q']) == {'presets': ['docked']}
+
+            known = len(IDENTITIES.ids)
+            for i in range(100):
+                assert client.request('match', displays=[f'Unknown {i}', {'name': 'X', 'serial': str(i)}]) == \
+                       {'presets': []}
+            assert len(IDENTITIES.ids) == known
+    finally:
+        server.close()
+
+
+def test_stale_socket_is_replaced(engine, tmp_path):
+    path = str(tmp_path / 'control.sock')
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+
+    server = ControlServer(engine, path)
+    try:
+        with ControlClient(path) as client:
+            assert client.request('match', displays=[]) == {'presets': []}
+    finally:
+        server.close()
+
+
+def test_running_server_is_kept(engine, tmp_path):
+    server = ControlServer(engine, str(tmp_path / 'control.sock'))
+    try:
+        with pytest.raises(RuntimeError, match='already serving'):
+            ControlServer(engine, server.path)
+    finally:
+        server.close()
+
+
+def test_other_files_are_kept(engine, tmp_path):
+    path = tmp_path / 'control.sock'
+    path.write_text('not a socket')
+
+    with pytest.raises(RuntimeError, match='not a socket'):
+        ControlServer(engine, str(path))
+    assert path.read_text() == 'not a socket'
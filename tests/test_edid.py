@@ -0,0 +1,132 @@
+import pytest
+
+from scw.config import Config
+from scw.display_source import Display
+from scw.edid import parse_edid
+from scw.screen_change.linux import get_connected_displays
+
+# Base block of a Dell U2720Q (serial replaced), with one extension block following it
+DELL_U2720Q = bytes.fromhex(
+    '00ffffffffffff0010ace6a034354b4c'
+    '0c1e0104b53c22783a4d45a6554d9f25'
+    '0f5054a54b00714f8180a9c0d1c00101'
+    '01010101010104740030f2705a80b058'
+    '8a00544f2100001a000000ff004a4b57'
+    '313233340a2020202020000000fc0044'
+    '454c4c205532373230510a20000000fd'
+    '00184b1e8c3c000a2020202020200130'
+)
+
+CONFIG = '''
+[obwsc]
+config = "obwsc.toml"
+
+[settings]
+grace_period = 1
+
+[presets.left]
+fingerprints = [{ manufacturer = "DEL", model = "DELL U2720Q", serial = "JKW1234" }]
+profile = "Left"
+scene_collection = "Left"
+
+[presets.right]
+fingerprints = [{ manufacturer = "del", model = "dell u2720q", serial = "JKW5678" }]
+profile = "Right"
+scene_collection = "Right"
+
+[presets.both]
+fingerprints = [
+    { manufacturer = "DEL", model = "DELL U2720Q", serial = "JKW1234" },
+    { manufacturer = "DEL", model = "DELL U2720Q", serial = "JKW5678" },
+]
+profile = "Both"
+scene_collection = "Both"
+'''
+
+
+def with_checksum(data: bytearray) -> bytes:
+    data[127] = -sum(data[:127]) & 0xFF
+    return bytes(data)
+
+
+def with_serial(serial: str) -> bytes:
+    data = bytearray(DELL_U2720Q)
+    data[77:90] = (serial.encode('ascii') + b'\n').ljust(13, b' ')
+    return with_checksum(data)
+
+
+def test_decode():
+    assert sum(DELL_U2720Q) & 0xFF == 0
+    assert parse_edid(DELL_U2720Q) == ('DEL', 'DELL U2720Q', 'JKW1234')
+
+
+def test_extension_blocks_are_ignored():
+    assert parse_edid(DELL_U2720Q + b'\x02\x03' + b'\x00' * 126) == ('DEL', 'DELL U2720Q', 'JKW1234')
+
+
+def test_decode_without_descriptors():
+    data = bytearray(DELL_U2720Q)
+    # Replace the serial and name descriptors with dummy ones
+    data[72:108] = (b'\x00\x00\x00\x10\x00' + b'\x00' * 13) * 2
+    # Falls back to the product code and the numeric serial number
+    assert parse_edid(with_checksum(data)) == ('DEL', 'DEL A0E6', str(0x4C4B3534))
+
+
+@pytest.mark.parametrize('offset', [8, 11, 15, 80, 100, 126])
+def test_checksum_mismatch(offset):
+    data = bytearray(DELL_U2720Q)
+    data[offset] ^= 0x01
+    assert parse_edid(bytes(data)) is None
+
+
+def test_invalid_header():
+    data = bytearray(DELL_U2720Q)
+    data[0] = 0xFF
+    data[7] = 0xFF
+    # Still sums up to 0, only the header is broken
+    data[127] = (data[127] - 0xFE) & 0xFF
+    assert parse_edid(bytes(data)) is None
+
+
+def test_truncated():
+    assert parse_edid(DELL_U2720Q[:127]) is None
+    assert parse_edid(b'') is None
+
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / 'config.toml'
+    path.write_text(CONFIG)
+    return Config.load_from_file(str(path))
+
+
+def connect(root, edids):
+    for i, edid in enumerate(edids, start=1):
+        path = root / f'card0-DP-{i}'
+        path.mkdir()
+        (path / 'status').write_text('connected\n')
+        (path / 'edid').write_bytes(edid)
+
+
+def test_fingerprint_matching(tmp_path, config):
+    connect(tmp_path, [DELL_U2720Q])
+    displays = get_connected_displays(str(tmp_path))
+
+    assert displays == [Display('DELL U2720Q', 'DEL', 'DELL U2720Q', 'JKW1234')]
+    assert [x.name for x in config.find_matching_preset_for_displays(displays)] == ['left']
+
+
+def test_identically_named_monitors(tmp_path, config):
+    connect(tmp_path, [with_serial('JKW5678')])
+    right = get_connected_displays(str(tmp_path))
+
+    assert [x.name for x in right] == ['DELL U2720Q']
+    assert [x.name for x in config.find_matching_preset_for_displays(right)] == ['right']
+
+    both = [Display('DELL U2720Q', 'DEL', 'DELL U2720Q', 'JKW1234')] + right
+    assert [x.name for x in config.find_matching_preset_for_displays(both)] == ['both']
+
+
+def test_unknown_serial(config):
+    displays = [Display('DELL U2720Q', 'DEL', 'DELL U2720Q', 'JKW0000')]
+    assert config.find_matching_preset_for_displays(displays) == []
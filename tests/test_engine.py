@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from scw.config import Config
+from scw.display_source.fake import FakeDisplaySource
+from scw.engine import WatcherEngine
+from scw.options import Options
+from scw.replay import MockObs
+from scw.simulation import VirtualEventLoop
+
+SAMPLE_CONFIG = os.path.join(os.path.dirname(__file__), os.pardir, 'config.toml.sample')
+TWO_SCREENS = ['BenQ EL2870U', 'ASUS PB287Q']
+LAPTOP_ONLY = ['Built-in Retina Display']
+
+SWITCH = 'switch-profile-and-scene-collection'
+
+
+class Setup:
+    def __init__(self, names):
+        self.loop = VirtualEventLoop()
+        self.obs = MockObs(self.loop)
+        self.display_source = FakeDisplaySource()
+        self.display_source.set_display_names(names)
+        self.engine = WatcherEngine(Options(False, Config.load_from_file(SAMPLE_CONFIG)), self.display_source,
+                                    self.loop, self.obs, self.obs, watch_screen_lock=False)
+        self.engine.start()
+
+    def switches(self):
+        return [args[:2] for _, command, args in self.obs.commands if command == SWITCH]
+
+
+@pytest.fixture
+def setup():
+    result = Setup(TWO_SCREENS)
+    result.loop.run_all()
+    yield result
+    result.engine.close()
+
+
+def test_initial_displays_are_applied(setup):
+    assert setup.switches() == [('Two Screens', 'Two Screens')]
+    assert setup.display_source.num_calls == 1
+
+
+def test_display_change_switches_the_preset(setup):
+    setup.display_source.set_display_names(LAPTOP_ONLY)
+    setup.loop.run_all()
+
+    assert setup.switches()[1:] == [('Laptop Only', 'Laptop Only')]
+    assert setup.display_source.num_calls == 2
+
+
+def test_hotplug_burst_switches_once(setup):
+    start = setup.loop.time()
+    for i, names in enumerate([[], TWO_SCREENS[:1], TWO_SCREENS, [], LAPTOP_ONLY]):
+        setup.loop.run_until(start + i * 0.2)
+        setup.display_source.set_display_names(names)
+
+    setup.loop.run_all()
+
+    # Enumerated once per change event, but only switched after the displays have settled
+    assert setup.switches()[1:] == [('Laptop Only', 'Laptop Only')]
+    assert setup.display_source.num_calls == 6
+
+
+def test_unchanged_displays_dont_switch(setup):
+    setup.display_source.set_display_names([x.upper() for x in TWO_SCREENS[::-1]])
+    setup.loop.run_all()
+
+    assert setup.switches() == [('Two Screens', 'Two Screens')]
+
+
+def test_unmatched_displays_dont_switch(setup):
+    setup.display_source.set_display_names(['Unknown Display'])
+    setup.loop.run_all()
+
+    assert setup.switches() == [('Two Screens', 'Two Screens')]
@@ -0,0 +1,113 @@
+import re
+import urllib.error
+import urllib.request
+
+import pytest
+
+from scw import metrics
+from scw.log import Log
+from scw.metrics_exporter import MetricsHttpServer
+from scw.options import Options
+
+CONFIG = '''
+[obwsc]
+config = "obwsc.toml"
+
+[settings]
+grace_period = 1
+
+[presets.docked]
+displays = ["DELL U2720Q"]
+profile = "Docked"
+scene_collection = "Docked"
+'''
+
+# Sample lines of the Prometheus text exposition format
+SAMPLE = re.compile(r'^([a-z_]+)(\{le="([^"]+)"\})? (\S+)$')
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(metrics, 'ENABLED', True)
+
+
+@pytest.fixture
+def server(enabled):
+    result = MetricsHttpServer(0)
+    yield f'http://127.0.0.1:{result.server.server_address[1]}'
+    result.close()
+
+
+def scrape(url: str):
+    """ Samples by name, histogram buckets by name and bound """
+    with urllib.request.urlopen(f'{url}/metrics') as response:
+        assert response.headers['Content-Type'] == MetricsHttpServer.CONTENT_TYPE
+        text = response.read().decode('utf-8')
+
+    types = {}
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            types[name] = kind
+        elif not line.startswith('# HELP '):
+            match = SAMPLE.match(line)
+            assert match is not None, line
+            name, _, le, value = match.groups()
+            samples[(name, le) if le is not None else name] = float(value)
+
+    return types, samples
+
+
+def test_scrape_counter(server):
+    _, before = scrape(server)
+    metrics.DISPLAY_CHANGES.inc()
+    metrics.DISPLAY_CHANGES.inc(2)
+    types, after = scrape(server)
+
+    assert types['scw_display_changes_total'] == 'counter'
+    assert after['scw_display_changes_total'] == before['scw_display_changes_total'] + 3
+
+
+def test_scrape_histogram(server):
+    name = 'scw_obs_command_seconds'
+    _, before = scrape(server)
+    for value in (0.003, 0.2, 30.0):
+        metrics.OBS_COMMAND_SECONDS.observe(value)
+    types, after = scrape(server)
+
+    assert types[name] == 'histogram'
+
+    buckets = [(float(le), after[(n, le)] - before[(n, le)]) for n, le in
+               (x for x in after if isinstance(x, tuple)) if n == f'{name}_bucket']
+    assert [x for x, _ in buckets] == sorted(x for x, _ in buckets)
+    assert buckets[-1] == (float('inf'), 3)
+    assert all(count == (x >= 0.003) + (x >= 0.2) + (x >= 30.0) for x, count in buckets)
+    assert after[f'{name}_count'] == before[f'{name}_count'] + 3
+    assert after[f'{name}_sum'] == pytest.approx(before[f'{name}_sum'] + 30.203)
+
+
+def test_unknown_path(server):
+    with pytest.raises(urllib.error.HTTPError) as e:
+        urllib.request.urlopen(f'{server}/other')
+    assert e.value.code == 404
+
+
+def test_histograms_disabled_by_default(monkeypatch):
+    monkeypatch.setattr(metrics, 'ENABLED', False)
+    count = metrics.PRESET_MATCH_SECONDS.count
+    with metrics.PRESET_MATCH_SECONDS.time():
+        pass
+    assert metrics.PRESET_MATCH_SECONDS.count == count
+
+
+@pytest.mark.parametrize('metrics_args', [['--metrics-port', '0'], ['--metrics-textfile', 'metrics.prom']])
+def test_initial_config_load_is_recorded(tmp_path, monkeypatch, metrics_args):
+    monkeypatch.setattr(metrics, 'ENABLED', False)
+    monkeypatch.setattr(Log, 'setup', lambda args: None)
+    config_path = tmp_path / 'config.toml'
+    config_path.write_text(CONFIG)
+
+    count = metrics.CONFIG_LOAD_SECONDS.count
+    Options.parse('screen-config-watcher', cmd_args=['-c', str(config_path), '--no-config-cache'] + metrics_args)
+    assert metrics.CONFIG_LOAD_SECONDS.count == count + 1
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from scw.config import Config
+from scw.obs_client import ObsClient
+from scw.obs_mock_server import MockObsServer
+
+SWITCH = 'switch-profile-and-scene-collection'
+
+FOLLOW_UPS = [Config.Request('SetCurrentProgramScene', {'sceneName': 'Scene'}),
+              Config.Request('SetInputMute', {'inputName': 'Mic/Aux', 'inputMuted': True})]
+
+
+@pytest.fixture
+def server():
+    result = MockObsServer(profiles=['Default', 'Other'], scene_collections=['Default', 'Other'])
+    yield result
+    result.close()
+
+
+@pytest.fixture
+def client(tmp_path, server):
+    obwsc_config = str(tmp_path / 'obwsc.toml')
+    server.write_obwsc_config(obwsc_config)
+
+    result = ObsClient(obwsc_config)
+    yield result
+    result.disconnect()
+
+
+def batch_requests(server: MockObsServer):
+    """ Requests, sent after the initial state query """
+    types = [x for x, _ in server.requests]
+    return types[types.index('GetSceneCollectionList') + 1:]
+
+
+def test_batch_round_trip(server, client):
+    client.execute(SWITCH, 'Default', 'Other', Config.RequestBatch('Default', 'Other', FOLLOW_UPS))
+
+    assert batch_requests(server) == ['SetCurrentSceneCollection', 'StartRecord', 'SetCurrentProgramScene',
+                                      'SetInputMute']
+    assert server.requests[-1] == ('SetInputMute', {'inputName': 'Mic/Aux', 'inputMuted': True})
+    assert (server.current_scene_collection, server.record_active) == ('Other', True)
+
+    # Confirmed by the per-request results
+    assert client.is_current('Default', 'Other')
+
+
+def test_profile_change(server, client, monkeypatch):
+    monkeypatch.setattr(Config.RequestBatch, 'RECORD_STOP_DELAY_MS', 10)
+    server.record_active = True
+
+    client.execute(SWITCH, 'Other', 'Default', Config.RequestBatch('Other', 'Default', []))
+
+    # The recording is stopped (and confirmed) before the batch
+    assert batch_requests(server) == ['GetRecordStatus', 'StopRecord', 'Sleep', 'SetCurrentProfile', 'StartRecord']
+    assert ('Sleep', {'sleepMillis': 10}) in server.requests
+    assert (server.current_profile, server.record_active) == ('Other', True)
+    assert client.is_current('Other', 'Default')
+
+
+def test_expected_failures(server, client):
+    # Starting an active recording fails with OutputRunning
+    server.record_active = True
+
+    client.execute(SWITCH, 'Default', 'Other', Config.RequestBatch('Default', 'Other', []))
+
+    assert batch_requests(server) == ['SetCurrentSceneCollection', 'StartRecord']
+    assert client.is_current('Default', 'Other')
+
+
+def test_failed_requests(server, client):
+    batch = Config.RequestBatch('Default', 'Other', FOLLOW_UPS[:1] + [Config.Request('Unknown')] + FOLLOW_UPS[1:])
+
+    with pytest.raises(RuntimeError, match=r'^OBS requests failed: Unknown \(204\)$'):
+        client.execute(SWITCH, 'Default', 'Other', batch)
+
+    # Not halting on failures, the successful parts are still taken over
+    assert batch_requests(server)[-2:] == ['Unknown', 'SetInputMute']
+    assert client.is_current('Default', 'Other')
+
+
+def test_batch_timeout(server, client):
+    client.execute(SWITCH, 'Default', 'Default')
+    assert client.is_connected()
+
+    server.latency = 1.0
+    client.timeout = 0.3
+
+    start = time.monotonic()
+    with pytest.raises(RuntimeError, match='Timeout waiting for OBS: request batch'):
+        client.execute(SWITCH, 'Default', 'Other', Config.RequestBatch('Default', 'Other', FOLLOW_UPS))
+
+    # Neither waiting for the late results, nor for a closing handshake
+    assert time.monotonic() - start < 0.9
+    assert not client.is_connected()
+
+    # OBS still executes the batch, but it is never sent again
+    time.sleep(1.5)
+    assert batch_requests(server) == ['SetCurrentSceneCollection', 'StartRecord', 'SetCurrentProgramScene',
+                                      'SetInputMute']
+    assert server.writers == set()
@@ -0,0 +1,141 @@
+import threading
+
+import pytest
+
+from scw.obs_command_queue import ObsCommandQueue
+
+SWITCH = 'switch-profile-and-scene-collection'
+
+
+class FakeObsClient:
+    """ Records the executed commands, the first one blocks until released """
+
+    def __init__(self):
+        self.executed = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.disconnected = False
+
+    def execute(self, command: str, *args):
+        self.executed.append((command,) + args)
+        self.started.set()
+        self.release.wait(5.0)
+
+        if command == 'fail':
+            raise RuntimeError('Failed')
+
+    def disconnect(self):
+        self.disconnected = True
+
+
+class Results:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.finished = []
+
+    def __call__(self, command: str, success: bool, error: str, token):
+        with self.condition:
+            self.finished.append((command, success, error, token))
+            self.condition.notify_all()
+
+    def wait(self, count: int):
+        with self.condition:
+            assert self.condition.wait_for(lambda: len(self.finished) >= count, 5.0)
+        return self.finished
+
+
+@pytest.fixture
+def obs():
+    return FakeObsClient()
+
+
+@pytest.fixture
+def results():
+    return Results()
+
+
+@pytest.fixture
+def queue(obs, results):
+    result = ObsCommandQueue(obs, results)
+    yield result
+    obs.release.set()
+    result.close(1.0)
+
+
+def block(obs: FakeObsClient, queue: ObsCommandQueue, command: str, *args, token=None):
+    """ Keep the worker busy, so that the following commands stay pending """
+    queue.submit(command, *args, token=token)
+    assert obs.started.wait(5.0)
+
+
+def test_record_state_burst(obs, results, queue):
+    block(obs, queue, SWITCH, 'Default', 'Default')
+
+    # Lock, unlock, lock
+    queue.submit('pause-record')
+    queue.submit('resume-record')
+    queue.submit('pause-record')
+
+    assert [str(x) for x in queue.pending] == ['pause-record']
+    assert queue.has_pending('resume-record')
+
+    obs.release.set()
+    results.wait(2)
+    assert obs.executed == [(SWITCH, 'Default', 'Default'), ('pause-record',)]
+
+
+def test_newer_switch_replaces_queued_one(obs, results, queue):
+    block(obs, queue, 'pause-record')
+
+    queue.submit(SWITCH, 'First', 'First')
+    queue.submit('resume-record')
+    queue.submit(SWITCH, 'Second', 'Second')
+
+    assert [str(x) for x in queue.pending] == ['resume-record', f'{SWITCH} Second Second']
+
+    obs.release.set()
+    results.wait(3)
+    assert obs.executed == [('pause-record',), ('resume-record',), (SWITCH, 'Second', 'Second')]
+
+
+def test_command_in_progress(obs, results, queue):
+    block(obs, queue, SWITCH, 'First', 'First', token='first')
+
+    queue.submit(SWITCH, 'Second', 'Second', token='second')
+    queue.submit(SWITCH, 'First', 'First', token='third')
+
+    # Dropped, and covered by the command being executed
+    assert len(queue.pending) == 0
+
+    obs.release.set()
+    assert results.wait(1) == [(f'{SWITCH} First First', True, '', 'third')]
+    assert obs.executed == [(SWITCH, 'First', 'First')]
+
+
+def test_failure(obs, results, queue):
+    obs.release.set()
+    queue.submit('fail', token='token')
+
+    assert results.wait(1) == [('fail', False, 'Failed', 'token')]
+
+
+def test_max_pending(obs, results, queue, monkeypatch):
+    monkeypatch.setattr(ObsCommandQueue, 'MAX_PENDING', 2)
+    block(obs, queue, 'blocking')
+
+    for i in range(3):
+        queue.submit('other', i)
+
+    # The oldest one is dropped
+    assert [str(x) for x in queue.pending] == ['other 1', 'other 2']
+
+
+def test_close(obs, queue):
+    block(obs, queue, 'blocking')
+    queue.submit('other')
+
+    obs.release.set()
+    queue.close(1.0)
+
+    assert not queue.thread.is_alive()
+    assert obs.disconnected
@@ -0,0 +1,161 @@
+import threading
+import time
+
+import pytest
+
+from scw.config import Config
+from scw.obs_fanout import ObsFanout
+from scw.obs_mock_server import MockObsServer
+
+SWITCH = 'switch-profile-and-scene-collection'
+
+
+class Completions:
+    """ Collects the completed submissions """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.submissions = []
+
+    def __call__(self, submission: ObsFanout.Submission):
+        with self.condition:
+            self.submissions.append(submission)
+            self.condition.notify_all()
+
+    def wait(self, count: int = 1, timeout: float = 5.0):
+        with self.condition:
+            assert self.condition.wait_for(lambda: len(self.submissions) >= count, timeout)
+        return self.submissions[count - 1]
+
+
+@pytest.fixture
+def servers():
+    result = []
+
+    def create(**kwargs):
+        server = MockObsServer(profiles=['Default', 'Other'], scene_collections=['Default', 'Other'], **kwargs)
+        result.append(server)
+        return server
+
+    yield create
+
+    for server in result:
+        server.close()
+
+
+@pytest.fixture
+def fanout(tmp_path):
+    result = []
+
+    def create(endpoints):
+        configs = []
+        for i, (name, server, timeout) in enumerate(endpoints):
+            obwsc_config = str(tmp_path / f'obwsc-{i}.toml')
+            server.write_obwsc_config(obwsc_config)
+            configs.append(Config.Endpoint(name, obwsc_config, timeout))
+
+        completions = Completions()
+        result.append(ObsFanout(configs, lambda *_: None, completions))
+        return result[-1], completions
+
+    yield create
+
+    for x in result:
+        x.close(1.0)
+
+
+def test_all_endpoints(servers, fanout):
+    first, second = servers(), servers()
+    obs, completions = fanout([(Config.DEFAULT_ENDPOINT, first, None), ('second', second, None)])
+
+    obs.submit(SWITCH, 'Other', 'Other')
+    submission = completions.wait()
+
+    assert submission.command == f'{SWITCH} Other Other'
+    assert sorted(submission.endpoints) == [Config.DEFAULT_ENDPOINT, 'second']
+    assert submission.errors == {}
+    assert all((x.current_profile, x.current_scene_collection) == ('Other', 'Other') for x in (first, second))
+
+
+def test_selected_endpoints(servers, fanout):
+    first, second = servers(), servers()
+    obs, completions = fanout([(Config.DEFAULT_ENDPOINT, first, None), ('second', second, None)])
+
+    obs.submit(SWITCH, 'Other', 'Other', endpoints=['second', 'unknown'])
+    assert completions.wait().endpoints == ['second']
+    assert (first.current_profile, second.current_profile) == ('Default', 'Other')
+
+
+def test_partial_failure(servers, fanout):
+    first = servers()
+    second = MockObsServer(profiles=['Default'], scene_collections=['Default', 'Other'])
+    try:
+        obs, completions = fanout([(Config.DEFAULT_ENDPOINT, first, None), ('second', second, None)])
+
+        obs.submit(SWITCH, 'Other', 'Other')
+        submission = completions.wait()
+    finally:
+        second.close()
+
+    assert submission.errors == {'second': 'Profile "Other" does not exist'}
+    assert first.current_profile == 'Other'
+
+
+def test_endpoint_timeout(servers, fanout):
+    fast, slow = servers(), servers(latency=2.0)
+    obs, completions = fanout([(Config.DEFAULT_ENDPOINT, fast, None), ('slow', slow, 0.3)])
+
+    start = time.monotonic()
+    obs.submit(SWITCH, 'Other', 'Other')
+    submission = completions.wait()
+
+    # Settled by the timeout, not by the (much later) response
+    assert time.monotonic() - start < 1.5
+    assert list(submission.errors) == ['slow']
+    assert fast.current_profile == 'Other'
+
+
+def test_no_existing_endpoints(servers, fanout):
+    obs, completions = fanout([(Config.DEFAULT_ENDPOINT, servers(), None)])
+
+    obs.submit(SWITCH, 'Other', 'Other', endpoints=['unknown', 'other'])
+    submission = completions.wait()
+
+    assert submission.endpoints == []
+    assert submission.errors == {'unknown': 'unknown OBS endpoint', 'other': 'unknown OBS endpoint'}
+    assert obs.submissions == {}
+
+
+def test_superseded(servers, fanout):
+    server = servers(latency=0.3)
+    obs, completions = fanout([(Config.DEFAULT_ENDPOINT, server, None)])
+
+    obs.submit(SWITCH, 'Other', 'Other')
+    time.sleep(0.1)
+    obs.submit(SWITCH, 'Default', 'Other')
+
+    # Only the latest switch completes
+    submission = completions.wait()
+    assert submission.command == f'{SWITCH} Default Other'
+    assert submission.errors == {}
+    assert (server.current_profile, server.current_scene_collection) == ('Default', 'Other')
+
+    time.sleep(0.5)
+    assert len(completions.submissions) == 1
+
+
+def test_superseded_submission_finishing_late(servers, fanout):
+    obs, completions = fanout([(Config.DEFAULT_ENDPOINT, servers(latency=0.5), None)])
+
+    obs.submit(SWITCH, 'Other', 'Other')
+    superseded = obs.submissions['profile-and-scene-collection']
+    obs.submit(SWITCH, 'Other', 'Other', endpoints=[Config.DEFAULT_ENDPOINT])
+    current = obs.submissions['profile-and-scene-collection']
+    assert current is not superseded
+
+    # The same description, but a different submission
+    obs._on_finished(Config.DEFAULT_ENDPOINT, f'{SWITCH} Other Other', True, '', superseded)
+    assert current.pending == {Config.DEFAULT_ENDPOINT}
+    assert completions.submissions == []
+
+    assert completions.wait() is current
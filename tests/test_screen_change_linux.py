@@ -0,0 +1,101 @@
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+from scw.display_source import Display, DisplayCache
+from scw.edid import parse_edid
+from scw.screen_change.linux import UeventObserver, get_connected_displays
+
+if sys.platform == 'win32':
+    pytest.skip('Unix domain datagram sockets', allow_module_level=True)
+
+
+def make_edid(name: str = '', serial: str = '', serial_number: int = 1234) -> bytes:
+    data = bytearray(128)
+    data[0:8] = b'\x00\xff\xff\xff\xff\xff\xff\x00'
+    vendor = ((ord('D') - 64) << 10) | ((ord('E') - 64) << 5) | (ord('L') - 64)
+    data[8], data[9] = vendor >> 8, vendor & 0xFF
+    data[10], data[11] = 0x34, 0x12
+    data[12:16] = serial_number.to_bytes(4, 'little')
+
+    # Detailed timing descriptor, followed by the name and serial descriptors
+    data[54:56] = b'\x01\x02'
+    if name:
+        data[72:90] = b'\x00\x00\x00\xfc\x00' + (name.encode('ascii') + b'\n').ljust(13, b' ')
+    if serial:
+        data[90:108] = b'\x00\x00\x00\xff\x00' + (serial.encode('ascii') + b'\n').ljust(13, b' ')
+    data[127] = -sum(data) & 0xFF
+    return bytes(data)
+
+
+def make_connector(root, name: str, status: str, edid: bytes = b''):
+    path = root / name
+    path.mkdir()
+    (path / 'status').write_text(status + '\n')
+    (path / 'edid').write_bytes(edid)
+
+
+def test_parse_edid():
+    assert parse_edid(make_edid('DELL U2720Q', 'ABC123')) == ('DEL', 'DELL U2720Q', 'ABC123')
+    assert parse_edid(make_edid()) == ('DEL', 'DEL 1234', '1234')
+    assert parse_edid(make_edid(serial_number=0)) == ('DEL', 'DEL 1234', '')
+    assert parse_edid(b'\x00' * 128) is None
+
+
+def test_connected_displays(tmp_path):
+    make_connector(tmp_path, 'card0-eDP-1', 'connected')
+    make_connector(tmp_path, 'card0-DP-1', 'connected', make_edid('DELL U2720Q', 'ABC123'))
+    make_connector(tmp_path, 'card0-DP-2', 'disconnected', make_edid('DELL U2720Q', 'XYZ'))
+    make_connector(tmp_path, 'card1-HDMI-A-1', 'connected', make_edid('DELL U2720Q', 'ABC123')[:100])
+    (tmp_path / 'card0').mkdir()
+    (tmp_path / 'version').write_text('drm 1.1.0\n')
+
+    assert get_connected_displays(str(tmp_path)) == [
+        Display('DELL U2720Q', 'DEL', 'DELL U2720Q', 'ABC123'),
+        Display('eDP-1'),
+        # Truncated EDID
+        Display('HDMI-A-1'),
+    ]
+
+
+def test_missing_root(tmp_path):
+    assert get_connected_displays(str(tmp_path / 'missing')) == []
+
+
+def test_displays_are_cached(tmp_path):
+    make_connector(tmp_path, 'card0-DP-1', 'connected', make_edid('DELL U2720Q', 'ABC123'))
+    cache = DisplayCache()
+
+    first = get_connected_displays(str(tmp_path), cache)
+    assert get_connected_displays(str(tmp_path), cache)[0] is first[0]
+
+    (tmp_path / 'card0-DP-1' / 'edid').write_bytes(make_edid('DELL U2720Q', 'XYZ'))
+    assert get_connected_displays(str(tmp_path), cache) == [Display('DELL U2720Q', 'DEL', 'DELL U2720Q', 'XYZ')]
+
+
+def test_uevents():
+    receiver, sender = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    events = []
+    received = threading.Event()
+
+    def on_event():
+        events.append(1)
+        received.set()
+
+    observer = UeventObserver(on_event, receiver)
+    try:
+        # Unrelated subsystem and udev re-broadcasts, followed by a DRM hotplug
+        sender.send(b'add@/devices/pci0000:00/usb1/1-1\x00ACTION=add\x00SUBSYSTEM=usb\x00DEVTYPE=usb_device\x00')
+        sender.send(b'libudev\x00\xfe\xed\xca\xfe')
+        sender.send(b'change@/devices/pci0000:00/0000:00:02.0/drm/card0\x00ACTION=change\x00SUBSYSTEM=drm\x00'
+                    b'HOTPLUG=1\x00')
+
+        assert received.wait(5.0)
+    finally:
+        observer.destroy()
+        sender.close()
+
+    assert len(events) == 1
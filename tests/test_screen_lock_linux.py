@@ -0,0 +1,218 @@
+import asyncio
+import queue
+import shutil
+import subprocess
+import threading
+
+import pytest
+
+from scw.headless_app import AsyncioEventLoop
+from scw.screen_lock.linux import LockStateMachine
+from scw.simulation import VirtualEventLoop
+
+SESSION_PATH = '/org/freedesktop/login1/session/_31'
+
+
+class Recorder:
+    def __init__(self):
+        self.events = queue.Queue()
+
+    def on_lock(self):
+        self.events.put('lock')
+
+    def on_unlock(self):
+        self.events.put('unlock')
+
+    def drain(self) -> list:
+        result = []
+        while not self.events.empty():
+            result.append(self.events.get())
+        return result
+
+
+# Debouncing, on a virtual clock
+@pytest.fixture
+def machine():
+    loop = VirtualEventLoop()
+    recorder = Recorder()
+    return loop, recorder, LockStateMachine(loop, recorder.on_lock, recorder.on_unlock, debounce_period=0.5)
+
+
+def test_lock_is_reported_after_the_debounce_period(machine):
+    loop, recorder, state = machine
+    state.update(True)
+    loop.run_until(0.4)
+    assert recorder.drain() == []
+
+    loop.run_until(0.5)
+    assert recorder.drain() == ['lock']
+
+    state.update(False)
+    loop.run_all()
+    assert recorder.drain() == ['unlock']
+
+
+def test_fast_toggle_is_ignored(machine):
+    loop, recorder, state = machine
+    state.update(True)
+    loop.run_until(0.2)
+    state.update(False)
+    loop.run_all()
+    assert recorder.drain() == []
+
+
+def test_toggles_collapse_into_the_final_state(machine):
+    loop, recorder, state = machine
+    for i, locked in enumerate([True, False, True, False, True]):
+        loop.run_until(i * 0.1)
+        state.update(locked)
+
+    loop.run_all()
+    assert recorder.drain() == ['lock']
+    assert loop.time() == pytest.approx(0.9)
+
+
+def test_sleep_is_reported_immediately(machine):
+    loop, recorder, state = machine
+    state.update(True, immediate=True)
+    assert recorder.drain() == ['lock']
+
+    # Repeated and pending updates of the reported state are not reported again
+    state.update(True)
+    state.update(True, immediate=True)
+    loop.run_all()
+    assert recorder.drain() == []
+
+
+# logind signals, on a private bus
+@pytest.fixture
+def bus():
+    jeepney = pytest.importorskip('jeepney')
+    from jeepney.io.blocking import open_dbus_connection
+
+    if shutil.which('dbus-daemon') is None:
+        pytest.skip('dbus-daemon is not available')
+
+    daemon = subprocess.Popen(['dbus-daemon', '--session', '--nofork', '--print-address=1'], stdout=subprocess.PIPE,
+                              text=True)
+    address = daemon.stdout.readline().strip()
+    service = FakeLogind(jeepney, open_dbus_connection(address))
+    try:
+        yield address, service
+    finally:
+        service.connection.close()
+        daemon.terminate()
+        daemon.wait()
+
+
+class FakeLogind:
+    """ Answers the calls, Logind makes on startup, and emits the session signals """
+
+    def __init__(self, jeepney, connection):
+        self.jeepney = jeepney
+        self.connection = connection
+        self.locked_hint = False
+
+        connection.send_and_get_reply(jeepney.message_bus.RequestName('org.freedesktop.login1'))
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        jeepney = self.jeepney
+        while True:
+            try:
+                message = self.connection.receive()
+            except (OSError, EOFError, ValueError):
+                return
+
+            if message.header.message_type != jeepney.MessageType.method_call:
+                continue
+
+            member = message.header.fields[jeepney.HeaderFields.member]
+            if member == 'GetSession':
+                self.connection.send(jeepney.new_method_return(message, 'o', (SESSION_PATH,)))
+            elif member == 'Get' and message.body[1] == 'LockedHint':
+                self.connection.send(jeepney.new_method_return(message, 'v', (('b', self.locked_hint),)))
+            else:
+                self.connection.send(jeepney.new_error(message, 'org.freedesktop.DBus.Error.UnknownMethod'))
+
+    def emit(self, path: str, interface: str, member: str, signature=None, body=()):
+        address = self.jeepney.DBusAddress(path, interface=interface)
+        self.connection.send(self.jeepney.new_signal(address, member, signature, body))
+
+    def lock(self):
+        self.emit(SESSION_PATH, 'org.freedesktop.login1.Session', 'Lock')
+
+    def unlock(self):
+        self.emit(SESSION_PATH, 'org.freedesktop.login1.Session', 'Unlock')
+
+    def set_locked_hint(self, locked: bool):
+        self.locked_hint = locked
+        self.emit(SESSION_PATH, 'org.freedesktop.DBus.Properties', 'PropertiesChanged', 'sa{sv}as',
+                  ('org.freedesktop.login1.Session', {'LockedHint': ('b', locked)}, []))
+
+    def prepare_for_sleep(self, sleeping: bool):
+        self.emit('/org/freedesktop/login1', 'org.freedesktop.login1.Manager', 'PrepareForSleep', 'b', (sleeping,))
+
+
+@pytest.fixture
+def logind(bus, monkeypatch):
+    from scw.screen_lock.linux import Logind
+
+    address, service = bus
+    monkeypatch.setenv('XDG_SESSION_ID', '31')
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    watchers = []
+
+    def start(debounce_period: float):
+        recorder = Recorder()
+        watcher = Logind(AsyncioEventLoop(loop), recorder.on_lock, recorder.on_unlock, address, debounce_period)
+        watchers.append(watcher)
+        return service, recorder, watcher
+
+    yield start
+
+    for watcher in watchers:
+        closed = threading.Event()
+        loop.call_soon_threadsafe(lambda: (watcher.close(), closed.set()))
+        assert closed.wait(5.0)
+
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5.0)
+    loop.close()
+
+
+def test_logind_lock_and_unlock(logind):
+    service, recorder, watcher = logind(0.05)
+    assert watcher.session_path == SESSION_PATH
+    assert not watcher.locked_hint
+
+    service.lock()
+    assert recorder.events.get(timeout=5.0) == 'lock'
+
+    service.set_locked_hint(False)
+    assert recorder.events.get(timeout=5.0) == 'unlock'
+
+
+def test_logind_fast_toggle_is_ignored(logind):
+    service, recorder, _ = logind(0.3)
+    service.lock()
+    service.unlock()
+
+    with pytest.raises(queue.Empty):
+        recorder.events.get(timeout=0.9)
+
+
+def test_logind_sleep_pauses_immediately(logind):
+    service, recorder, _ = logind(30.0)
+
+    service.prepare_for_sleep(True)
+    assert recorder.events.get(timeout=5.0) == 'lock'
+
+    # Waking up (without a locked session) is debounced as usual
+    service.prepare_for_sleep(False)
+    with pytest.raises(queue.Empty):
+        recorder.events.get(timeout=0.3)
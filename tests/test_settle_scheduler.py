@@ -0,0 +1,96 @@
+import pytest
+
+from scw.config import Config
+from scw.settle_scheduler import SettleScheduler
+from scw.simulation import VirtualEventLoop
+
+
+class Harness:
+    def __init__(self, grace_period: float = 5.0, settle_period: float = 1.0, max_delay: float = 10.0,
+                 ready: bool = True):
+        self.loop = VirtualEventLoop()
+        self.config = Config('config.toml', 'obwsc.toml', grace_period, [], settle_period, max_delay)
+        self.ready = ready
+        self.switches = []
+        self.scheduler = SettleScheduler(self.loop, self.config, lambda: self.ready,
+                                         lambda: self.switches.append(self.loop.time()))
+
+    def change_at(self, *times: float):
+        for when in times:
+            self.loop.call_at(when, self.scheduler.notify)
+
+
+def test_settle_period():
+    harness = Harness()
+    harness.change_at(0.0)
+    harness.loop.run_all()
+
+    assert harness.switches == [1.0]
+    assert not harness.scheduler.is_pending()
+
+
+def test_burst_resets_the_settle_timer():
+    harness = Harness()
+    harness.change_at(0.0, 0.5, 1.2, 2.0)
+
+    harness.loop.run_until(2.9)
+    assert harness.switches == []
+    assert harness.scheduler.snapshot()['remaining'] == pytest.approx(0.1)
+
+    harness.loop.run_all()
+    assert harness.switches == [3.0]
+
+
+def test_max_delay_caps_the_wait():
+    harness = Harness(max_delay=3.0)
+    # Never settles, a change every 0.4s until 5.6
+    harness.change_at(*(x * 0.4 for x in range(15)))
+    harness.loop.run_all()
+
+    # The changes after the first switch start a new burst (at 3.2)
+    assert harness.switches == [pytest.approx(3.0), pytest.approx(6.2)]
+
+
+def test_grace_period_is_an_upper_bound():
+    # Displays not matching a single preset wait for the grace period, but not any longer
+    harness = Harness(ready=False)
+    harness.change_at(0.0, 2.0)
+    harness.loop.run_until(3.0)
+
+    assert harness.switches == []
+    assert harness.scheduler.snapshot()['waiting_for_deadline']
+
+    harness.loop.run_all()
+    assert harness.switches == [7.0]
+
+
+def test_settle_period_longer_than_the_grace_period():
+    harness = Harness(grace_period=2.0, settle_period=4.0)
+    harness.change_at(0.0)
+    harness.loop.run_all()
+
+    assert harness.switches == [2.0]
+
+
+def test_reschedule_after_config_change():
+    harness = Harness(ready=False)
+    harness.change_at(0.0)
+    harness.loop.run_until(1.5)
+
+    harness.config.grace_period = 2.0
+    harness.scheduler.reschedule()
+    harness.loop.run_all()
+
+    assert harness.switches == [2.0]
+
+
+def test_stop():
+    harness = Harness()
+    harness.change_at(0.0)
+    harness.loop.run_until(0.5)
+
+    harness.scheduler.stop()
+    harness.loop.run_all()
+
+    assert harness.switches == []
+    assert harness.scheduler.snapshot() == {'pending': False}
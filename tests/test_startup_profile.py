@@ -0,0 +1,18 @@
+from scw.startup_profile import StartupProfile
+
+
+def test_exceeded_budgets():
+    profile = StartupProfile()
+    profile.phases = [('options parsed', 0.02), ('application imported', 0.3), ('engine started', 0.4)]
+    profile.set_budget('application imported', 0.25)
+    profile.set_budget('engine started', 0.5)
+
+    assert profile.exceeded_budgets() == ['application imported after 300.0 ms (budget: 250.0 ms)']
+
+
+def test_phases_not_reached():
+    profile = StartupProfile()
+    profile.mark('options parsed')
+    profile.set_budget('engine started', 0.0)
+
+    assert profile.exceeded_budgets() == []
@@ -0,0 +1,102 @@
+import json
+import os
+
+import pytest
+
+from scw.config import Config
+from scw.display_source import Display
+from scw.display_source.fake import FakeDisplaySource
+from scw.engine import WatcherEngine
+from scw.options import Options
+from scw.replay import MockObs
+from scw.simulation import VirtualEventLoop
+from scw.warm_state import WarmState, WarmStateStore, display_set_digest
+
+SAMPLE_CONFIG = os.path.join(os.path.dirname(__file__), os.pardir, 'config.toml.sample')
+DISPLAYS = [Display('BenQ EL2870U'), Display('ASUS PB287Q')]
+
+
+@pytest.fixture
+def state_path(tmp_path):
+    return str(tmp_path / 'state' / 'state.json')
+
+
+def run_engine(state_path: str, displays=DISPLAYS, config=None):
+    """ Number of switches, sent by an engine started with the state file """
+    loop = VirtualEventLoop()
+    obs = MockObs(loop)
+    config = config if config is not None else Config.load_from_file(SAMPLE_CONFIG)
+    engine = WatcherEngine(Options(False, config, state_file=state_path), FakeDisplaySource(list(displays)), loop,
+                           obs, obs, watch_screen_lock=False)
+    engine.start()
+    loop.run_all()
+
+    # The mock executes the commands synchronously, but doesn't report their completion
+    if engine.pending_state is not None:
+        engine._on_command_completed(f'switch-profile-and-scene-collection {obs.current_profile} '
+                                     f'{obs.current_scene_collection}', True)
+
+    return len(obs.switches())
+
+
+def test_store_and_load(state_path):
+    state = WarmState('config.toml', 'abc', display_set_digest(DISPLAYS), 'docked')
+    WarmStateStore(state_path).store(state)
+    assert WarmStateStore(state_path).load() == state
+
+
+def test_digest_ignores_display_order():
+    assert display_set_digest(DISPLAYS) == display_set_digest(DISPLAYS[::-1])
+    assert display_set_digest(DISPLAYS) != display_set_digest(DISPLAYS[:1])
+
+
+@pytest.mark.parametrize('content', ['', '{"version": 1, "config', '[1, 2]', '{"version": 1}',
+                                     '{"version": 1, "config_path": 1, "config_hash": 2, "displays": 3, "preset": 4}',
+                                     '{"version": 99}', b'\xff\xfe'])
+def test_broken_file_is_ignored(state_path, content):
+    os.makedirs(os.path.dirname(state_path))
+    with open(state_path, 'wb') as f:
+        f.write(content if isinstance(content, bytes) else content.encode('utf-8'))
+
+    assert WarmStateStore(state_path).load() is None
+
+
+def test_missing_file_is_ignored(state_path):
+    assert WarmStateStore(state_path).load() is None
+
+
+def test_unchanged_restart_skips_the_switch(state_path):
+    assert run_engine(state_path) == 1
+    assert run_engine(state_path) == 0
+    assert run_engine(state_path, DISPLAYS[::-1]) == 0
+
+
+def test_corrupt_file_switches(state_path):
+    assert run_engine(state_path) == 1
+    with open(state_path, 'w') as f:
+        f.write('{"version": 1, "config')
+
+    assert run_engine(state_path) == 1
+    assert run_engine(state_path) == 0
+
+
+def test_config_hash_mismatch_switches(state_path):
+    assert run_engine(state_path) == 1
+
+    config = Config.load_from_file(SAMPLE_CONFIG)
+    config.content_hash = 'changed'
+    assert run_engine(state_path, config=config) == 1
+
+
+def test_display_mismatch_switches(state_path):
+    assert run_engine(state_path) == 1
+
+    # Same preset, but another display set
+    with open(state_path, 'r') as f:
+        entry = json.load(f)
+    entry['displays'] = display_set_digest(DISPLAYS[:1])
+    with open(state_path, 'w') as f:
+        json.dump(entry, f)
+
+    assert run_engine(state_path) == 1
+    assert run_engine(state_path) == 0